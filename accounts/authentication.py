@@ -0,0 +1,96 @@
+"""
+JWT authentication with revocation checks.
+
+VersionedJWTAuthentication is simplejwt's JWTAuthentication plus the
+token version check from accounts/tokens.py. ClaimsJWTAuthentication goes
+further and skips the User lookup: request.user is a TokenUser built from
+the token's claims, for views that only need the user's id and role.
+
+StatelessJWTAuthentication (opt-in) also skips the lookup but keeps
+request.user a real User, built from the token's claims with every other
+field deferred, so it can still be assigned to foreign keys and used in
+filters. Reading a deferred field (e.g. user.email) loads it on first
+access. Whether the user still exists and is active is read once per
+user and cached for ACTIVE_TTL seconds. Deactivating a user also revokes
+their tokens, so the TTL only bounds how long a deleted user's tokens
+keep working.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .tokens import CLAIM_FIELDS, is_revoked
+
+DEFAULTS = {
+    'ACTIVE_TTL': 30,
+    'CACHE_ALIAS': 'default',
+}
+
+# Cached for users who do not exist; a cached None would read as a miss
+_MISSING = 'missing'
+
+
+def _conf(name):
+    return getattr(settings, 'JWT_STATELESS', {}).get(name, DEFAULTS[name])
+
+
+def _active_key(user_id):
+    return f'auth:active:{user_id}'
+
+
+def is_active(user_id):
+    """
+    True if the user is active, False if inactive and None if they do not
+    exist, as of at most ACTIVE_TTL seconds ago.
+    """
+    cache = caches[_conf('CACHE_ALIAS')]
+    key = _active_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        state = get_user_model().objects.filter(pk=user_id).values_list('is_active', flat=True).first()
+        if state is None:
+            state = _MISSING
+        cache.set(key, state, _conf('ACTIVE_TTL'))
+    return None if state == _MISSING else state
+
+
+class VersionedJWTAuthentication(JWTAuthentication):
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if api_settings.USER_ID_CLAIM not in token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        if is_revoked(token):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return token
+
+
+class ClaimsJWTAuthentication(VersionedJWTAuthentication):
+    """
+    Authenticates without reading the database once the token version is
+    cached. A deactivated user's tokens stop working through revocation.
+    """
+    def get_user(self, validated_token):
+        return api_settings.TOKEN_USER_CLASS(validated_token)
+
+
+class StatelessJWTAuthentication(VersionedJWTAuthentication):
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in CLAIM_FIELDS):
+            # Issued before these claims existed
+            return super().get_user(validated_token)
+        User = get_user_model()
+        user_id = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        active = is_active(user_id)
+        if active is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        loaded = {field: validated_token[field] for field in CLAIM_FIELDS}
+        loaded.update({User._meta.pk.attname: user_id, 'is_active': True})
+        # from_db takes the values in model field order
+        fields = [f.attname for f in User._meta.concrete_fields if f.attname in loaded]
+        return User.from_db(DEFAULT_DB_ALIAS, fields, [loaded[f] for f in fields])
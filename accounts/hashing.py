@@ -0,0 +1,17 @@
+"""
+Password hashing in provisioning worker processes.
+
+Kept free of model imports: spawned workers import this module to unpickle
+the pool's functions before Django is configured. init_worker() sets
+Django up and hash_password() only then reaches for the hashers.
+"""
+import django
+
+
+def init_worker():
+    django.setup()
+
+
+def hash_password(password):
+    from django.contrib.auth.hashers import make_password
+    return make_password(password)
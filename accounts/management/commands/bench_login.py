@@ -0,0 +1,65 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt import serializers as jwt_serializers
+
+from accounts.views import MyTokenObtainPairView
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures POST /api/token/ logins/sec and queries per login, with '
+        "simplejwt's UPDATE_LAST_LOGIN off and on. Passwords use a fast "
+        'hasher unless --real-hasher is given, so database work is not '
+        'drowned out by PBKDF2. Creates and removes its own users.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=500)
+        parser.add_argument('--real-hasher', action='store_true')
+
+    def handle(self, *args, **options):
+        hashers = settings.PASSWORD_HASHERS if options['real_hasher'] else [
+            'django.contrib.auth.hashers.MD5PasswordHasher'
+        ]
+        # Every request comes from one test IP; measure without throttling
+        unthrottled = dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={})
+        with override_settings(PASSWORD_HASHERS=hashers, REST_FRAMEWORK=unthrottled):
+            for update_last_login in (False, True):
+                # override_settings(SIMPLE_JWT=...) rebuilds simplejwt's
+                # settings object, but its serializers keep the old one
+                with mock.patch.object(jwt_serializers.api_settings, 'UPDATE_LAST_LOGIN', update_last_login):
+                    self.run(update_last_login, options['logins'])
+
+    def run(self, update_last_login, n):
+        prefix = f'bench-login-{int(update_last_login)}-'
+        users = [User.objects.create_user(f'{prefix}{i}', password='bench-password') for i in range(n)]
+        factory = APIRequestFactory()
+        view = MyTokenObtainPairView.as_view()
+        try:
+            queries = writes = failed = 0
+            start = time.perf_counter()
+            for user in users:
+                request = factory.post(
+                    '/api/token/', {'username': user.username, 'password': 'bench-password'}, format='json'
+                )
+                with CaptureQueriesContext(connection) as captured:
+                    failed += view(request).status_code != 200
+                queries += len(captured)
+                writes += sum(1 for q in captured if q['sql'].lstrip().upper().startswith(WRITES))
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'UPDATE_LAST_LOGIN={str(update_last_login):<5}  {n / elapsed:7,.0f} logins/s  '
+                f'{queries / n:.1f} queries, {writes / n:.1f} writes per login, {failed} failed'
+            )
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
@@ -0,0 +1,49 @@
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.provisioning import ROLES, provision_users, read_users
+from elections.eligibility import guess_format
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams a CSV (with a header row) or JSON-lines file of users into '
+        'User and UserProfile rows, hashing passwords across a process pool. '
+        'Existing usernames are skipped, so an interrupted run can simply be '
+        'repeated. Use - to read standard input.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, help='Hashing processes (default: one per CPU)')
+        parser.add_argument('--role', choices=sorted(ROLES), default='voter', help='For rows without a role')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or guess_format(options['path'])
+
+        def progress(stats):
+            self.stderr.write(
+                f'\r{stats.rows:,} rows, {stats.created:,} created, {stats.existing:,} existing, '
+                f'{stats.invalid:,} invalid, {stats.rate:,.0f} users/s', ending=''
+            )
+
+        if options['path'] == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+        else:
+            try:
+                stream = open(options['path'], encoding='utf-8-sig', newline='')
+            except OSError as exc:
+                raise CommandError(exc)
+        with stream:
+            stats = provision_users(
+                read_users(stream, fmt), options['batch_size'], options['workers'], options['role'], progress
+            )
+        self.stderr.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'{stats.rows:,} rows in {stats.elapsed:.1f}s ({stats.rate:,.0f} users/s), '
+            f'{stats.created:,} created, {stats.existing:,} existing, {stats.invalid:,} invalid'
+        ))
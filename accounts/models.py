@@ -1,22 +1,77 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save
 from django.dispatch import receiver
 from elections.models import UserProfile as ElectionsUserProfile
 
 # Import UserProfile from elections app
 UserProfile = ElectionsUserProfile
 
+
+def default_role(user):
+    return 'admin' if user.is_superuser else 'voter'
+
+
+def create_user(username, password=None, profile=None, **extra_fields):
+    """
+    Create a user and their profile, which gets the fields in profile
+    (e.g. role, phone, date_of_birth). This is the one way users are
+    created outside bulk provisioning: the post_save signal below inserts
+    the profile with these fields, so neither row is written twice.
+    """
+    user = User(username=User.normalize_username(username), **extra_fields)
+    if 'email' in extra_fields:
+        user.email = User.objects.normalize_email(user.email)
+    user.set_password(password)
+    user._profile_fields = profile or {}
+    user.save()
+    return user
+
+
+def changed_fields(profile):
+    """
+    Names of the profile's fields that differ from when it was loaded or
+    last saved. Deferred fields are never counted as changed.
+    """
+    loaded = profile._loaded_fields
+    return [
+        field for field, value in loaded.items()
+        if field in profile.__dict__ and profile.__dict__[field] != value
+    ]
+
+
+@receiver(post_init, sender=UserProfile)
+def _remember_profile(sender, instance, **kwargs):
+    instance._loaded_fields = {
+        f.attname: instance.__dict__[f.attname]
+        for f in sender._meta.concrete_fields if f.attname in instance.__dict__
+    }
+
+
+@receiver(post_save, sender=UserProfile)
+def _profile_saved(sender, instance, **kwargs):
+    _remember_profile(sender, instance)
+
+
 # Signal to create a profile when a new user is created
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
-        # For existing superusers, set role to admin
-        role = 'admin' if instance.is_superuser else 'voter'
-        UserProfile.objects.create(user=instance, role=role)
+        fields = dict(getattr(instance, '_profile_fields', None) or {})
+        fields.setdefault('role', default_role(instance))
+        UserProfile.objects.create(user=instance, **fields)
+        instance._profile_fields = None
+
 
-# Signal to save the profile when the user is saved
+# Signal to save the profile along with the user, but only if it has been
+# loaded and changed; saving a user (e.g. last_login on every login) must
+# not query or rewrite the profile
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
+def save_user_profile(sender, instance, created, **kwargs):
+    if created:
+        return
+    profile = User.profile.related.get_cached_value(instance, None)
+    if profile is not None and profile.pk is not None:
+        fields = changed_fields(profile)
+        if fields:
+            profile.save(update_fields=fields)
@@ -0,0 +1,18 @@
+from rest_framework.permissions import BasePermission
+
+
+class HasRole(BasePermission):
+    """
+    Allows requests whose token carries one of roles in its role claim.
+    Needs no database access; use with the JWT authentication classes in
+    accounts/authentication.py.
+    """
+    roles = ()
+
+    def has_permission(self, request, view):
+        claims = request.auth
+        return claims is not None and hasattr(claims, 'get') and claims.get('role') in self.roles
+
+
+class IsAdminRole(HasRole):
+    roles = ('admin',)
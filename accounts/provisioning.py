@@ -0,0 +1,168 @@
+"""
+Bulk user provisioning.
+
+Users are streamed from CSV or JSON lines and handled a chunk at a time.
+Each chunk's usernames are checked against auth_user with one query and
+users that already exist are skipped, so re-running an interrupted import
+resumes where it stopped without hashing anyone twice. Passwords are
+hashed across a process pool, the slow part at PBKDF2's iteration count,
+with the next chunk hashing while the current one is written. Each chunk's
+User and UserProfile rows are inserted with bulk_create in one
+transaction, bypassing the post_save signals that would otherwise create
+and re-save every profile one row at a time.
+"""
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import get_context
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from elections.models import UserProfile
+
+from .hashing import hash_password, init_worker
+
+USER_FIELDS = ('email', 'first_name', 'last_name', 'is_staff', 'is_superuser')
+ROLES = {role for role, _ in UserProfile.USER_ROLES}
+TRUE_VALUES = ('1', 'true', 'yes', 'y')
+
+
+def _from_csv(stream):
+    for row in csv.DictReader(stream):
+        yield {(k or '').strip().lower(): v for k, v in row.items()}
+
+
+def _from_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            value = json.loads(line)
+            yield value if isinstance(value, dict) else {'username': value}
+
+
+def read_users(stream, fmt):
+    """
+    Yield user dicts from a text stream in 'csv' (with a header row) or
+    'jsonl' format. Recognised fields are username, password, role and
+    USER_FIELDS; anything else is ignored.
+    """
+    reader = {'csv': _from_csv, 'jsonl': _from_jsonl}[fmt]
+    for row in reader(stream):
+        user = {'username': str(row.get('username') or '').strip()}
+        for field in ('password', 'role', *USER_FIELDS):
+            value = row.get(field)
+            if value is None or value == '':
+                continue
+            if field in ('is_staff', 'is_superuser') and isinstance(value, str):
+                value = value.strip().lower() in TRUE_VALUES
+            user[field] = value
+        yield user
+
+
+class ProvisionStats:
+    __slots__ = ('rows', 'created', 'existing', 'invalid', 'started')
+
+    def __init__(self):
+        self.rows = self.created = self.existing = self.invalid = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.created / self.elapsed if self.elapsed else 0.0
+
+
+class _Chunk:
+    __slots__ = ('rows', 'existing', 'invalid', 'users', 'hashes')
+
+    def __init__(self, rows):
+        self.rows = len(rows)
+        self.existing = self.invalid = 0
+        self.users = self.hashes = ()
+
+
+def _prepare(rows, pool, workers, default_role, unwritten):
+    """
+    Drop invalid rows, duplicates and existing users from a chunk and
+    start hashing its passwords. unwritten holds the usernames of the
+    previous chunk, which may not be in the database yet.
+    """
+    chunk = _Chunk(rows)
+    users = {}
+    for row in rows:
+        if not row['username'] or row.get('role', default_role) not in ROLES:
+            chunk.invalid += 1
+        elif row['username'] in users or row['username'] in unwritten:
+            chunk.existing += 1
+        else:
+            users[row['username']] = row
+    existing = set(User.objects.filter(username__in=list(users)).values_list('username', flat=True))
+    chunk.existing += len(existing)
+    chunk.users = [u for name, u in users.items() if name not in existing]
+    # Without a password the account gets an unusable one, like create_user
+    passwords = [u.get('password') for u in chunk.users]
+    chunk.hashes = pool.map(hash_password, passwords, chunksize=max(1, len(passwords) // (4 * workers)))
+    return chunk
+
+
+def _write(chunk, default_role):
+    users = [
+        User(
+            username=u['username'], password=password,
+            **{field: u[field] for field in USER_FIELDS if field in u}
+        )
+        for u, password in zip(chunk.users, chunk.hashes)
+    ]
+    with transaction.atomic():
+        users = User.objects.bulk_create(users)
+        if users and users[0].pk is None:
+            # Backends that cannot return ids from a bulk insert
+            ids = dict(User.objects.filter(username__in=[u.username for u in users]).values_list('username', 'id'))
+            for user in users:
+                user.pk = ids[user.username]
+        UserProfile.objects.bulk_create(
+            UserProfile(
+                user_id=user.pk,
+                role=u.get('role', 'admin' if user.is_superuser else default_role),
+            )
+            for user, u in zip(users, chunk.users)
+        )
+    return len(users)
+
+
+def provision_users(rows, batch_size=1000, workers=None, default_role='voter', progress=None):
+    """
+    Create the users described by rows (dicts from read_users) that do not
+    exist yet, with their profiles. Runs one transaction per chunk of
+    batch_size rows and calls progress(stats) after each. Returns the
+    ProvisionStats.
+    """
+    stats = ProvisionStats()
+    rows = iter(rows)
+    workers = workers or os.cpu_count()
+    # spawn, not fork: the parent may have background writer threads running
+    with ProcessPoolExecutor(workers, mp_context=get_context('spawn'), initializer=init_worker) as pool:
+        pending = None
+        while True:
+            chunk = list(islice(rows, batch_size))
+            # Start hashing the next chunk before writing the current one
+            unwritten = {u['username'] for u in pending.users} if pending else set()
+            ready = pending
+            pending = _prepare(chunk, pool, workers, default_role, unwritten) if chunk else None
+            if ready is not None:
+                stats.created += _write(ready, default_role)
+                stats.rows += ready.rows
+                stats.existing += ready.existing
+                stats.invalid += ready.invalid
+                if progress is not None:
+                    progress(stats)
+            if pending is None:
+                break
+    return stats
@@ -1,3 +1,251 @@
-from django.test import TestCase
+import io
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from elections import throttling
+from elections.models import UserProfile
+from elections.views import MyVotesView
+
+from . import authentication
+from .models import create_user
+from .provisioning import provision_users, read_users
+from .views import UserDetailsView
+from .tokens import RoleTokenObtainPairSerializer, is_revoked
+
+
+# Fast password hashing, no throttling and replica reads served by the
+# primary
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    REST_FRAMEWORK=dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={}),
+    DATABASE_REPLICA={'ALIAS': 'default'},
+)
+class AccountsTestCase(TestCase):
+    def setUp(self):
+        # Token versions, buckets and cached active flags outlive each
+        # test's database
+        for cache in caches.all():
+            cache.clear()
+        throttling._store = None
+
+    def login(self, username, password='Secret-pass-1'):
+        response = APIClient().post('/api/token/', {'username': username, 'password': password})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def bearer(self, access):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return client
+
+
+def user_queries(queries):
+    return [q['sql'] for q in queries if '"auth_user"' in q['sql'] or '"elections_userprofile"' in q['sql']]
+
+
+class ReadUsersTests(TestCase):
+    def test_csv(self):
+        stream = io.StringIO('Username,Password,Role,is_staff,extra\n alice ,pw,admin,yes,x\nbob,,,0,\n')
+        self.assertEqual(list(read_users(stream, 'csv')), [
+            {'username': 'alice', 'password': 'pw', 'role': 'admin', 'is_staff': True},
+            {'username': 'bob', 'is_staff': False},
+        ])
+
+    def test_jsonl(self):
+        stream = io.StringIO('{"username": "alice", "email": "a@example.com"}\n\n"bob"\n')
+        self.assertEqual(list(read_users(stream, 'jsonl')), [
+            {'username': 'alice', 'email': 'a@example.com'},
+            {'username': 'bob'},
+        ])
+
+
+class ProvisionUsersTests(TestCase):
+    def test_creates_users_and_profiles(self):
+        User.objects.create_user('existing')
+        rows = [
+            {'username': 'alice', 'password': 'Secret-pass-1', 'role': 'election_manager'},
+            {'username': 'bob', 'is_superuser': True},
+            {'username': 'alice'},
+            {'username': 'existing'},
+            {'username': ''},
+            {'username': 'carol', 'role': 'nobody'},
+        ]
+        stats = provision_users(rows, batch_size=2, workers=1)
+
+        self.assertEqual((stats.rows, stats.created, stats.existing, stats.invalid), (6, 2, 2, 2))
+        alice = User.objects.get(username='alice')
+        self.assertTrue(check_password('Secret-pass-1', alice.password))
+        self.assertEqual(alice.profile.role, 'election_manager')
+        bob = User.objects.get(username='bob')
+        self.assertFalse(bob.has_usable_password())
+        self.assertEqual(bob.profile.role, 'admin')
+        self.assertFalse(User.objects.filter(username='carol').exists())
+        self.assertEqual(UserProfile.objects.count(), 3)
+
+    def test_rerun_skips_existing_users(self):
+        rows = [{'username': f'user{i}'} for i in range(3)]
+        provision_users(rows[:2], workers=1)
+        stats = provision_users(rows, workers=1, default_role='election_manager')
+        self.assertEqual((stats.created, stats.existing), (1, 2))
+        self.assertEqual(User.objects.get(username='user2').profile.role, 'election_manager')
+
+
+
+
+class TokenClaimTests(AccountsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('voter', 'Secret-pass-1')
+
+    def test_tokens_carry_role_and_version(self):
+        access = AccessToken(self.login('voter')['access'])
+        self.assertEqual(
+            (access['role'], access['ver'], access['username'], access['is_staff']), ('voter', 0, 'voter', False)
+        )
+        response = self.bearer(access).get('/api/user/')
+        self.assertEqual(response.json()['role'], 'voter')
+
+    def test_role_change_revokes_tokens(self):
+        tokens = self.login('voter')
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = UserProfile.objects.get(user=self.user)
+            profile.role = 'election_manager'
+            profile.save()
+        self.assertEqual(self.bearer(tokens['access']).get('/api/user/').status_code, 401)
+        response = APIClient().post('/api/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(AccessToken(self.login('voter')['access'])['role'], 'election_manager')
+
+    def test_password_change_revokes_tokens(self):
+        access = self.login('voter')['access']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('Another-pass-2')
+            self.user.save()
+        self.assertEqual(self.bearer(access).get('/api/user/').status_code, 401)
+
+    def test_other_changes_keep_tokens(self):
+        access = self.login('voter')['access']
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(pk=self.user.pk)
+            user.email = 'voter@example.com'
+            user.save()
+        self.assertEqual(self.bearer(access).get('/api/user/').status_code, 200)
+
+    def test_version_check_is_cached(self):
+        token = RoleTokenObtainPairSerializer.get_token(self.user).access_token
+        self.assertFalse(is_revoked(token))
+        with self.assertNumQueries(0):
+            self.assertFalse(is_revoked(token))
+
+    def test_admin_views_authorize_from_claims(self):
+        create_user('admin', 'Secret-pass-1', is_superuser=True)
+        admin = self.bearer(self.login('admin')['access'])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(admin.get('/api/admin/elections/').status_code, 200)
+        self.assertEqual(user_queries(queries), [])
+        voter = self.bearer(self.login('voter')['access'])
+        self.assertEqual(voter.get('/api/admin/elections/').status_code, 403)
+
+
+class StatelessAuthenticationTests(AccountsTestCase):
+    def setUp(self):
+        super().setUp()
+        # Views read DEFAULT_AUTHENTICATION_CLASSES when they are defined,
+        # so overriding the setting would not reach them
+        for view in (UserDetailsView, MyVotesView):
+            patcher = mock.patch.object(
+                view, 'authentication_classes', [authentication.StatelessJWTAuthentication]
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = create_user('voter', 'Secret-pass-1', email='voter@example.com')
+        self.access = self.login('voter')['access']
+
+    def test_user_is_built_from_the_claims(self):
+        client = self.bearer(self.access)
+        client.get('/api/user/')
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/user/')
+        self.assertEqual(response.status_code, 200)
+        # The deferred email is loaded when the view reads it, nothing else
+        self.assertEqual(len(user_queries(queries)), 1)
+        self.assertEqual(response.json()['email'], 'voter@example.com')
+        self.assertEqual(response.json()['username'], 'voter')
+
+    def test_user_works_as_a_foreign_key(self):
+        self.assertEqual(self.bearer(self.access).get('/api/my-votes/').status_code, 200)
+
+    def test_inactive_and_deleted_users(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.bearer(self.access).get('/api/user/')
+        self.assertEqual((response.status_code, response.json()['code']), (401, 'user_inactive'))
+        User.objects.filter(pk=self.user.pk).delete()
+        # Still the cached answer until it expires
+        response = self.bearer(self.access).get('/api/user/')
+        self.assertEqual(response.json()['code'], 'user_inactive')
+        caches['default'].delete(authentication._active_key(self.user.pk))
+        response = self.bearer(self.access).get('/api/user/')
+        self.assertEqual((response.status_code, response.json()['code']), (401, 'user_not_found'))
+
+    def test_active_flag_is_cached_per_user(self):
+        self.bearer(self.access).get('/api/user/')
+        create_user('newcomer', 'Secret-pass-1')
+        newcomer = self.bearer(self.login('newcomer')['access'])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(newcomer.get('/api/user/').json()['username'], 'newcomer')
+        # Only the newcomer is looked up; the first user's flag is cached
+        self.assertEqual(len(user_queries(queries)), 2)
+
+
+def profile_writes(queries):
+    return [
+        q['sql'].split()[0] for q in queries
+        if '"elections_userprofile"' in q['sql'] and not q['sql'].startswith('SELECT')
+    ]
+
+
+class ProfileSignalTests(AccountsTestCase):
+    def test_create_user_inserts_the_profile_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            user = create_user('voter', 'Secret-pass-1', profile={'phone': '123', 'role': 'election_manager'})
+        self.assertEqual(profile_writes(queries), ['INSERT'])
+        profile = UserProfile.objects.get(user=user)
+        self.assertEqual((profile.phone, profile.role), ('123', 'election_manager'))
+        self.assertEqual(create_user('root', is_superuser=True).profile.role, 'admin')
+
+    def test_saving_a_user_leaves_an_unloaded_profile_alone(self):
+        user = User.objects.get(pk=create_user('voter').pk)
+        with self.assertNumQueries(1):
+            user.save()
+
+    def test_only_changed_profile_fields_are_written(self):
+        user = User.objects.select_related('profile').get(pk=create_user('voter').pk)
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertEqual(profile_writes(queries), [])
+        user.profile.phone = '555'
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "elections_userprofile"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"phone"', updates[0])
+        self.assertNotIn('"role"', updates[0])
+        self.assertEqual(UserProfile.objects.get(user=user).phone, '555')
+
+    def test_register(self):
+        response = APIClient().post('/api/register/', {
+            'username': 'new', 'password': 'Secret-pass-1', 'email': 'new@example.com',
+            'phone': '42', 'date_of_birth': '1990-01-01',
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        profile = UserProfile.objects.get(user__username='new')
+        self.assertEqual((profile.phone, str(profile.date_of_birth), profile.role), ('42', '1990-01-01', 'voter'))
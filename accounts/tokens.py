@@ -0,0 +1,138 @@
+"""
+JWT claims and revocation.
+
+Tokens carry the user's role and a token version ('ver'). Views can then
+authorize from the claims instead of reading UserProfile, and every token
+a user holds can be revoked at once by bumping their version, which
+happens automatically when their role, password, username, or active,
+staff or superuser flag changes. The current version is read through the
+cache, so checking it costs no query while the cache is warm. With a per-process cache such
+as LocMemCache, other workers notice a revocation within TIMEOUT seconds.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from elections.models import TokenVersion, UserProfile
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 60,
+}
+
+ROLE_CLAIM = 'role'
+VERSION_CLAIM = 'ver'
+
+# User fields copied into tokens under the same names
+CLAIM_FIELDS = ('username', 'is_staff', 'is_superuser')
+
+# User fields whose change revokes the user's tokens
+REVOKING_FIELDS = ('password', 'is_active', *CLAIM_FIELDS)
+
+
+def _conf(name):
+    return getattr(settings, 'TOKEN_REVOCATION', {}).get(name, DEFAULTS[name])
+
+
+def _version_key(user_id):
+    return f'auth:token_version:{user_id}'
+
+
+def token_version(user_id):
+    """
+    The user's current token version.
+    """
+    cache = caches[_conf('CACHE_ALIAS')]
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = TokenVersion.objects.filter(user_id=user_id).values_list('version', flat=True).first() or 0
+        cache.set(key, version, _conf('TIMEOUT'))
+    return version
+
+
+def is_revoked(token):
+    """
+    Whether a validated token was issued before its user's tokens were
+    revoked. Tokens without a version claim count as version 0.
+    """
+    return token.get(VERSION_CLAIM, 0) != token_version(token[api_settings.USER_ID_CLAIM])
+
+
+def revoke_tokens(user_id):
+    """
+    Invalidate every access and refresh token issued to the user so far.
+    """
+    updated = TokenVersion.objects.filter(user_id=user_id).update(version=F('version') + 1)
+    if not updated:
+        TokenVersion.objects.get_or_create(user_id=user_id, defaults={'version': 1})
+    transaction.on_commit(lambda: caches[_conf('CACHE_ALIAS')].delete(_version_key(user_id)))
+
+
+def role_for(user):
+    if user.is_superuser:
+        return 'admin'
+    try:
+        return user.profile.role
+    except ObjectDoesNotExist:
+        return 'voter'
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Issues token pairs carrying the user's role and token version. Access
+    tokens minted on refresh copy these claims from the refresh token.
+    """
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[ROLE_CLAIM] = role_for(user)
+        token[VERSION_CLAIM] = token_version(user.pk)
+        for field in CLAIM_FIELDS:
+            token[field] = getattr(user, field)
+        return token
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refuses refresh tokens that have been revoked.
+    """
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        if is_revoked(refresh):
+            raise InvalidToken('Token has been revoked')
+        return super().validate(attrs)
+
+
+@receiver(post_init, sender=User)
+@receiver(post_init, sender=UserProfile)
+def _remember_loaded(sender, instance, **kwargs):
+    # Only fields that were actually loaded; touching a deferred field
+    # here would cost a query per instance
+    fields = ('role',) if sender is UserProfile else REVOKING_FIELDS
+    instance._token_fields = {f: instance.__dict__.get(f) for f in fields}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=UserProfile)
+def _revoke_on_change(sender, instance, created, **kwargs):
+    loaded = instance._token_fields
+    if created:
+        changed = False
+    else:
+        changed = any(
+            value is not None and instance.__dict__.get(field) != value
+            for field, value in loaded.items()
+        )
+    instance._token_fields = {f: instance.__dict__.get(f) for f in loaded}
+    if changed:
+        revoke_tokens(instance.user_id if sender is UserProfile else instance.pk)
@@ -1,20 +1,23 @@
+import datetime
+
 from rest_framework import generics, permissions, status
 from django.contrib.auth.models import User
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework import serializers
 from rest_framework.permissions import IsAuthenticated
-from elections.models import UserProfile
+from elections.throttling import IPTokenBucketThrottle, UsernameTokenBucketThrottle
+from .models import create_user
+from .tokens import ROLE_CLAIM, RoleTokenObtainPairSerializer, role_for
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
-    phone = serializers.CharField(required=False, allow_blank=True)
+    phone = serializers.CharField(required=False, allow_blank=True, write_only=True)
     date_of_birth = serializers.DateField(required=True, write_only=True)
     class Meta:
         model = User
-        fields = ('username', 'password', 'email', 'phone', 'over_18')
+        fields = ('username', 'password', 'email', 'phone', 'date_of_birth')
     def validate_date_of_birth(self, value):
         today = datetime.date.today()
         age = today.year - value.year - ((today.month, today.day) < (value.month, value.day))
@@ -23,30 +26,24 @@ class RegisterSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
-        # Remove phone and date_of_birth from validated_data as they're not User model fields
-        phone = validated_data.pop('phone', '')
-        date_of_birth = validated_data.pop('date_of_birth')
-        
-        # Create the user - the post_save signal will handle profile creation
-        user = User.objects.create_user(
+        # phone and date_of_birth belong to the profile, which is inserted
+        # with them rather than created and then updated
+        return create_user(
             username=validated_data['username'],
             password=validated_data['password'],
-            email=validated_data.get('email', '')
+            email=validated_data.get('email', ''),
+            profile={
+                'phone': validated_data.get('phone', ''),
+                'date_of_birth': validated_data['date_of_birth'],
+            },
         )
-        
-        # Update the profile with phone and date_of_birth if provided
-        if hasattr(user, 'profile'):
-            if phone:
-                user.profile.phone = phone
-            user.profile.date_of_birth = date_of_birth
-            user.profile.save()
-        
-        return user
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [IPTokenBucketThrottle]
+    throttle_scope = 'register'
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -65,29 +62,28 @@ class RegisterView(generics.CreateAPIView):
         }, status=status.HTTP_201_CREATED)
 
 class MyTokenObtainPairView(TokenObtainPairView):
-    serializer_class = TokenObtainPairSerializer
+    # Puts the role and token version in the tokens
+    serializer_class = RoleTokenObtainPairSerializer
+    # Checked before the password is hashed
+    throttle_classes = [IPTokenBucketThrottle, UsernameTokenBucketThrottle]
+    throttle_scope = 'login'
 
 class UserDetailsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        # Get or create user profile
-        profile, created = UserProfile.objects.get_or_create(
-            user=user,
-            defaults={'role': 'admin' if user.is_superuser else 'voter'}
-        )
-        
-        # If profile already existed but role wasn't set for admin users
-        if not created and user.is_superuser and not profile.role == 'admin':
-            profile.role = 'admin'
-            profile.save()
+        # The role is in the token; tokens issued before roles were added
+        # fall back to reading the profile (never writing it)
+        role = request.auth.get(ROLE_CLAIM) if request.auth is not None else None
+        if role is None:
+            role = role_for(user)
             
         return Response({
             'id': user.id,
             'username': user.username,
             'email': user.email,
-            'role': profile.role,
+            'role': role,
             'is_staff': user.is_staff,
             'is_superuser': user.is_superuser
         })
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Election, Candidate, Vote, UserProfile, VoterEligibility, ElectionLog
+from .models import Election, Candidate, Vote, UserProfile, VoterEligibility, ElectionLog, VoteTally, VoteReceipt, AuditCheckpoint, RunoffResult
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
@@ -28,6 +28,24 @@ class VoteAdmin(admin.ModelAdmin):
     search_fields = ['voter__username', 'election__name', 'candidate__name']
     date_hierarchy = 'timestamp'
 
+@admin.register(VoteReceipt)
+class VoteReceiptAdmin(admin.ModelAdmin):
+    list_display = ['voter', 'election', 'receipt', 'created_at']
+    list_filter = ['election']
+    search_fields = ['voter__username', 'receipt']
+    readonly_fields = ['voter', 'election', 'receipt', 'idempotency_key', 'created_at']
+
+@admin.register(VoteTally)
+class VoteTallyAdmin(admin.ModelAdmin):
+    list_display = ['election', 'candidate', 'rank', 'count']
+    list_filter = ['election']
+    readonly_fields = ['election', 'candidate', 'rank', 'count']
+
+@admin.register(RunoffResult)
+class RunoffResultAdmin(admin.ModelAdmin):
+    list_display = ['election', 'tallied_at']
+    readonly_fields = ['election', 'data', 'tallied_at']
+
 @admin.register(VoterEligibility)
 class VoterEligibilityAdmin(admin.ModelAdmin):
     list_display = ['election', 'voter', 'is_invited', 'invitation_sent_at']
@@ -36,8 +54,30 @@ class VoterEligibilityAdmin(admin.ModelAdmin):
 
 @admin.register(ElectionLog)
 class ElectionLogAdmin(admin.ModelAdmin):
-    list_display = ['election', 'user', 'action', 'timestamp']
+    list_display = ['election', 'sequence', 'user', 'action', 'timestamp']
     list_filter = ['action', 'election', 'timestamp']
     search_fields = ['election__name', 'user__username', 'details']
     date_hierarchy = 'timestamp'
-    readonly_fields = ['timestamp']
+    # Entries are hash chained and pruned only by prune_election_logs;
+    # adding, editing or deleting one here would break the chain
+    readonly_fields = [
+        'election', 'sequence', 'user', 'action', 'details', 'ip_address', 'timestamp', 'prev_hash', 'entry_hash',
+    ]
+    list_select_related = ['election', 'user']
+    # Skip the unfiltered COUNT(*) on what can be a very large table
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(AuditCheckpoint)
+class AuditCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['election', 'sequence', 'created_at']
+    list_filter = ['election']
+    readonly_fields = ['election', 'sequence', 'entry_hash', 'signature', 'created_at']
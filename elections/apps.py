@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ElectionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'elections'
+
+    def ready(self):
+        # Connect signal receivers
+        from . import cache, live, membership, rendered, routers, snapshots  # noqa: F401
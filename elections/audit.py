@@ -0,0 +1,379 @@
+"""
+Election audit logging.
+
+Entries are buffered in a bounded in-memory queue and written by a
+background thread with bulk_create, on whichever comes first of
+BATCH_SIZE entries or FLUSH_INTERVAL seconds. When the queue is full,
+callers wait up to BLOCK_TIMEOUT and then write their entry inline, so
+entries are slowed down rather than dropped. A batch that fails to write
+is retried with backoff, then written one entry at a time, and any entry
+that still fails is appended to DEAD_LETTER_FILE and logged. Pending
+entries are flushed at interpreter exit. An optional rotating JSON-lines
+file keeps a long-term copy, so old ElectionLog rows can be pruned.
+
+Each election's entries form a hash chain: an entry stores the SHA-256 of
+its own fields plus the previous entry's hash, so an append reads only the
+chain head. verify_chain() re-hashes the entries after the latest signed
+AuditCheckpoint and records a new one, so verification cost grows with
+new entries rather than with the whole log.
+"""
+import atexit
+import datetime
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .models import AuditCheckpoint, ElectionLog
+from .writer import serialized_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ASYNC': True,
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 1.0,
+    'QUEUE_SIZE': 10000,
+    'BLOCK_TIMEOUT': 1.0,
+    'FILE': None,
+    'MAX_BYTES': 50 * 1024 * 1024,
+    'BACKUP_COUNT': 10,
+    'SIGNING_KEY': None,
+    'RETRIES': 3,
+    'RETRY_BACKOFF': 0.5,
+    'DEAD_LETTER_FILE': 'audit-dead-letter.jsonl',
+}
+
+GENESIS_HASH = '0' * 64
+
+
+def _conf(name):
+    return getattr(settings, 'AUDIT_LOG', {}).get(name, DEFAULTS[name])
+
+
+_file_logger = None
+_file_logger_lock = threading.Lock()
+
+
+def _archive():
+    """
+    The rotating file sink, or None when AUDIT_LOG['FILE'] is unset.
+    """
+    global _file_logger
+    path = _conf('FILE')
+    if not path:
+        return None
+    with _file_logger_lock:
+        if _file_logger is None:
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=_conf('MAX_BYTES'), backupCount=_conf('BACKUP_COUNT'), encoding='utf-8'
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            _file_logger = logging.getLogger('elections.audit.archive')
+            _file_logger.propagate = False
+            _file_logger.setLevel(logging.INFO)
+            _file_logger.addHandler(handler)
+        return _file_logger
+
+
+def entry(election_id, user_id, action, details='', ip_address=None):
+    return {
+        'election_id': election_id,
+        'user_id': user_id,
+        'action': action,
+        'details': details,
+        'ip_address': ip_address,
+        'timestamp': timezone.now(),
+    }
+
+
+def chain_hash(prev_hash, election_id, sequence, user_id, action, details, ip_address, timestamp):
+    payload = json.dumps(
+        [prev_hash, election_id, sequence, user_id, action, details or '', ip_address,
+         timestamp.astimezone(datetime.timezone.utc).isoformat()],
+        separators=(',', ':'), ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _chain_head(election_id):
+    return ElectionLog.objects.filter(election_id=election_id).order_by('-sequence').values_list(
+        'sequence', 'entry_hash'
+    ).first() or (0, GENESIS_HASH)
+
+
+def _link(entries):
+    """
+    Build ElectionLog rows for entries, continuing each election's chain.
+    """
+    prep_ip = ElectionLog._meta.get_field('ip_address').get_prep_value
+    heads = {}
+    rows = []
+    for e in entries:
+        election_id = e['election_id']
+        if election_id not in heads:
+            heads[election_id] = _chain_head(election_id)
+        sequence, prev_hash = heads[election_id]
+        sequence += 1
+        ip_address = prep_ip(e['ip_address'])
+        entry_hash = chain_hash(prev_hash, election_id, sequence, e['user_id'], e['action'],
+                                e['details'], ip_address, e['timestamp'])
+        heads[election_id] = (sequence, entry_hash)
+        rows.append(ElectionLog(
+            election_id=election_id, user_id=e['user_id'], action=e['action'],
+            details=e['details'] or '', ip_address=ip_address, timestamp=e['timestamp'],
+            sequence=sequence, prev_hash=prev_hash, entry_hash=entry_hash,
+        ))
+    return rows
+
+
+def write_entries(entries, retries=5):
+    """
+    Append entries to ElectionLog (and the archive file, if configured).
+    A concurrent append to the same chain fails the (election, sequence)
+    constraint and is retried on the new head.
+    """
+    for attempt in range(retries):
+        try:
+            with transaction.atomic():
+                rows = _link(entries)
+                ElectionLog.objects.bulk_create(rows)
+            break
+        except IntegrityError:
+            if attempt == retries - 1:
+                raise
+    archive = _archive()
+    if archive is not None:
+        # Only once the rows are committed; the caller's transaction (e.g.
+        # a writer batch) may still roll back and run this again
+        transaction.on_commit(lambda: _archive_rows(archive, rows))
+
+
+def _archive_rows(archive, rows):
+    for row in rows:
+        archive.info(json.dumps({
+            'election_id': row.election_id, 'sequence': row.sequence, 'user_id': row.user_id,
+            'action': row.action, 'details': row.details, 'ip_address': row.ip_address,
+            'timestamp': row.timestamp, 'prev_hash': row.prev_hash, 'entry_hash': row.entry_hash,
+        }, default=str, separators=(',', ':')))
+
+
+_dead_letter_lock = threading.Lock()
+
+
+def dead_letter(item, exc):
+    """
+    Keep an entry that could not be written to ElectionLog, with the reason.
+    """
+    line = json.dumps(
+        dict(item, error=f'{type(exc).__name__}: {exc}'), default=str, separators=(',', ':')
+    ) + '\n'
+    path = _conf('DEAD_LETTER_FILE')
+    with _dead_letter_lock:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+    logger.error(
+        'Audit entry %r for election %s could not be written and was moved to %s: %s',
+        item['action'], item['election_id'], path, exc,
+    )
+
+
+def write_or_dead_letter(entries, stopping=None):
+    """
+    Write entries, retrying the batch RETRIES times with exponential
+    backoff, then one entry at a time so a bad entry fails alone. Entries
+    that still fail go to the dead-letter file; none are discarded.
+    stopping (an Event) cuts the backoff short at shutdown.
+    """
+    delay = _conf('RETRY_BACKOFF')
+    for attempt in range(_conf('RETRIES')):
+        try:
+            serialized_write(write_entries, entries)
+            return
+        except Exception:
+            logger.warning('Failed to write %d audit log entries (attempt %d)', len(entries), attempt + 1, exc_info=True)
+        if stopping is not None and stopping.is_set():
+            break
+        time.sleep(delay)
+        delay *= 2
+    for item in entries:
+        try:
+            serialized_write(write_entries, [item])
+        except Exception as exc:
+            dead_letter(item, exc)
+
+
+def sign_checkpoint(election_id, sequence, entry_hash):
+    return salted_hmac(
+        'elections.audit.checkpoint', f'{election_id}:{sequence}:{entry_hash}',
+        secret=_conf('SIGNING_KEY') or settings.SECRET_KEY, algorithm='sha256',
+    ).hexdigest()
+
+
+class ChainError(Exception):
+    pass
+
+
+def _check_signature(election_id, checkpoint):
+    expected = sign_checkpoint(election_id, checkpoint.sequence, checkpoint.entry_hash)
+    if not constant_time_compare(expected, checkpoint.signature):
+        raise ChainError(f'checkpoint #{checkpoint.sequence} has an invalid signature')
+
+
+def verify_chain(election_id, full=False, checkpoint=True, chunk_size=10000):
+    """
+    Re-hash an election's log entries after its latest checkpoint (or from
+    the start with full=True) and return (entries checked, new head
+    sequence). Raises ChainError on a bad signature, a gap, or an entry
+    whose hash does not match. With checkpoint=True a signed checkpoint
+    is stored at the verified head.
+
+    A full verification of a log whose first entries were pruned starts
+    from the latest checkpoint at or before the first remaining entry and
+    fails if there is none.
+    """
+    sequence, prev_hash = 0, GENESIS_HASH
+    entries = ElectionLog.objects.filter(election_id=election_id)
+    checkpoints = AuditCheckpoint.objects.filter(election_id=election_id).order_by('-sequence')
+    latest = checkpoints.first()
+    # Checkpointed sequence -> the entry hash it signed
+    signed = {}
+    if latest is not None:
+        _check_signature(election_id, latest)
+        signed[latest.sequence] = latest.entry_hash
+        if not full:
+            sequence, prev_hash = latest.sequence, latest.entry_hash
+            anchor = entries.filter(sequence=sequence).values_list('entry_hash', flat=True).first()
+            if anchor != prev_hash:
+                raise ChainError(f'entry #{sequence} does not match its checkpoint')
+
+    if full:
+        first = entries.order_by('sequence').values_list('sequence', 'prev_hash').first()
+        if first is not None and first[0] != 1:
+            start = checkpoints.filter(sequence__lte=first[0]).first()
+            if start is None:
+                raise ChainError(f'entries before #{first[0]} were pruned and no checkpoint covers them')
+            _check_signature(election_id, start)
+            signed[start.sequence] = start.entry_hash
+            if start.sequence == first[0]:
+                # The checkpointed entry itself remains; its link is trusted
+                # because it must hash to the signed value
+                sequence, prev_hash = first[0] - 1, first[1]
+            else:
+                sequence, prev_hash = start.sequence, start.entry_hash
+
+    rows = entries.filter(sequence__gt=sequence).order_by('sequence').values_list(
+        'sequence', 'prev_hash', 'entry_hash', 'user_id', 'action', 'details', 'ip_address', 'timestamp'
+    )
+    checked = 0
+    for row_sequence, row_prev, row_hash, user_id, action, details, ip_address, timestamp in rows.iterator(chunk_size):
+        if row_sequence != sequence + 1:
+            raise ChainError(f'entries #{sequence + 1}..#{row_sequence - 1} are missing')
+        if row_prev != prev_hash:
+            raise ChainError(f'entry #{row_sequence} does not link to entry #{sequence}')
+        if chain_hash(prev_hash, election_id, row_sequence, user_id, action, details, ip_address, timestamp) != row_hash:
+            raise ChainError(f'entry #{row_sequence} has been modified')
+        if signed.get(row_sequence, row_hash) != row_hash:
+            raise ChainError(f'entry #{row_sequence} does not match its checkpoint')
+        sequence, prev_hash = row_sequence, row_hash
+        checked += 1
+
+    if latest is not None and sequence < latest.sequence:
+        raise ChainError(f'entries after #{sequence} up to checkpoint #{latest.sequence} are missing')
+    if checkpoint and checked and (latest is None or sequence > latest.sequence):
+        AuditCheckpoint.objects.create(
+            election_id=election_id, sequence=sequence, entry_hash=prev_hash,
+            signature=sign_checkpoint(election_id, sequence, prev_hash),
+        )
+    return checked, sequence
+
+
+class AuditWriter:
+    def __init__(self):
+        self.batch_size = _conf('BATCH_SIZE')
+        self.flush_interval = _conf('FLUSH_INTERVAL')
+        self.block_timeout = _conf('BLOCK_TIMEOUT')
+        self._queue = queue.Queue(maxsize=_conf('QUEUE_SIZE'))
+        self._stopping = threading.Event()
+        self._worker = threading.Thread(target=self._run, name='audit-log', daemon=True)
+        self._worker.start()
+
+    def put(self, item):
+        try:
+            self._queue.put(item, timeout=self.block_timeout)
+        except queue.Full:
+            # Backpressure: the caller pays for its own write
+            write_or_dead_letter([item])
+
+    def _take_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._take_batch()
+            if not batch:
+                continue
+            close_old_connections()
+            try:
+                write_or_dead_letter(batch, self._stopping)
+            except Exception:
+                # Only if even the dead-letter file cannot be written
+                logger.exception('Lost %d audit log entries: %r', len(batch), batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        close_old_connections()
+
+    def flush(self):
+        """
+        Block until every entry queued so far has been written.
+        """
+        self._queue.join()
+
+    def shutdown(self):
+        self._stopping.set()
+        self._worker.join()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = AuditWriter()
+            atexit.register(_writer.shutdown)
+        return _writer
+
+
+def audit_log(election_id, user_id, action, details='', ip_address=None):
+    """
+    Record an audit entry once the current transaction commits.
+    """
+    item = entry(election_id, user_id, action, details, ip_address)
+    if _conf('ASYNC'):
+        transaction.on_commit(lambda: get_writer().put(item))
+    else:
+        write_entries([item])
@@ -0,0 +1,92 @@
+"""
+Ballot encryption primitives.
+
+Kept free of Django imports so tally worker processes can import it
+without configuring Django. Each election gets its own AES-256-GCM key,
+derived with HKDF from the master key; the election id is bound in as
+associated data, so a ballot copied to another election fails to decrypt.
+"""
+import base64
+import json
+import os
+from collections import Counter
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+NONCE_SIZE = 12
+
+
+def derive_key(master_key, election_id):
+    return HKDF(
+        algorithm=hashes.SHA256(), length=32, salt=None,
+        info=f'elections.ballot:{election_id}'.encode(),
+    ).derive(master_key)
+
+
+class BallotCipher:
+    """
+    Encrypts and decrypts the ballots of one election. Build it once and
+    reuse it: key derivation and cipher setup happen here, not per ballot.
+    """
+    __slots__ = ('election_id', '_aead', '_aad')
+
+    def __init__(self, key, election_id):
+        self.election_id = election_id
+        self._aead = AESGCM(key)
+        self._aad = str(election_id).encode()
+
+    def encrypt(self, candidate_ids):
+        """
+        Encrypt a ballot, given as candidate ids in preference order.
+        """
+        nonce = os.urandom(NONCE_SIZE)
+        plaintext = json.dumps(list(candidate_ids), separators=(',', ':')).encode()
+        return base64.b64encode(nonce + self._aead.encrypt(nonce, plaintext, self._aad)).decode('ascii')
+
+    def decrypt(self, token):
+        """
+        Return the candidate ids of a ballot, or None if it does not decrypt.
+        """
+        try:
+            raw = base64.b64decode(token)
+            return json.loads(self._aead.decrypt(raw[:NONCE_SIZE], raw[NONCE_SIZE:], self._aad))
+        except (InvalidTag, ValueError):
+            return None
+
+
+# Worker process state, set once by the pool initializer
+_cipher = None
+
+
+def init_worker(key, election_id):
+    global _cipher
+    _cipher = BallotCipher(key, election_id)
+
+
+def tally_chunk(tokens, ranked):
+    """
+    Decrypt and count a chunk of ballots in a worker process. Returns
+    (Counter of (candidate_id, rank), ballots read, unreadable ballots).
+    """
+    counts = Counter()
+    invalid = 0
+    for token in tokens:
+        ballot = _cipher.decrypt(token)
+        if not ballot:
+            invalid += 1
+            continue
+        if ranked:
+            counts.update(zip(ballot, range(1, len(ballot) + 1)))
+        else:
+            counts.update((c, 1) for c in ballot)
+    return counts, len(tokens), invalid
+
+
+def decrypt_chunk(tokens):
+    """
+    Decrypt a chunk of ballots in a worker process, dropping unreadable ones.
+    """
+    return [ballot for ballot in map(_cipher.decrypt, tokens) if ballot]
@@ -0,0 +1,149 @@
+"""
+Encrypted-ballot mode.
+
+For elections with encrypted_ballots set, each ballot is stored as a single
+Vote row without a candidate; the choices are encrypted into
+encrypted_vote and running tallies are not updated while voting is open.
+tally_encrypted() decrypts and counts every ballot once the election has
+ended, spreading chunks of ballots over a process pool, and replaces the
+election's VoteTally rows with the result. It runs from the
+tally_encrypted_ballots command, never inside a request.
+"""
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.db import transaction
+
+from .ballot_crypto import BallotCipher, decrypt_chunk, derive_key, init_worker, tally_chunk
+from .models import Candidate, Vote, VoteTally
+from .tallies import notify_results_changed
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'KEY': None,
+    'WORKERS': None,
+    'CHUNK_SIZE': 5000,
+}
+
+# election id -> BallotCipher, so casting a vote skips key derivation
+_ciphers = {}
+
+
+def _conf(name):
+    return getattr(settings, 'BALLOT_ENCRYPTION', {}).get(name, DEFAULTS[name])
+
+
+def election_key(election_id):
+    master = _conf('KEY') or settings.SECRET_KEY
+    return derive_key(master.encode(), election_id)
+
+
+def get_cipher(election_id):
+    cipher = _ciphers.get(election_id)
+    if cipher is None:
+        cipher = _ciphers[election_id] = BallotCipher(election_key(election_id), election_id)
+    return cipher
+
+
+def seal_vote(election, voter, candidate_ids, **fields):
+    """
+    Build the unsaved Vote row for an encrypted ballot; election may be an
+    Election or a snapshot. candidate_ids are in preference order.
+    """
+    return Vote(
+        voter=voter,
+        election_id=election.id,
+        candidate=None,
+        rank=1,
+        encrypted_vote=get_cipher(election.id).encrypt(candidate_ids),
+        **fields
+    )
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _map_chunks(func, tokens, election_id, workers=None, chunk_size=None):
+    """
+    Apply a ballot_crypto worker function to chunks of tokens, in this
+    process when workers is 1, else across a process pool.
+    """
+    workers = workers or _conf('WORKERS') or os.cpu_count()
+    chunks = _chunks(tokens, chunk_size or _conf('CHUNK_SIZE'))
+    key = election_key(election_id)
+    if workers == 1:
+        init_worker(key, election_id)
+        yield from map(func, chunks)
+        return
+    # spawn, not fork: the parent has background writer threads running
+    with ProcessPoolExecutor(
+        workers, mp_context=get_context('spawn'), initializer=init_worker, initargs=(key, election_id)
+    ) as pool:
+        yield from pool.map(func, chunks)
+
+
+def parallel_tally(tokens, election_id, ranked, workers=None, chunk_size=None):
+    """
+    Count encrypted ballots. Returns (Counter of (candidate_id, rank),
+    ballots read, unreadable ballots).
+    """
+    counts = Counter()
+    total = invalid = 0
+    for chunk_counts, chunk_total, chunk_invalid in _map_chunks(
+        partial(tally_chunk, ranked=ranked), tokens, election_id, workers, chunk_size
+    ):
+        counts.update(chunk_counts)
+        total += chunk_total
+        invalid += chunk_invalid
+    return counts, total, invalid
+
+
+def _tokens(election):
+    return Vote.objects.filter(election=election).exclude(encrypted_vote='').values_list(
+        'encrypted_vote', flat=True
+    ).iterator(chunk_size=_conf('CHUNK_SIZE'))
+
+
+def decrypt_ballots(election, workers=None):
+    """
+    Return every ballot of an encrypted election as a list of candidate ids.
+    """
+    ballots = []
+    for chunk in _map_chunks(decrypt_chunk, _tokens(election), election.id, workers):
+        ballots.extend(chunk)
+    return ballots
+
+
+def tally_encrypted(election, workers=None):
+    """
+    Decrypt and count an encrypted election's ballots and store the result
+    as its tallies. Returns (ballots counted, unreadable ballots).
+    """
+    counts, total, invalid = parallel_tally(
+        _tokens(election), election.id, election.election_type == 'ranked_choice', workers
+    )
+    candidate_ids = set(Candidate.objects.filter(election=election).values_list('id', flat=True))
+    unknown = sum(n for (c, r), n in counts.items() if c not in candidate_ids)
+    if invalid or unknown:
+        logger.warning(
+            'Election %s: %d unreadable ballots, %d selections of unknown candidates',
+            election.id, invalid, unknown
+        )
+    with transaction.atomic():
+        VoteTally.objects.filter(election=election).delete()
+        VoteTally.objects.bulk_create(
+            VoteTally(election_id=election.id, candidate_id=c, rank=r, count=n)
+            for (c, r), n in counts.items() if c in candidate_ids
+        )
+        transaction.on_commit(partial(notify_results_changed, election.id))
+    return total - invalid, invalid
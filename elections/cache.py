@@ -0,0 +1,123 @@
+"""
+Results cache.
+
+Results are stored per election under a versioned key. Casting a vote or
+editing an election bumps the version, so stale entries are never read
+again and simply expire. Misses are computed once: threads in a worker
+share a local lock and workers share a lock key in the cache backend.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import receiver
+
+from .signals import results_changed
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+    'LOCK_TIMEOUT': 10,
+    'WAIT_TIMEOUT': 5,
+    'POLL_INTERVAL': 0.05,
+}
+
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+def _conf(name):
+    return getattr(settings, 'RESULTS_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def _cache():
+    return caches[_conf('ALIAS')]
+
+
+def _version_key(election_id):
+    return f'results:{election_id}:version'
+
+
+def _new_version():
+    # Time based so a version key evicted from the cache never comes back
+    # pointing at an old payload.
+    return time.time_ns()
+
+
+def _local_lock(name):
+    with _local_locks_guard:
+        lock = _local_locks.get(name)
+        if lock is None:
+            lock = _local_locks[name] = threading.Lock()
+        return lock
+
+
+def results_version(election_id):
+    cache = _cache()
+    key = _version_key(election_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_results(election_id):
+    """
+    Make the next results read for this election recompute.
+    """
+    cache = _cache()
+    key = _version_key(election_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+@receiver(results_changed)
+def _invalidate_on_change(sender, election_id, **kwargs):
+    invalidate_results(election_id)
+
+
+def get_or_compute(key, compute, lock_name=None):
+    """
+    Return the cached value for key, calling compute() at most once per
+    miss across all threads and workers sharing the cache backend.
+    """
+    cache = _cache()
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    with _local_lock(lock_name or key):
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        lock_key = f'{key}:lock'
+        if cache.add(lock_key, 1, _conf('LOCK_TIMEOUT')):
+            try:
+                value = compute()
+                cache.set(key, value, _conf('TIMEOUT'))
+            finally:
+                cache.delete(lock_key)
+            return value
+
+        # Another worker holds the lock; wait for its result
+        deadline = time.monotonic() + _conf('WAIT_TIMEOUT')
+        while time.monotonic() < deadline:
+            time.sleep(_conf('POLL_INTERVAL'))
+            value = cache.get(key)
+            if value is not None:
+                return value
+        return compute()
+
+
+def cached_results(election_id, compute, kind='results'):
+    """
+    Cache compute() for an election until its results version changes.
+    kind separates different views of the same election (e.g. 'runoff').
+    """
+    key = f'{kind}:{election_id}:v{results_version(election_id)}'
+    return get_or_compute(key, compute, lock_name=f'{kind}:{election_id}')
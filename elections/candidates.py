@@ -0,0 +1,46 @@
+"""
+Bulk candidate sync for admin election edits.
+
+The submitted candidate list is diffed against the election's candidates,
+loaded with one query: entries with a known id update that candidate,
+entries without one (or with an id from another election) are new, and
+candidates missing from the list are deleted. The diff is applied with
+one bulk_create, one bulk_update and one delete, so the number of queries
+does not grow with the size of the ballot. Bulk writes send no model
+signals; callers invalidate whatever caches the election's candidates.
+"""
+from django.db import transaction
+
+from .models import Candidate
+
+
+def sync_candidates(election, candidates_data):
+    """
+    Make election's candidates match candidates_data, a list of validated
+    AdminCandidateSerializer dicts. Returns (created, updated, deleted).
+    """
+    existing = {c.id: c for c in Candidate.objects.filter(election=election)}
+    to_create, to_update, changed_fields, kept = [], {}, set(), set()
+
+    for data in candidates_data:
+        data = dict(data)
+        candidate = existing.get(data.pop('id', None))
+        if candidate is None:
+            to_create.append(Candidate(election=election, **data))
+            continue
+        kept.add(candidate.id)
+        for field, value in data.items():
+            if getattr(candidate, field) != value:
+                setattr(candidate, field, value)
+                changed_fields.add(field)
+                to_update[candidate.id] = candidate
+
+    deleted = [pk for pk in existing if pk not in kept]
+    with transaction.atomic():
+        if deleted:
+            Candidate.objects.filter(id__in=deleted).delete()
+        if to_update:
+            Candidate.objects.bulk_update(to_update.values(), sorted(changed_fields))
+        if to_create:
+            Candidate.objects.bulk_create(to_create)
+    return len(to_create), len(to_update), len(deleted)
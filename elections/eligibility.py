@@ -0,0 +1,140 @@
+"""
+Bulk import of VoterEligibility lists.
+
+Input is streamed as CSV or JSON lines of usernames or emails and handled
+a chunk at a time: each chunk's identifiers are resolved to user ids with
+one query and inserted with bulk_create(ignore_conflicts=True), so memory
+stays bounded by the chunk size and re-importing a list is harmless.
+Each chunk invalidates the election's cached membership index.
+"""
+import csv
+import json
+import time
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+
+from .membership import invalidate_membership
+from .models import VoterEligibility
+
+IDENTIFIER_FIELDS = ('username', 'email', 'identifier')
+
+
+def _from_csv(stream):
+    rows = csv.reader(stream)
+    header = next(rows, None)
+    if header is None:
+        return
+    column = 0
+    names = [h.strip().lower() for h in header]
+    for field in IDENTIFIER_FIELDS:
+        if field in names:
+            column = names.index(field)
+            break
+    else:
+        # No header row; the first row is data
+        if header:
+            yield header[0]
+    for row in rows:
+        if len(row) > column:
+            yield row[column]
+
+
+def _from_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        value = json.loads(line)
+        if isinstance(value, dict):
+            value = next((value[f] for f in IDENTIFIER_FIELDS if value.get(f)), '')
+        yield str(value)
+
+
+def read_identifiers(stream, fmt):
+    """
+    Yield usernames or emails from a text stream in 'csv' or 'jsonl'
+    format. CSV uses the username/email/identifier column if there is a
+    header, otherwise the first column.
+    """
+    reader = {'csv': _from_csv, 'jsonl': _from_jsonl}[fmt]
+    for value in reader(stream):
+        value = value.strip()
+        if value:
+            yield value
+
+
+def guess_format(filename):
+    return 'jsonl' if str(filename).lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+class ImportStats:
+    __slots__ = ('rows', 'matched', 'unknown', 'started')
+
+    def __init__(self):
+        self.rows = self.matched = self.unknown = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'matched': self.matched,
+            'unknown': self.unknown,
+            'seconds': round(self.elapsed, 2),
+            'rows_per_second': round(self.rate),
+        }
+
+
+def _resolve(identifiers):
+    """
+    Map a chunk of usernames/emails to user ids with one query. Values
+    containing '@' are tried as emails as well as usernames.
+    """
+    emails = [i for i in identifiers if '@' in i]
+    lookup = Q(username__in=identifiers)
+    if emails:
+        lookup |= Q(email__in=emails)
+    ids = {}
+    for user_id, username, email in User.objects.filter(lookup).values_list('id', 'username', 'email'):
+        ids[username] = user_id
+        if email:
+            ids.setdefault(email, user_id)
+    return ids
+
+
+def import_eligibility(election, identifiers, batch_size=5000, progress=None):
+    """
+    Make the users named by identifiers eligible for election. Runs one
+    transaction per chunk of batch_size identifiers and calls
+    progress(stats) after each. Returns the ImportStats.
+    """
+    stats = ImportStats()
+    election_id = getattr(election, 'id', election)
+    identifiers = iter(identifiers)
+    while chunk := list(islice(identifiers, batch_size)):
+        unique = list(dict.fromkeys(chunk))
+        ids = _resolve(unique)
+        voter_ids = {ids[i] for i in unique if i in ids}
+        with transaction.atomic():
+            VoterEligibility.objects.bulk_create(
+                [VoterEligibility(election_id=election_id, voter_id=v) for v in voter_ids],
+                ignore_conflicts=True,
+            )
+            # bulk_create sends no signals
+            invalidate_membership(election_id)
+        stats.rows += len(chunk)
+        stats.matched += sum(1 for i in chunk if i in ids)
+        stats.unknown += sum(1 for i in chunk if i not in ids)
+        if progress is not None:
+            progress(stats)
+    return stats
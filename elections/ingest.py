@@ -0,0 +1,449 @@
+"""
+Write-behind vote ingestion.
+
+When VOTE_INGEST['ENABLED'] is set, VoteView validates a vote, appends it
+to a local journal file and acknowledges it straight away. A background
+worker drains the journal into Vote and ElectionLog with batched
+bulk_create transactions and then advances the journal's committed
+offset. Journals left behind by a crashed process are replayed on start
+(or with ``python manage.py replay_vote_journal``).
+
+A batch that fails with anything but a transient database error (e.g. a
+vote for a candidate deleted after it was journaled) is split in halves
+until the records that cannot be stored are isolated. Those are appended
+to a dead-letter file and logged, and the rest are stored, so one bad
+vote never stalls ingestion. Transient errors (a locked or lost database)
+are retried in order.
+
+Each worker remembers which voters have a stored vote in an election
+(read once per election), so accepting a vote needs no query; only a
+voter already in that set is looked up, to answer a retry with its
+receipt. Votes stored by other workers are not in the set: a second vote
+sent to another worker is acknowledged and then skipped by write_batch,
+which never stores two votes for one voter.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .audit import entry as audit_entry, write_entries
+from .ballots import get_cipher
+from .models import Vote, VoteReceipt
+from .tallies import record_votes
+from .writer import serialized_write
+
+try:
+    import fcntl
+except ImportError:  # Windows: journals cannot be claimed across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'JOURNAL_DIR': 'vote_journal',
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 0.5,
+    'FSYNC': True,
+    'DEAD_LETTER_FILE': None,    # default: JOURNAL_DIR / 'dead-letter.jsonl'
+}
+
+# Worth retrying the same batch; anything else is a problem with its records
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+_dead_letter_lock = threading.Lock()
+
+
+def _conf(name):
+    return getattr(settings, 'VOTE_INGEST', {}).get(name, DEFAULTS[name])
+
+
+def ingest_enabled():
+    return _conf('ENABLED')
+
+
+class VoteJournal:
+    """
+    Append-only JSON lines file plus a sidecar holding the byte offset up
+    to which records have been committed to the database.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.offset_path = self.path.with_suffix('.offset')
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced = 0
+        self._file = open(self.path, 'ab')
+        if fcntl is not None:
+            # Held for the life of the process so others know we own it
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def append(self, record):
+        """
+        Durably append a record. Returns the offset just past it.
+        """
+        line = json.dumps(record, separators=(',', ':')).encode() + b'\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            offset = self._file.tell()
+        if _conf('FSYNC'):
+            self._sync(offset)
+        return offset
+
+    def _sync(self, offset):
+        """
+        Group commit: one fsync covers every line written before it, so
+        appends that queued behind a sync in progress usually find their
+        line already on disk and return without one of their own.
+        """
+        with self._sync_lock:
+            if self._synced >= offset:
+                return
+            with self._lock:
+                end = self._file.tell()
+            os.fsync(self._file.fileno())
+            self._synced = end
+
+    def committed_offset(self):
+        try:
+            return int(self.offset_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def commit(self, offset):
+        """
+        Mark everything before offset as stored; empty the journal once it
+        has been fully drained.
+        """
+        with self._sync_lock, self._lock:
+            if offset >= self._file.tell():
+                self._file.truncate(0)
+                self._file.seek(0)
+                self._synced = 0
+                offset = 0
+            tmp = self.offset_path.with_suffix('.offset.tmp')
+            tmp.write_text(str(offset))
+            os.replace(tmp, self.offset_path)
+
+    def pending(self):
+        """
+        Yield (record, end_offset) for every uncommitted record.
+        """
+        with open(self.path, 'rb') as f:
+            f.seek(self.committed_offset())
+            for line in iter(f.readline, b''):
+                if not line.endswith(b'\n'):
+                    break  # torn write from a crash; never acknowledged
+                yield json.loads(line), f.tell()
+
+    def close(self):
+        self._file.close()
+
+
+def write_batch(records):
+    """
+    Store a batch of journal records in one transaction. Records whose
+    voter already has a receipt for that election are skipped, so replaying
+    a batch that was stored before a crash is harmless.
+    """
+    voters = defaultdict(set)
+    for r in records:
+        voters[r['election']].add(r['voter'])
+    wanted = Q()
+    for election_id, voter_ids in voters.items():
+        wanted |= Q(election_id=election_id, voter_id__in=voter_ids)
+    with transaction.atomic():
+        seen = set(VoteReceipt.objects.filter(wanted).values_list('voter_id', 'election_id'))
+        receipts, votes, logs = [], [], []
+        for r in records:
+            key = (r['voter'], r['election'])
+            if key in seen:
+                continue
+            seen.add(key)
+            receipts.append(VoteReceipt(
+                voter_id=r['voter'],
+                election_id=r['election'],
+                receipt=r['id'],
+                idempotency_key=r.get('idempotency_key', ''),
+            ))
+            votes.append(Vote(
+                voter_id=r['voter'],
+                election_id=r['election'],
+                candidate_id=r['candidate'],
+                rank=r['rank'],
+                encrypted_vote=r.get('encrypted_vote', ''),
+                ip_address=r['ip_address'],
+                user_agent=r['user_agent'],
+            ))
+            logs.append(audit_entry(
+                r['election'], r['voter'], 'vote_cast',
+                'Cast encrypted ballot' if r.get('encrypted_vote') else f"Voted for {r['candidate_name']}",
+                r['ip_address']
+            ))
+        VoteReceipt.objects.bulk_create(receipts)
+        Vote.objects.bulk_create(votes)
+        record_votes(votes)
+        write_entries(logs)
+    return len(votes)
+
+
+def dead_letter(record, exc):
+    """
+    Set aside a journaled vote that cannot be stored, with the reason.
+    """
+    path = Path(_conf('DEAD_LETTER_FILE') or Path(_conf('JOURNAL_DIR')) / 'dead-letter.jsonl')
+    line = json.dumps({
+        'record': record,
+        'error': f'{type(exc).__name__}: {exc}',
+        'failed_at': timezone.now().isoformat(),
+    }, separators=(',', ':')).encode() + b'\n'
+    with _dead_letter_lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'ab') as f:
+            f.write(line)
+            f.flush()
+            if _conf('FSYNC'):
+                os.fsync(f.fileno())
+    logger.error(
+        'Journaled vote %s (voter %s, election %s) cannot be stored and was moved to %s: %s',
+        record.get('id'), record.get('voter'), record.get('election'), path, exc,
+    )
+
+
+def store_records(records):
+    """
+    Store journal records, moving any that can never be stored to the
+    dead-letter file. Returns (votes written, records dead-lettered).
+    Transient errors are raised; the records can be retried as a whole,
+    since write_batch skips those already stored.
+    """
+    try:
+        return serialized_write(write_batch, records), 0
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception as exc:
+        if len(records) == 1:
+            dead_letter(records[0], exc)
+            return 0, 1
+    middle = len(records) // 2
+    written, dead = store_records(records[:middle])
+    more_written, more_dead = store_records(records[middle:])
+    return written + more_written, dead + more_dead
+
+
+def replay_journal(path, batch_size=None):
+    """
+    Store every uncommitted record of a journal file. Returns the number
+    of votes written.
+    """
+    journal = VoteJournal(path)
+    batch_size = batch_size or _conf('BATCH_SIZE')
+    written = 0
+    batch, end = [], journal.committed_offset()
+    try:
+        for record, end in journal.pending():
+            batch.append(record)
+            if len(batch) >= batch_size:
+                written += store_records(batch)[0]
+                journal.commit(end)
+                batch = []
+        if batch:
+            written += store_records(batch)[0]
+        journal.commit(end)
+    finally:
+        journal.close()
+    return written
+
+
+def replay_orphaned_journals(own_path=None):
+    """
+    Replay journals whose owning process is gone. A journal still locked by
+    a live process is left alone.
+    """
+    directory = Path(_conf('JOURNAL_DIR'))
+    written = 0
+    for path in sorted(directory.glob('votes-*.jsonl')):
+        if own_path is not None and path == own_path:
+            continue
+        try:
+            written += replay_journal(path)
+        except BlockingIOError:
+            continue
+        path.unlink(missing_ok=True)
+        path.with_suffix('.offset').unlink(missing_ok=True)
+    return written
+
+
+class VoteIngestor:
+    def __init__(self):
+        directory = Path(_conf('JOURNAL_DIR'))
+        directory.mkdir(parents=True, exist_ok=True)
+        replay_orphaned_journals()
+        self.journal = VoteJournal(directory / f'votes-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl')
+        self.batch_size = _conf('BATCH_SIZE')
+        self.flush_interval = _conf('FLUSH_INTERVAL')
+        self._queue = queue.Queue()
+        # (voter, election) -> (idempotency key, receipt) awaiting write
+        self._pending = {}
+        # election -> ids of voters whose vote is stored
+        self._voted = {}
+        self._pending_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._worker = threading.Thread(target=self._run, name='vote-ingest', daemon=True)
+        self._worker.start()
+
+    def submit(self, record):
+        """
+        Journal a validated vote and return its receipt. If the voter already
+        has a vote for this election, pending or stored, return that vote's
+        receipt when the idempotency keys match, else None.
+        """
+        key = (record['voter'], record['election'])
+        idempotency_key = record['idempotency_key']
+        with self._pending_lock:
+            if key in self._pending:
+                pending_key, receipt = self._pending[key]
+                return receipt if idempotency_key and pending_key == idempotency_key else None
+            voted = self._voters(record['election'])
+            if record['voter'] not in voted:
+                self._pending[key] = (idempotency_key, record['id'])
+                voted = None
+
+        if voted is not None:
+            # Only voters known to have voted reach the database here
+            stored = VoteReceipt.objects.filter(
+                voter_id=record['voter'], election_id=record['election']
+            ).values_list('receipt', 'idempotency_key').first()
+            if stored is not None:
+                receipt, stored_key = stored
+                return str(receipt) if idempotency_key and stored_key == idempotency_key else None
+            # Their vote was dead-lettered; they may vote again
+            with self._pending_lock:
+                voted.discard(record['voter'])
+            return self.submit(record)
+
+        try:
+            offset = self.journal.append(record)
+        except Exception:
+            with self._pending_lock:
+                self._pending.pop(key, None)
+            raise
+        self._queue.put((record, offset))
+        return record['id']
+
+    def _voters(self, election_id):
+        """
+        Ids of the voters with a stored vote in an election, read once per
+        election and kept up to date by _flush. Call with _pending_lock held,
+        so no flush can land between the read and the set being registered.
+        """
+        voters = self._voted.get(election_id)
+        if voters is None:
+            voters = self._voted[election_id] = set(
+                VoteReceipt.objects.filter(election_id=election_id).values_list('voter_id', flat=True)
+            )
+        return voters
+
+    def _take_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        records = [record for record, _ in batch]
+        store_records(records)
+        # Dead-lettered records are done with too: past the offset, and
+        # their voters' slots released. They are marked as voted like the
+        # rest; submit() finds no receipt for them and lets them vote again
+        self.journal.commit(batch[-1][1])
+        with self._pending_lock:
+            for r in records:
+                self._pending.pop((r['voter'], r['election']), None)
+                voted = self._voted.get(r['election'])
+                if voted is not None:
+                    voted.add(r['voter'])
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._take_batch()
+            if not batch:
+                continue
+            close_old_connections()
+            while True:
+                try:
+                    self._flush(batch)
+                    break
+                except Exception:
+                    # A transient error: keep retrying in order; if we are
+                    # shutting down the records stay in the journal and are
+                    # replayed on restart
+                    logger.exception('Failed to write %d journaled votes', len(batch))
+                    if self._stopping.wait(self.flush_interval):
+                        return
+                    close_old_connections()
+        close_old_connections()
+
+    def drain(self):
+        """
+        Block until every queued vote has been written.
+        """
+        while not self._queue.empty() or self._pending:
+            self._stopping.wait(self.flush_interval / 10)
+
+    def shutdown(self):
+        self._stopping.set()
+        self._worker.join()
+        self.journal.close()
+
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+
+def get_ingestor():
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None:
+            _ingestor = VoteIngestor()
+            atexit.register(_ingestor.shutdown)
+        return _ingestor
+
+
+def journal_record(request, election, candidate_id, idempotency_key='', rank=1):
+    """
+    Build the journal entry for a vote; election is an ElectionSnapshot.
+    Encrypted ballots are sealed before they reach the journal.
+    """
+    sealed = election.encrypted_ballots
+    return {
+        'id': str(uuid.uuid4()),
+        'idempotency_key': idempotency_key,
+        'voter': request.user.id,
+        'election': election.id,
+        'candidate': None if sealed else candidate_id,
+        'candidate_name': '' if sealed else election.candidates[candidate_id],
+        'encrypted_vote': get_cipher(election.id).encrypt([candidate_id]) if sealed else '',
+        'rank': rank,
+        'ip_address': request.META.get('REMOTE_ADDR'),
+        'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+        'received_at': timezone.now().isoformat(),
+    }
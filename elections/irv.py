@@ -0,0 +1,214 @@
+"""
+Instant-runoff (IRV) tally engine for ranked_choice elections.
+
+Ballots are loaded once into a compact (voters x ranks) array of candidate
+indices and every elimination round is a handful of NumPy operations over
+that array, so a round costs the same whether there are ten ballots or a
+million.
+"""
+from functools import partial
+
+import numpy as np
+from django.db import connections, transaction
+
+from .ballots import decrypt_ballots
+from .models import Candidate, RunoffResult, Vote
+from .tallies import notify_results_changed
+
+FETCH_SIZE = 50000
+
+
+def _index_dtype(n_candidates):
+    return np.int16 if n_candidates < np.iinfo(np.int16).max else np.int32
+
+
+def build_ballots(voter_ids, candidate_idx, ranks, n_candidates):
+    """
+    Pack flat (voter, candidate index, rank) rows into a ballot array.
+
+    Each row of the result lists a voter's preferences in rank order;
+    unused slots hold n_candidates, the "exhausted" sentinel. Gaps in the
+    submitted ranks are closed up.
+    """
+    voter_ids = np.asarray(voter_ids)
+    candidate_idx = np.asarray(candidate_idx)
+    ranks = np.asarray(ranks)
+    dtype = _index_dtype(n_candidates)
+    if len(voter_ids) == 0:
+        return np.empty((0, 1), dtype=dtype)
+
+    order = np.lexsort((ranks, voter_ids))
+    voter_ids, candidate_idx = voter_ids[order], candidate_idx[order]
+    _, row, per_voter = np.unique(voter_ids, return_inverse=True, return_counts=True)
+    starts = np.concatenate(([0], np.cumsum(per_voter)[:-1]))
+    position = np.arange(len(row)) - np.repeat(starts, per_voter)
+
+    ballots = np.full((len(per_voter), per_voter.max()), n_candidates, dtype=dtype)
+    ballots[row, position] = candidate_idx
+    return ballots
+
+
+def fetch_columns(queryset, fetch_size=FETCH_SIZE):
+    """
+    Read an integer values_list() queryset into an (n, columns) int64
+    array, fetchmany() at a time into a preallocated array, so no Python
+    tuple outlives its chunk.
+    """
+    n_columns = len(queryset.query.values_select)
+    out = np.empty((queryset.count(), n_columns), dtype=np.int64)
+    filled = 0
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        while chunk := cursor.fetchmany(fetch_size):
+            block = np.array(chunk, dtype=np.int64).reshape(-1, n_columns)
+            if filled + len(block) > len(out):
+                # Rows inserted since the count
+                out = np.concatenate([out[:filled], np.empty((len(block) + len(out), n_columns), dtype=np.int64)])
+            out[filled:filled + len(block)] = block
+            filled += len(block)
+    return out[:filled]
+
+
+def load_ballots(election):
+    """
+    Load an election's ranked votes, decrypting them for elections with
+    encrypted ballots. Returns (candidates, ballots) where ballots index
+    into candidates.
+    """
+    candidates = list(Candidate.objects.filter(election=election).only('id', 'name'))
+    if not candidates:
+        return candidates, build_ballots((), (), (), 0)
+    candidate_ids = np.array([c.id for c in candidates], dtype=np.int64)
+    if election.encrypted_ballots:
+        rows = np.array([
+            (ballot_no, c, rank)
+            for ballot_no, ballot in enumerate(decrypt_ballots(election))
+            for rank, c in enumerate(ballot, start=1)
+        ], dtype=np.int64).reshape(-1, 3)
+    else:
+        rows = fetch_columns(
+            Vote.objects.filter(election=election, candidate__isnull=False)
+            .values_list('voter_id', 'candidate_id', 'rank')
+        )
+    # Candidate id -> position in candidates, for all rows at once; rows
+    # for a candidate not on the ballot are dropped
+    sorter = np.argsort(candidate_ids)
+    found = np.searchsorted(candidate_ids, rows[:, 1], sorter=sorter).clip(max=len(sorter) - 1)
+    candidate_idx = sorter[found]
+    known = candidate_ids[candidate_idx] == rows[:, 1]
+    rows, candidate_idx = rows[known], candidate_idx[known]
+    return candidates, build_ballots(rows[:, 0], candidate_idx, rows[:, 2], len(candidates))
+
+
+def run_irv(ballots, n_candidates):
+    """
+    Run instant-runoff rounds over a ballot array from build_ballots().
+
+    Each round counts every ballot for its highest-ranked continuing
+    candidate. A candidate with a majority of the non-exhausted ballots
+    wins; otherwise the candidate with the fewest votes is eliminated.
+    Ties for last place go to the candidate with fewer first-round votes,
+    then to the one listed last.
+
+    Returns a list of rounds:
+    {'tallies': [int] * n_candidates, 'exhausted': int,
+     'eliminated': index or None, 'winner': index or None}
+    """
+    sentinel = n_candidates
+    n_ballots = ballots.shape[0]
+    # A trailing sentinel column means a pointer can never run off the end
+    padded = np.concatenate(
+        [ballots, np.full((n_ballots, 1), sentinel, dtype=ballots.dtype)], axis=1
+    )
+    pointer = np.zeros(n_ballots, dtype=np.intp)
+    current = padded[:, 0].astype(np.intp)
+
+    # Indexed by candidate; the sentinel slot stays False so exhausted
+    # ballots stop moving
+    eliminated = np.zeros(n_candidates + 1, dtype=bool)
+    continuing = np.ones(n_candidates, dtype=bool)
+    first_round = None
+    rounds = []
+
+    while True:
+        counts = np.bincount(current, minlength=n_candidates + 1)
+        tallies, exhausted = counts[:n_candidates], int(counts[sentinel])
+        if first_round is None:
+            first_round = tallies
+        active = int(tallies.sum())
+        remaining = np.flatnonzero(continuing)
+
+        if active == 0:
+            rounds.append(_round(tallies, exhausted, None, None))
+            return rounds
+        leader = remaining[np.argmax(tallies[remaining])]
+        if 2 * tallies[leader] > active or len(remaining) == 1:
+            rounds.append(_round(tallies, exhausted, None, int(leader)))
+            return rounds
+
+        # Lowest tally, then fewest first-round votes, then last listed
+        loser = remaining[np.lexsort((-remaining, first_round[remaining], tallies[remaining]))[0]]
+        rounds.append(_round(tallies, exhausted, int(loser), None))
+        continuing[loser] = False
+        eliminated[loser] = True
+
+        # Move only the ballots sitting on the eliminated candidate forward
+        moving = np.flatnonzero(current == loser)
+        while len(moving):
+            pointer[moving] += 1
+            current[moving] = padded[moving, pointer[moving]]
+            moving = moving[eliminated[current[moving]]]
+
+
+def _round(tallies, exhausted, eliminated, winner):
+    return {
+        'tallies': tallies.tolist(),
+        'exhausted': exhausted,
+        'eliminated': eliminated,
+        'winner': winner,
+    }
+
+
+def runoff_results(election):
+    """
+    Round-by-round IRV results for an election, keyed by candidate id.
+    """
+    candidates, ballots = load_ballots(election)
+    rounds = run_irv(ballots, len(candidates))
+
+    def candidate(index):
+        if index is None:
+            return None
+        return {'id': candidates[index].id, 'name': candidates[index].name}
+
+    return {
+        'id': election.id,
+        'name': election.name,
+        'ballots': int(ballots.shape[0]),
+        'winner': candidate(rounds[-1]['winner']),
+        'rounds': [
+            {
+                'round': number,
+                'candidates': [
+                    {'id': c.id, 'name': c.name, 'votes': r['tallies'][i]}
+                    for i, c in enumerate(candidates)
+                ],
+                'exhausted': r['exhausted'],
+                'eliminated': candidate(r['eliminated']),
+            }
+            for number, r in enumerate(rounds, start=1)
+        ],
+    }
+
+
+def store_runoff(election):
+    """
+    Compute an encrypted-ballot election's runoff and store it for the
+    results view. Returns the stored results.
+    """
+    data = runoff_results(election)
+    with transaction.atomic():
+        RunoffResult.objects.update_or_create(election=election, defaults={'data': data})
+        transaction.on_commit(partial(notify_results_changed, election.id))
+    return data
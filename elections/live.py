@@ -0,0 +1,211 @@
+"""
+Live results push.
+
+Vote commits publish the election id on a pub/sub backend. Each worker
+process keeps one broadcaster per watched election: when notified it
+reads the tallies at most once per tick and fans the changed counts out
+to every connected subscriber, so the read cost does not grow with the
+number of watchers.
+
+Streaming needs an ASGI server (e.g. ``uvicorn voting_system_backend.asgi:application``);
+under WSGI the view answers 501.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .signals import results_changed
+from .tallies import candidate_totals
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'elections.live.InMemoryPubSub',
+    'TICK': 1.0,
+    'KEEPALIVE': 15.0,
+    'QUEUE_SIZE': 16,
+}
+
+
+def _conf(name):
+    return getattr(settings, 'LIVE_RESULTS', {}).get(name, DEFAULTS[name])
+
+
+class InMemoryPubSub:
+    """
+    Process-local pub/sub. Publishers and subscribers must live in the same
+    process; use a shared backend (e.g. Redis) with the same interface when
+    votes and streams are served by different workers.
+    """
+    def __init__(self):
+        self._listeners = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            listeners = list(self._listeners.get(channel, ()))
+        for callback in listeners:
+            callback(message)
+
+    def subscribe(self, channel, callback):
+        """
+        Call callback(message) for every message on channel.
+        Returns a function that cancels the subscription.
+        """
+        with self._lock:
+            self._listeners[channel].add(callback)
+
+        def unsubscribe():
+            with self._lock:
+                self._listeners[channel].discard(callback)
+                if not self._listeners[channel]:
+                    del self._listeners[channel]
+        return unsubscribe
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = import_string(_conf('BACKEND'))()
+        return _backend
+
+
+def _channel(election_id):
+    return f'results:{election_id}'
+
+
+@receiver(results_changed)
+def _publish_on_change(sender, election_id, **kwargs):
+    get_backend().publish(_channel(election_id), election_id)
+
+
+class ElectionBroadcaster:
+    """
+    Fans tally updates for one election out to its subscribers. Runs on the
+    event loop that created it and stops when the last subscriber leaves or
+    the tallies cannot be read; subscribers then receive None and close.
+    """
+    def __init__(self, election_id):
+        self.election_id = election_id
+        self.subscribers = set()
+        self.snapshot = None
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._unsubscribe = None
+        self._task = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=_conf('QUEUE_SIZE'))
+        self.subscribers.add(queue)
+        if self.snapshot is not None:
+            queue.put_nowait(('results', self.snapshot))
+        if self._task is None:
+            self._unsubscribe = get_backend().subscribe(_channel(self.election_id), self._notify)
+            self._changed.set()
+            self._task = self._loop.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._stop()
+
+    def _stop(self):
+        self._unsubscribe()
+        self._task = None
+        _broadcasters.pop((self._loop, self.election_id), None)
+
+    def _notify(self, message):
+        # Called from whichever thread committed the vote
+        self._loop.call_soon_threadsafe(self._changed.set)
+
+    async def _run(self):
+        read = sync_to_async(candidate_totals)
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            try:
+                totals = {c['id']: c for c in await read(self.election_id)}
+            except Exception:
+                logger.exception('Live results for election %s failed; closing its streams', self.election_id)
+                self._close()
+                return
+            if self.snapshot is None:
+                self.snapshot = {'id': self.election_id, 'candidates': list(totals.values())}
+                self._send('results', self.snapshot)
+            else:
+                previous = {c['id']: c for c in self.snapshot['candidates']}
+                changed = [c for cid, c in totals.items() if previous.get(cid) != c]
+                removed = [cid for cid in previous if cid not in totals]
+                self.snapshot = {'id': self.election_id, 'candidates': list(totals.values())}
+                if changed or removed:
+                    self._send('delta', {'id': self.election_id, 'candidates': changed, 'removed': removed})
+            # Coalesce bursts of votes into one read per tick
+            await asyncio.sleep(_conf('TICK'))
+
+    def _send(self, event, data):
+        for queue in self.subscribers:
+            if queue.full():
+                # Slow client: drop its backlog and resync with a full snapshot
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(('results', self.snapshot))
+            else:
+                queue.put_nowait((event, data))
+
+    def _close(self):
+        for queue in self.subscribers:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+        self.subscribers.clear()
+        self._stop()
+
+
+# Keyed by (event loop, election id): a broadcaster's task and event belong
+# to the loop that created it
+_broadcasters = {}
+
+
+def get_broadcaster(election_id):
+    key = (asyncio.get_running_loop(), election_id)
+    broadcaster = _broadcasters.get(key)
+    if broadcaster is None:
+        broadcaster = _broadcasters[key] = ElectionBroadcaster(election_id)
+    return broadcaster
+
+
+async def event_stream(election_id):
+    """
+    Server-Sent Events for an election: a 'results' snapshot first, then
+    'delta' events listing only the candidates whose counts changed. Ends
+    when the broadcaster closes the stream.
+    """
+    broadcaster = get_broadcaster(election_id)
+    queue = broadcaster.subscribe()
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=_conf('KEEPALIVE'))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if message is None:
+                return
+            event, data = message
+            yield f'event: {event}\ndata: {json.dumps(data)}\n\n'
+    finally:
+        broadcaster.unsubscribe(queue)
@@ -0,0 +1,68 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from elections.audit import entry, verify_chain, write_entries
+from elections.models import Election
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures hash-chained audit log append and verification throughput. '
+        'Creates and removes its own election.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=100000)
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        n = options['entries']
+        batch_size = options['batch_size']
+        now = timezone.now()
+        election = Election.objects.create(
+            name='bench-audit-chain', description='benchmark',
+            start_time=now - datetime.timedelta(hours=1),
+            end_time=now + datetime.timedelta(hours=1),
+        )
+        try:
+            half = n // 2
+            start = time.perf_counter()
+            for offset in range(0, half, batch_size):
+                with transaction.atomic():
+                    write_entries([
+                        entry(election.id, None, 'vote_cast', f'Entry {i}', '10.0.0.1')
+                        for i in range(offset, min(offset + batch_size, half))
+                    ])
+            append = time.perf_counter() - start
+            self.stdout.write(f'append: {half} entries in batches of {batch_size}, {half / append:,.0f}/s')
+
+            start = time.perf_counter()
+            checked, _ = verify_chain(election.id)
+            full = time.perf_counter() - start
+            self.stdout.write(f'verify (no checkpoint yet): {checked} entries, {checked / full:,.0f}/s')
+
+            for offset in range(half, n, batch_size):
+                with transaction.atomic():
+                    write_entries([
+                        entry(election.id, None, 'vote_cast', f'Entry {i}', '10.0.0.1')
+                        for i in range(offset, min(offset + batch_size, n))
+                    ])
+
+            start = time.perf_counter()
+            checked, _ = verify_chain(election.id)
+            incremental = time.perf_counter() - start
+            self.stdout.write(
+                f'verify from checkpoint: {checked} new of {n} entries in {incremental:.2f}s '
+                f'({checked / incremental:,.0f}/s)'
+            )
+
+            start = time.perf_counter()
+            checked, _ = verify_chain(election.id, full=True, checkpoint=False)
+            rehash = time.perf_counter() - start
+            self.stdout.write(f'verify --full: {checked} entries in {rehash:.2f}s')
+        finally:
+            election.delete()
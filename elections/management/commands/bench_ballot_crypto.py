@@ -0,0 +1,42 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from elections.ballots import get_cipher, parallel_tally
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures encrypted-ballot throughput: sealing ballots on the cast '
+        'path, and decrypting and tallying them at 1, 4 and N worker processes. '
+        'Works in memory; nothing is written to the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ballots', type=int, default=200000)
+        parser.add_argument('--candidates', type=int, default=10)
+        parser.add_argument('--ranked', action='store_true', help='Rank every candidate on each ballot')
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, os.cpu_count()])
+
+    def handle(self, *args, **options):
+        n = options['ballots']
+        m = options['candidates']
+        election_id = 0
+        cipher = get_cipher(election_id)
+        ballots = [
+            [(i + j) % m + 1 for j in range(m)] if options['ranked'] else [i % m + 1]
+            for i in range(n)
+        ]
+
+        start = time.perf_counter()
+        tokens = [cipher.encrypt(ballot) for ballot in ballots]
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'encrypt: {n} ballots, {n / elapsed:,.0f} ballots/s ({elapsed / n * 1e6:.1f} us each)')
+
+        for workers in dict.fromkeys(options['workers']):
+            start = time.perf_counter()
+            counts, total, invalid = parallel_tally(tokens, election_id, options['ranked'], workers)
+            elapsed = time.perf_counter() - start
+            assert total == n and not invalid
+            self.stdout.write(f'tally, {workers:>2} workers: {n / elapsed:,.0f} ballots/s ({elapsed:.2f}s)')
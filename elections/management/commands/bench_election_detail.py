@@ -0,0 +1,61 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from elections.models import Candidate, Election
+from elections.views import ElectionDetailView
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures requests/sec on GET /api/elections/<id>/ rendered on every '
+        'request, served from the rendered-bytes cache, and answered with 304 '
+        'for a matching If-None-Match. Creates and removes its own election.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--candidates', type=int, default=20)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        election = Election.objects.create(
+            name='bench-detail', description='benchmark ' * 20,
+            start_time=now - datetime.timedelta(hours=1),
+            end_time=now + datetime.timedelta(hours=1),
+        )
+        Candidate.objects.bulk_create(
+            Candidate(election=election, name=f'Candidate {i}', description='A candidate. ' * 10, order=i)
+            for i in range(options['candidates'])
+        )
+        factory = APIRequestFactory(HTTP_HOST='localhost')
+        view = ElectionDetailView.as_view()
+        path = f'/api/elections/{election.id}/'
+
+        def run(label, headers=None):
+            n = options['requests']
+            # Warm up (and fill the cache)
+            response = view(factory.get(path, **(headers or {})), pk=election.id)
+            start = time.perf_counter()
+            for _ in range(n):
+                response = view(factory.get(path, **(headers or {})), pk=election.id)
+                if hasattr(response, 'render'):
+                    response.render()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{label:<24} {n / elapsed:9,.0f} req/s  {elapsed / n * 1e6:7.1f} us/req  '
+                f'status {response.status_code}, {len(response.content):,} bytes'
+            )
+            return response
+
+        try:
+            with override_settings(RENDERED_CACHE={'ENABLED': False}):
+                run('serialized every time')
+            response = run('cached bytes')
+            run('If-None-Match -> 304', {'HTTP_IF_NONE_MATCH': response['ETag']})
+        finally:
+            election.delete()
@@ -0,0 +1,89 @@
+import datetime
+import statistics
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from elections.models import Election, VoterEligibility
+from elections.views import ElectionListView
+
+
+class Command(BaseCommand):
+    help = (
+        'Times GET /api/elections/ (first page, a page deep in the list and '
+        'filtered pages) as the number of elections grows. Creates and '
+        'removes its own elections and user.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        user = User.objects.create(username=f'bench-list-{time.time_ns()}')
+        # Next links are absolute URLs, so the host must be allowed
+        factory = APIRequestFactory(HTTP_HOST='localhost')
+        view = ElectionListView.as_view()
+        now = timezone.now()
+        created = 0
+
+        def get(query):
+            request = factory.get('/api/elections/', query)
+            force_authenticate(request, user=user)
+            response = view(request)
+            response.render()
+            return response
+
+        def timed(query):
+            times = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                get(query)
+                times.append(time.perf_counter() - start)
+            return statistics.median(times) * 1000
+
+        try:
+            for size in sorted(options['sizes']):
+                # Hourly elections, growing further into the past as history
+                # piles up; every 10th is private and the user is eligible for
+                # a tenth of those
+                elections = Election.objects.bulk_create(
+                    Election(
+                        name=f'bench-list-{i}', description='benchmark',
+                        start_time=now + datetime.timedelta(hours=50 - i),
+                        end_time=now + datetime.timedelta(hours=53 - i),
+                        visibility='private' if i % 10 == 0 else 'public',
+                        election_type='ranked_choice' if i % 3 == 0 else 'single_choice',
+                    )
+                    for i in range(created, size)
+                )
+                VoterEligibility.objects.bulk_create(
+                    VoterEligibility(election=e, voter=user) for e in elections if e.name.endswith('00')
+                )
+                created = size
+
+                # A cursor about half way down the list
+                query, deep = {}, None
+                for _ in range(min(size // 40, 50)):
+                    deep = get(query).data['next']
+                    if not deep:
+                        break
+                    query = {'cursor': parse_qs(urlsplit(deep).query)['cursor'][0]}
+                cases = [
+                    ('first page', {}),
+                    ('deep page', query),
+                    ('status=open', {'status': 'open'}),
+                    ('status=closed', {'status': 'closed'}),
+                    ('visibility=private', {'visibility': 'private'}),
+                    ('type=ranked_choice', {'type': 'ranked_choice'}),
+                ]
+                self.stdout.write(f'{Election.objects.count():,} elections:')
+                for label, query in cases:
+                    self.stdout.write(f'  {label:<20} {timed(query):7.2f} ms')
+        finally:
+            Election.objects.filter(name__startswith='bench-list-').delete()
+            user.delete()
@@ -0,0 +1,115 @@
+import datetime
+import time
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from elections.irv import build_ballots, load_ballots, run_irv, runoff_results
+from elections.models import Candidate, Election, Vote
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the instant-runoff engine on synthetic ranked ballots. '
+        'With --database the ballots are stored as Vote rows of a temporary '
+        'election and runoff_results() is timed end to end, as the endpoint '
+        'runs it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ballots', type=int, default=1_000_000)
+        parser.add_argument('--candidates', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--database', action='store_true', help='load the ballots from Vote rows')
+        parser.add_argument('--batch-size', type=int, default=20000, help='rows per insert with --database')
+
+    def handle(self, *args, **options):
+        n_ballots = options['ballots']
+        n_candidates = options['candidates']
+        rng = np.random.default_rng(options['seed'])
+
+        # Each voter ranks a random prefix of a random permutation, with a
+        # skewed popularity so the runoff needs several rounds
+        self.stdout.write(f'Generating {n_ballots:,} ballots x {n_candidates} candidates...')
+        weights = rng.random((n_ballots, n_candidates)) ** np.linspace(1.0, 3.0, n_candidates)
+        preferences = np.argsort(-weights, axis=1)
+        lengths = rng.integers(1, n_candidates + 1, size=n_ballots)
+        keep = np.arange(n_candidates) < lengths[:, None]
+        voters = np.broadcast_to(np.arange(n_ballots)[:, None], keep.shape)[keep]
+        ranks = np.broadcast_to(np.arange(1, n_candidates + 1), keep.shape)[keep]
+        candidates = preferences[keep]
+        self.stdout.write(f'{len(candidates):,} vote rows')
+
+        if options['database']:
+            self.bench_database(voters, candidates, ranks, options)
+            return
+
+        start = time.perf_counter()
+        ballots = build_ballots(voters, candidates, ranks, n_candidates)
+        self.stdout.write(f'build_ballots: {time.perf_counter() - start:.3f}s')
+
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            rounds = run_irv(ballots, n_candidates)
+            timings.append(time.perf_counter() - start)
+
+        best = min(timings)
+        self.stdout.write(
+            f'run_irv: {len(rounds)} rounds, best {best:.3f}s of {len(timings)} '
+            f'({n_ballots / best:,.0f} ballots/s), winner index {rounds[-1]["winner"]}'
+        )
+
+    def bench_database(self, voters, candidate_idx, ranks, options):
+        n_ballots = options['ballots']
+        batch_size = options['batch_size']
+        now = timezone.now()
+        election = Election.objects.create(
+            name='bench-irv', description='benchmark', election_type='ranked_choice',
+            start_time=now - datetime.timedelta(days=2), end_time=now - datetime.timedelta(days=1),
+        )
+        prefix = f'bench-irv-{election.id}-'
+        try:
+            start = time.perf_counter()
+            candidates = Candidate.objects.bulk_create(
+                Candidate(election=election, name=f'Candidate {i}', order=i) for i in range(options['candidates'])
+            )
+            candidate_ids = np.array([c.id for c in candidates])
+            for offset in range(0, n_ballots, batch_size):
+                User.objects.bulk_create(
+                    User(username=f'{prefix}{i}', password='!') for i in range(offset, min(offset + batch_size, n_ballots))
+                )
+            user_ids = np.array(
+                User.objects.filter(username__startswith=prefix).order_by('id').values_list('id', flat=True)
+            )
+            for offset in range(0, len(voters), batch_size):
+                end = offset + batch_size
+                with transaction.atomic():
+                    Vote.objects.bulk_create(
+                        Vote(election_id=election.id, voter_id=int(v), candidate_id=int(c), rank=int(r))
+                        for v, c, r in zip(
+                            user_ids[voters[offset:end]], candidate_ids[candidate_idx[offset:end]], ranks[offset:end]
+                        )
+                    )
+            self.stdout.write(f'stored {len(voters):,} votes in {time.perf_counter() - start:.1f}s')
+
+            load, total = [], []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                load_ballots(election)
+                load.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                results = runoff_results(election)
+                total.append(time.perf_counter() - start)
+            best = min(total)
+            self.stdout.write(
+                f'load_ballots: best {min(load):.3f}s; runoff_results: {len(results["rounds"])} rounds, '
+                f'best {best:.3f}s of {len(total)} ({n_ballots / best:,.0f} ballots/s), '
+                f'winner {results["winner"]["name"] if results["winner"] else None}'
+            )
+        finally:
+            election.delete()
+            User.objects.filter(username__startswith=prefix).delete()
@@ -0,0 +1,117 @@
+import datetime
+import decimal
+import io
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from elections import renderers
+from elections.models import Election
+from elections.serializers import ElectionSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmarks DRF's JSONRenderer/JSONParser against the "
+        'orjson-backed FastJSONRenderer/FastJSONParser on election list, '
+        'detail, results and runoff payloads. Needs no database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--elections', type=int, default=100, help='elections per list page')
+        parser.add_argument('--candidates', type=int, default=20)
+        parser.add_argument('--rounds', type=int, default=10, help='runoff rounds')
+        parser.add_argument('--seconds', type=float, default=0.5, help='time per case')
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stdout.write('orjson is not installed; the fast classes fall back to the stdlib.')
+        payloads = self.payloads(options)
+        drf_renderer, fast_renderer = JSONRenderer(), renderers.FastJSONRenderer()
+        drf_parser, fast_parser = JSONParser(), renderers.FastJSONParser()
+        context = {'encoding': 'utf-8'}
+
+        self.stdout.write(f'{"payload":<28}{"bytes":>9}  {"render drf":>11}{"fast":>9}{"x":>6}  {"parse drf":>11}{"fast":>9}{"x":>6}')
+        for name, data in payloads:
+            body = drf_renderer.render(data)
+            assert fast_renderer.render(data) == body, f'{name}: renderers disagree'
+            times = [
+                self.time(lambda: drf_renderer.render(data), options['seconds']),
+                self.time(lambda: fast_renderer.render(data), options['seconds']),
+                self.time(lambda: drf_parser.parse(io.BytesIO(body), parser_context=context), options['seconds']),
+                self.time(lambda: fast_parser.parse(io.BytesIO(body), parser_context=context), options['seconds']),
+            ]
+            self.stdout.write(
+                f'{name:<28}{len(body):>9,}  '
+                f'{times[0]:>9.1f}us{times[1]:>7.1f}us{times[0] / times[1]:>5.1f}x  '
+                f'{times[2]:>9.1f}us{times[3]:>7.1f}us{times[2] / times[3]:>5.1f}x'
+            )
+
+    def time(self, func, seconds):
+        """
+        Microseconds per call, from the best of three runs.
+        """
+        number, elapsed = 1, 0
+        while elapsed < seconds / 10:
+            number *= 2
+            elapsed = timeit.timeit(func, number=number)
+        number = max(1, int(number * seconds / 3 / elapsed))
+        return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+    def payloads(self, options):
+        """
+        Serializer output for unsaved elections, plus result payloads
+        shaped like ResultsView and RunoffResultsView responses.
+        """
+        now = timezone.now()
+        elections = [
+            Election(
+                id=i, name=f'Student council election {i}',
+                description='Elect the student council for the coming academic year. ' * 3,
+                start_time=now + datetime.timedelta(days=i), end_time=now + datetime.timedelta(days=i + 7),
+            )
+            for i in range(1, options['elections'] + 1)
+        ]
+        candidates = [
+            {'id': i, 'name': f'Candidate {i} Ñoño'} for i in range(1, options['candidates'] + 1)
+        ]
+        election = elections[0]
+        # ElectionDetailSerializer's shape without its candidates query
+        detail = dict(ElectionSerializer(election).data, candidates=candidates)
+        results = {
+            'id': election.id, 'name': election.name,
+            'candidates': [dict(c, votes=1000 + 37 * c['id']) for c in candidates],
+        }
+        runoff = {
+            'id': election.id, 'name': election.name, 'ballots': 250000,
+            'winner': candidates[0],
+            'rounds': [
+                {
+                    'round': r,
+                    'candidates': [dict(c, votes=5000 + 11 * c['id'] * r) for c in candidates[:len(candidates) - r]],
+                    'eliminated': candidates[len(candidates) - r - 1] if r < len(candidates) else None,
+                    'exhausted': 17 * r,
+                }
+                for r in range(1, options['rounds'] + 1)
+            ],
+        }
+        # Native types left to the renderer, as views returning plain dicts
+        # or model values do
+        native = [
+            {
+                'id': e.id, 'name': e.name, 'start_time': e.start_time, 'end_time': e.end_time,
+                'voting_start_time': datetime.time(8, 0), 'turnout': decimal.Decimal('61.25'),
+            }
+            for e in elections
+        ]
+        return [
+            ('election list page', {'next': 'http://localhost/api/elections/?cursor=abc', 'results': ElectionSerializer(elections, many=True).data}),
+            ('election detail', detail),
+            ('results', results),
+            ('runoff rounds', runoff),
+            ('native datetime/Decimal', native),
+            ('ballot request', {'election': 1, 'candidates': [c['id'] for c in candidates]}),
+        ]
@@ -0,0 +1,132 @@
+import datetime
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from elections.models import Candidate, Election
+from elections.snapshots import invalidate_snapshot
+from elections.tallies import candidate_totals
+from elections.views import VoteView
+from elections.writer import stop_writer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares concurrent vote writes and results/listing reads on the '
+        'stock SQLite setup (rollback journal, no writer thread) and on the '
+        'WAL profile from settings. Each profile runs against a fresh '
+        'throwaway database file; the configured database is not touched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votes', type=int, default=2000)
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        base = connections['default'].settings_dict
+        if base['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('The default database is not SQLite')
+        profiles = [
+            ('stock', {}, False),
+            ('wal', base.get('OPTIONS', {}), True),
+        ]
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                for name, db_options, writer in profiles:
+                    self.use_database(dict(base, NAME=os.path.join(tmp, f'{name}.sqlite3'), OPTIONS=db_options))
+                    call_command('migrate', verbosity=0, interactive=False)
+                    # Audit entries are written inside the vote transaction so
+                    # no background thread keeps a connection to the old file
+                    with override_settings(
+                        DB_WRITER={'ENABLED': writer}, VOTE_INGEST={'ENABLED': False}, AUDIT_LOG={'ASYNC': False},
+                        REST_FRAMEWORK=dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={}),
+                    ):
+                        self.run(name, options)
+                    stop_writer()
+                    connections.close_all()
+        finally:
+            self.use_database(base)
+
+    def use_database(self, settings_dict):
+        connections.close_all()
+        connections.settings['default'] = settings_dict
+        del connections['default']
+
+    def run(self, name, options):
+        n = options['votes']
+        now = timezone.now()
+        election = Election.objects.create(
+            name=f'bench-sqlite-{name}', description='benchmark',
+            start_time=now - datetime.timedelta(hours=1),
+            end_time=now + datetime.timedelta(hours=1),
+        )
+        invalidate_snapshot(election.id)
+        candidates = Candidate.objects.bulk_create(
+            Candidate(election=election, name=f'Candidate {i}', order=i) for i in range(5)
+        )
+        User.objects.bulk_create(User(username=f'bench-sqlite-{i}') for i in range(n))
+        users = list(User.objects.filter(username__startswith='bench-sqlite-').order_by('id'))
+
+        factory = APIRequestFactory()
+        view = VoteView.as_view()
+        done = threading.Event()
+
+        def cast(i):
+            request = factory.post(
+                '/api/vote/',
+                {'election': election.id, 'candidate': candidates[i % len(candidates)].id},
+                format='json'
+            )
+            force_authenticate(request, user=users[i])
+            start = time.perf_counter()
+            status = view(request).status_code
+            return status, time.perf_counter() - start
+
+        def read():
+            reads = 0
+            try:
+                while not done.is_set():
+                    candidate_totals(election)
+                    list(Election.objects.values('id', 'name', 'start_time', 'end_time')[:50])
+                    reads += 1
+            finally:
+                connection.close()
+            return reads
+
+        def cast_and_close(i):
+            try:
+                return cast(i)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max(options['readers'], 1)) as readers:
+            pending_reads = [readers.submit(read) for _ in range(options['readers'])]
+            start = time.perf_counter()
+            with ThreadPoolExecutor(options['writers']) as writers:
+                results = list(writers.map(cast_and_close, range(n)))
+            elapsed = time.perf_counter() - start
+            done.set()
+            reads = sum(f.result() for f in pending_reads)
+
+        failed = sum(1 for status, _ in results if status >= 300)
+        latencies = sorted(t for _, t in results)
+        self.stdout.write(
+            f'{name:>5}: {n} votes, {options["writers"]} writers, {options["readers"]} readers; '
+            f'{n / elapsed:,.0f} votes/s, {failed} failed, '
+            f'p50 {statistics.median(latencies) * 1000:.1f} ms, '
+            f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms; '
+            f'{reads / elapsed:,.0f} reads/s'
+        )
@@ -0,0 +1,81 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from elections.models import Candidate, Election
+from elections.snapshots import invalidate_snapshot
+from elections.views import BallotView, VoteView
+
+
+class Command(BaseCommand):
+    help = (
+        'Counts the SQL queries issued per vote on the vote and ballot '
+        'endpoints, with a cold and a warm election snapshot. Creates and '
+        'removes its own election and users.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votes', type=int, default=20)
+        parser.add_argument('--candidates', type=int, default=10)
+
+    def handle(self, *args, **options):
+        n = options['votes']
+        now = timezone.now()
+        elections = {
+            kind: Election.objects.create(
+                name=f'bench-queries-{kind}', description='benchmark', election_type=kind,
+                start_time=now - datetime.timedelta(hours=1),
+                end_time=now + datetime.timedelta(hours=1),
+            )
+            for kind in ('single_choice', 'ranked_choice')
+        }
+        candidates = {
+            kind: Candidate.objects.bulk_create(
+                Candidate(election=election, name=f'Candidate {i}', order=i)
+                for i in range(options['candidates'])
+            )
+            for kind, election in elections.items()
+        }
+        prefix = f"bench-queries-{elections['single_choice'].id}-"
+        User.objects.bulk_create(User(username=f'{prefix}{i}') for i in range(2 * n + 2))
+        users = iter(User.objects.filter(username__startswith=prefix).order_by('id'))
+
+        factory = APIRequestFactory()
+        single = elections['single_choice']
+        ranked = elections['ranked_choice']
+        cases = [
+            ('vote', VoteView.as_view(), '/api/vote/', single,
+             lambda: {'election': single.id, 'candidate': candidates['single_choice'][0].id}),
+            ('ballot (ranked, %d candidates)' % options['candidates'], BallotView.as_view(), '/api/ballot/', ranked,
+             lambda: {'election': ranked.id, 'candidates': [c.id for c in candidates['ranked_choice']]}),
+        ]
+
+        try:
+            for label, view, path, election, payload in cases:
+                def cast():
+                    request = factory.post(path, payload(), format='json')
+                    force_authenticate(request, user=next(users))
+                    with CaptureQueriesContext(connection) as queries:
+                        response = view(request)
+                    assert response.status_code < 300, response.data
+                    return len(queries)
+
+                invalidate_snapshot(election.id)
+                # Keep the writes on this connection so they are counted
+                with override_settings(DB_WRITER={'ENABLED': False}):
+                    cold = cast()
+                    warm = [cast() for _ in range(n)]
+                self.stdout.write(
+                    f'{label}: cold snapshot {cold} queries, '
+                    f'warm {sum(warm) / len(warm):.1f} queries per vote'
+                )
+        finally:
+            for election in elections.values():
+                election.delete()
+            User.objects.filter(username__startswith=prefix).delete()
@@ -0,0 +1,116 @@
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.authentication import StatelessJWTAuthentication, VersionedJWTAuthentication
+from accounts.tokens import RoleTokenObtainPairSerializer
+from elections.audit import get_writer as get_audit_writer
+from elections.models import Candidate, Election
+from elections.views import VoteView
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures sustained votes/sec through VoteView, either writing inline '
+        'or through the write-behind ingestion queue, and with users forced '
+        'onto requests or authenticated from real access tokens (loading the '
+        'user, or statelessly from claims). Creates and removes its own '
+        'election and users.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votes', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--mode', choices=['direct', 'ingest', 'both'], default='both')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--flush-interval', type=float, default=0.2)
+        parser.add_argument(
+            '--auth', choices=['force', 'jwt', 'stateless', 'compare'], default='force',
+            help='force_authenticate, Bearer tokens through VersionedJWTAuthentication '
+                 'or StatelessJWTAuthentication, or both token classes'
+        )
+
+    def handle(self, *args, **options):
+        modes = ['direct', 'ingest'] if options['mode'] == 'both' else [options['mode']]
+        auths = ['jwt', 'stateless'] if options['auth'] == 'compare' else [options['auth']]
+        for auth in auths:
+            rates = {}
+            for mode in modes:
+                rates[mode] = self.run(mode, auth, options)
+            if len(rates) == 2:
+                self.stdout.write(f"Speed-up: {rates['ingest'] / rates['direct']:.1f}x")
+
+    def run(self, mode, auth, options):
+        n = options['votes']
+        now = timezone.now()
+        election = Election.objects.create(
+            name=f'bench-votes-{mode}', description='benchmark',
+            start_time=now - datetime.timedelta(hours=1),
+            end_time=now + datetime.timedelta(hours=1),
+        )
+        candidates = Candidate.objects.bulk_create(
+            Candidate(election=election, name=f'Candidate {i}', order=i) for i in range(5)
+        )
+        prefix = f'bench-{mode}-{election.id}-'
+        users = User.objects.bulk_create(User(username=f'{prefix}{i}') for i in range(n))
+        if not users[0].pk:
+            users = list(User.objects.filter(username__startswith=prefix).order_by('id'))
+
+        factory = APIRequestFactory()
+        if auth == 'force':
+            view = VoteView.as_view()
+        else:
+            authentication = StatelessJWTAuthentication if auth == 'stateless' else VersionedJWTAuthentication
+            view = VoteView.as_view(authentication_classes=[authentication])
+            headers = [
+                f'Bearer {RoleTokenObtainPairSerializer.get_token(user).access_token}' for user in users
+            ]
+
+        def cast(i):
+            request = factory.post(
+                '/api/vote/',
+                {'election': election.id, 'candidate': candidates[i % len(candidates)].id},
+                format='json',
+                **({} if auth == 'force' else {'HTTP_AUTHORIZATION': headers[i]})
+            )
+            if auth == 'force':
+                force_authenticate(request, user=users[i])
+            return view(request).status_code
+
+        ingest = {
+            'ENABLED': mode == 'ingest',
+            'BATCH_SIZE': options['batch_size'],
+            'FLUSH_INTERVAL': options['flush_interval'],
+        }
+        try:
+            # Every request comes from one test IP; measure without throttling
+            unthrottled = dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={})
+            with override_settings(VOTE_INGEST=ingest, REST_FRAMEWORK=unthrottled):
+                start = time.perf_counter()
+                with ThreadPoolExecutor(options['threads']) as pool:
+                    statuses = list(pool.map(cast, range(n)))
+                acked = time.perf_counter() - start
+                if mode == 'ingest':
+                    from elections.ingest import get_ingestor
+                    get_ingestor().drain()
+                stored = time.perf_counter() - start
+
+            failed = sum(1 for s in statuses if s >= 300)
+            rate = n / stored
+            self.stdout.write(
+                f'{mode:>7} ({auth}): {n} votes, {options["threads"]} threads, {failed} failed; '
+                f'acknowledged {n / acked:,.0f}/s, stored {rate:,.0f}/s'
+            )
+            return rate
+        finally:
+            # Buffered log entries must land before their election goes
+            get_audit_writer().flush()
+            election.delete()
+            User.objects.filter(username__startswith=prefix).delete()
@@ -0,0 +1,49 @@
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from elections.eligibility import guess_format, import_eligibility, read_identifiers
+from elections.models import Election
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams a CSV or JSON-lines file of usernames or emails into an '
+        "election's eligible voters. Use - to read standard input."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('election', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            election = Election.objects.get(pk=options['election'])
+        except Election.DoesNotExist:
+            raise CommandError(f"Election {options['election']} does not exist")
+        fmt = options['format'] or guess_format(options['path'])
+
+        def progress(stats):
+            self.stderr.write(
+                f'\r{stats.rows:,} rows, {stats.matched:,} matched, {stats.unknown:,} unknown, '
+                f'{stats.rate:,.0f} rows/s', ending=''
+            )
+
+        if options['path'] == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+        else:
+            try:
+                stream = open(options['path'], encoding='utf-8-sig', newline='')
+            except OSError as exc:
+                raise CommandError(exc)
+        with stream:
+            stats = import_eligibility(
+                election, read_identifiers(stream, fmt), options['batch_size'], progress
+            )
+        self.stderr.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'{election.name}: {stats.rows:,} rows in {stats.elapsed:.1f}s ({stats.rate:,.0f} rows/s), '
+            f'{stats.matched:,} matched, {stats.unknown:,} unknown'
+        ))
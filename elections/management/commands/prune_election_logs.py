@@ -0,0 +1,47 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+from elections.models import AuditCheckpoint, ElectionLog
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes ElectionLog rows older than --days. Only entries before a '
+        'verified checkpoint (see verify_election_logs) that is itself older '
+        'than --days are removed. '
+        "Configure the AUDIT_LOG['FILE'] archive first if the entries must be retained."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, required=True)
+        parser.add_argument('--action', action='append', dest='actions',
+                            help='Only prune this action (may be repeated), e.g. vote_cast')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('--days must not be negative')
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        # Prune up to the latest checkpoint whose entry is older than the
+        # cutoff. Unverified entries stay until a checkpoint covers them, and
+        # the checkpointed entry itself anchors the next full verification
+        old_entry = ElectionLog.objects.filter(
+            election=OuterRef('election'), sequence=OuterRef('sequence'), timestamp__lt=cutoff
+        )
+        checkpoint = AuditCheckpoint.objects.filter(
+            Exists(old_entry), election=OuterRef('election')
+        ).order_by('-sequence')
+        qs = ElectionLog.objects.filter(sequence__lt=Subquery(checkpoint.values('sequence')[:1]))
+        if options['actions']:
+            qs = qs.filter(action__in=options['actions'])
+
+        # Delete in chunks so the table is not locked for one huge statement
+        deleted = 0
+        while True:
+            ids = list(qs.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += ElectionLog.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} log entries older than {cutoff:%Y-%m-%d %H:%M}'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from elections.tallies import diff_tallies, rebuild_tallies
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds or reconciles the VoteTally table from the raw Vote rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--election', type=int, action='append', dest='elections',
+            help='Only process this election id (may be repeated)'
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Report drift between tallies and votes without writing'
+        )
+
+    def handle(self, *args, **options):
+        election_ids = options['elections']
+
+        drift = diff_tallies(election_ids)
+        for (election_id, candidate_id, rank), (stored, actual) in sorted(drift.items()):
+            self.stdout.write(
+                f'Election {election_id}, candidate {candidate_id}, rank {rank}: '
+                f'tally {stored}, votes {actual}'
+            )
+
+        if options['check']:
+            if drift:
+                self.stdout.write(self.style.WARNING(f'{len(drift)} tally rows out of sync'))
+            else:
+                self.stdout.write(self.style.SUCCESS('Tallies are in sync'))
+            return
+
+        written = rebuild_tallies(election_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} tally rows ({len(drift)} were out of sync)'
+        ))
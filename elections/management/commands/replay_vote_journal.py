@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from elections.ingest import replay_orphaned_journals
+
+
+class Command(BaseCommand):
+    help = 'Writes votes left in write-behind journals by stopped or crashed processes'
+
+    def handle(self, *args, **options):
+        written = replay_orphaned_journals()
+        self.stdout.write(self.style.SUCCESS(f'Replayed {written} journaled votes'))
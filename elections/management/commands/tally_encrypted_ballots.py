@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from elections.ballots import tally_encrypted
+from elections.irv import store_runoff
+from elections.models import Election
+
+
+class Command(BaseCommand):
+    help = (
+        'Decrypts and counts the ballots of ended encrypted-ballot elections and '
+        'stores the runoff of ranked choice ones'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--election', type=int, action='append', dest='elections',
+            help='Only tally this election id (may be repeated)'
+        )
+        parser.add_argument('--workers', type=int, help="Worker processes (default BALLOT_ENCRYPTION['WORKERS'] or CPU count)")
+        parser.add_argument('--force', action='store_true', help='Tally elections that have not ended yet')
+
+    def handle(self, *args, **options):
+        elections = Election.objects.filter(encrypted_ballots=True)
+        if options['elections']:
+            elections = elections.filter(id__in=options['elections'])
+            missing = set(options['elections']) - set(elections.values_list('id', flat=True))
+            if missing:
+                raise CommandError(f'No encrypted-ballot election with id {", ".join(map(str, sorted(missing)))}')
+        if not options['force']:
+            elections = elections.filter(end_time__lte=timezone.now())
+
+        for election in elections:
+            counted, invalid = tally_encrypted(election, workers=options['workers'])
+            if election.election_type == 'ranked_choice':
+                store_runoff(election)
+            self.stdout.write(f'{election.name}: {counted} ballots counted, {invalid} unreadable')
+        self.stdout.write(self.style.SUCCESS('Done'))
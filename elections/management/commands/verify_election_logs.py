@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from elections.audit import ChainError, verify_chain
+from elections.models import ElectionLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifies each election's audit log hash chain from its latest signed "
+        'checkpoint and records a new checkpoint at the verified head.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--election', type=int, action='append', dest='elections',
+            help='Only verify this election id (may be repeated)'
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Re-hash every stored entry instead of resuming from the last checkpoint'
+        )
+        parser.add_argument(
+            '--no-checkpoint', action='store_true',
+            help='Verify without recording a new checkpoint'
+        )
+
+    def handle(self, *args, **options):
+        election_ids = options['elections']
+        if not election_ids:
+            election_ids = ElectionLog.objects.order_by('election_id').values_list(
+                'election_id', flat=True
+            ).distinct()
+
+        failed = 0
+        for election_id in election_ids:
+            try:
+                checked, head = verify_chain(
+                    election_id, full=options['full'], checkpoint=not options['no_checkpoint']
+                )
+            except ChainError as exc:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'Election {election_id}: {exc}'))
+                continue
+            self.stdout.write(f'Election {election_id}: {checked} entries verified, head #{head}')
+
+        if failed:
+            raise CommandError(f'{failed} election log(s) failed verification')
+        self.stdout.write(self.style.SUCCESS('Audit logs verified'))
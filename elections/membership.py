@@ -0,0 +1,165 @@
+"""
+Per-worker eligibility index for private elections.
+
+Checking VoterEligibility on every vote would add a query to the vote
+path, so each worker loads a private election's eligible voter ids once
+into a compact index: a bitmap over the id range when the ids are dense,
+otherwise a sorted int64 array searched by bisection. Membership checks
+then touch no database. Like election snapshots, indexes are dropped
+locally by model signals and across workers by a version counter in the
+Django cache, with TTL bounding how long a missed invalidation can last.
+Bulk writes that skip signals (e.g. the eligibility import) must call
+invalidate_membership() themselves.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Election, VoterEligibility
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TTL': 300,
+}
+
+_indexes = {}
+_load_lock = threading.Lock()
+
+
+def _conf(name):
+    return getattr(settings, 'ELIGIBILITY_INDEX', {}).get(name, DEFAULTS[name])
+
+
+def _version_key(election_id):
+    return f'election:{election_id}:eligibility_version'
+
+
+class EligibilityIndex:
+    __slots__ = ('election_id', 'size', 'base', 'bits', 'ids', 'version', 'loaded_at')
+
+    def __init__(self, election_id, voter_ids, version):
+        ids = np.unique(np.asarray(voter_ids, dtype=np.int64))
+        self.election_id = election_id
+        self.size = len(ids)
+        self.base = int(ids[0]) if self.size else 0
+        self.bits = self.ids = None
+        span = int(ids[-1]) - self.base + 1 if self.size else 0
+        # A bitmap costs span/8 bytes against 8 bytes per id for the array
+        if span <= 64 * self.size:
+            flags = np.zeros(span, dtype=bool)
+            flags[ids - self.base] = True
+            self.bits = np.packbits(flags).tobytes()
+        else:
+            # A stdlib array: bisecting it beats numpy for single lookups
+            self.ids = array('q', ids.tobytes())
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+    def __contains__(self, user_id):
+        offset = user_id - self.base
+        if offset < 0:
+            return False
+        if self.bits is not None:
+            byte = offset >> 3
+            return byte < len(self.bits) and bool(self.bits[byte] & (0x80 >> (offset & 7)))
+        i = bisect_left(self.ids, user_id)
+        return i < self.size and self.ids[i] == user_id
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return len(self.bits) if self.bits is not None else self.ids.itemsize * self.size
+
+
+def get_index(election_id):
+    """
+    Return the eligibility index for an election, loading it if missing,
+    stale or invalidated.
+    """
+    election_id = int(election_id)
+    version = caches[_conf('ALIAS')].get(_version_key(election_id), 0)
+    index = _indexes.get(election_id)
+    if _is_current(index, version):
+        return index
+
+    # One load at a time, so a burst of votes on a cold worker reads the
+    # list once rather than once per request thread
+    with _load_lock:
+        index = _indexes.get(election_id)
+        if _is_current(index, version):
+            return index
+        voter_ids = np.fromiter(
+            VoterEligibility.objects.filter(election_id=election_id)
+            .values_list('voter_id', flat=True).iterator(chunk_size=10000),
+            dtype=np.int64,
+        )
+        index = _indexes[election_id] = EligibilityIndex(election_id, voter_ids, version)
+    return index
+
+
+def _is_current(index, version):
+    return (index is not None and index.version == version
+            and time.monotonic() - index.loaded_at < _conf('TTL'))
+
+
+def is_eligible(election, user_id):
+    """
+    Whether user_id may vote in election (an Election or ElectionSnapshot).
+    Public elections are open to everyone.
+    """
+    if election.visibility != 'private':
+        return True
+    return user_id in get_index(election.id)
+
+
+def invalidate_membership(election_id):
+    """
+    Drop the index in this worker now and in every worker sharing the
+    cache once the current transaction commits.
+    """
+    _indexes.pop(int(election_id), None)
+
+    def bump():
+        _indexes.pop(int(election_id), None)
+        cache = caches[_conf('ALIAS')]
+        key = _version_key(election_id)
+        if not cache.add(key, 1, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, None)
+    transaction.on_commit(bump)
+
+
+@receiver([post_save, post_delete], sender=VoterEligibility)
+def _eligibility_changed(sender, instance, **kwargs):
+    invalidate_membership(instance.election_id)
+
+
+@receiver(post_delete, sender=Election)
+def _election_deleted(sender, instance, **kwargs):
+    invalidate_membership(instance.pk)
+
+
+@receiver(m2m_changed, sender=Election.eligible_voters.through)
+def _eligible_voters_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_membership(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        for election_id in pk_set:
+            invalidate_membership(election_id)
+    elif action == 'pre_clear':
+        # user.election_set.clear(): the elections are only known beforehand
+        for election_id in VoterEligibility.objects.filter(voter=instance).values_list('election_id', flat=True):
+            invalidate_membership(election_id)
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:37
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_tallies(apps, schema_editor):
+    Vote = apps.get_model('elections', 'Vote')
+    VoteTally = apps.get_model('elections', 'VoteTally')
+    rows = Vote.objects.values_list('election_id', 'candidate_id', 'rank').annotate(n=models.Count('id'))
+    VoteTally.objects.bulk_create(
+        VoteTally(election_id=e, candidate_id=c, rank=r, count=n) for e, c, r, n in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0002_userprofile_date_of_birth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.IntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)])),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='elections.candidate')),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='elections.election')),
+            ],
+            options={
+                'unique_together': {('election', 'candidate', 'rank')},
+            },
+        ),
+        migrations.RunPython(backfill_tallies, migrations.RunPython.noop),
+    ]
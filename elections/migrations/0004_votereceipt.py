@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:47
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_receipts(apps, schema_editor):
+    Vote = apps.get_model('elections', 'Vote')
+    VoteReceipt = apps.get_model('elections', 'VoteReceipt')
+    pairs = Vote.objects.values_list('voter_id', 'election_id').distinct()
+    VoteReceipt.objects.bulk_create(
+        [VoteReceipt(voter_id=v, election_id=e, receipt=uuid.uuid4()) for v, e in pairs],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0003_votetally'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('receipt', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('idempotency_key', models.CharField(blank=True, default='', max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='elections.election')),
+                ('voter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('voter', 'election')},
+            },
+        ),
+        migrations.RunPython(backfill_receipts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0004_votereceipt'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='electionlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
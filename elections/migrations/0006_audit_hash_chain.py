@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:20
+
+import datetime
+import hashlib
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+GENESIS_HASH = '0' * 64
+
+
+def chain_hash(prev_hash, election_id, sequence, user_id, action, details, ip_address, timestamp):
+    # Frozen copy of elections.audit.chain_hash
+    payload = json.dumps(
+        [prev_hash, election_id, sequence, user_id, action, details or '', ip_address,
+         timestamp.astimezone(datetime.timezone.utc).isoformat()],
+        separators=(',', ':'), ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def backfill_chain(apps, schema_editor):
+    ElectionLog = apps.get_model('elections', 'ElectionLog')
+    heads = {}
+    batch = []
+    for log in ElectionLog.objects.order_by('timestamp', 'id').iterator(chunk_size=2000):
+        sequence, prev_hash = heads.get(log.election_id, (0, GENESIS_HASH))
+        log.sequence = sequence + 1
+        log.prev_hash = prev_hash
+        log.entry_hash = chain_hash(prev_hash, log.election_id, log.sequence, log.user_id,
+                                    log.action, log.details, log.ip_address, log.timestamp)
+        heads[log.election_id] = (log.sequence, log.entry_hash)
+        batch.append(log)
+        if len(batch) >= 2000:
+            ElectionLog.objects.bulk_update(batch, ['sequence', 'prev_hash', 'entry_hash'])
+            batch = []
+    ElectionLog.objects.bulk_update(batch, ['sequence', 'prev_hash', 'entry_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0005_electionlog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='electionlog',
+            name='sequence',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='electionlog',
+            name='prev_hash',
+            field=models.CharField(default='', editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='electionlog',
+            name='entry_hash',
+            field=models.CharField(default='', editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_chain, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='electionlog',
+            unique_together={('election', 'sequence')},
+        ),
+        migrations.CreateModel(
+            name='AuditCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveBigIntegerField()),
+                ('entry_hash', models.CharField(max_length=64)),
+                ('signature', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audit_checkpoints', to='elections.election')),
+            ],
+            options={
+                'unique_together': {('election', 'sequence')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0006_audit_hash_chain'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='election',
+            name='encrypted_ballots',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='candidate',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='elections.candidate'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0007_encrypted_ballots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='election',
+            index=models.Index(fields=['start_time', 'id'], name='election_start_id'),
+        ),
+        migrations.AddIndex(
+            model_name='election',
+            index=models.Index(fields=['visibility', 'start_time', 'id'], name='election_vis_start_id'),
+        ),
+        migrations.AddIndex(
+            model_name='election',
+            index=models.Index(fields=['election_type', 'start_time', 'id'], name='election_type_start_id'),
+        ),
+        migrations.AddIndex(
+            model_name='election',
+            index=models.Index(fields=['end_time', 'start_time'], name='election_end_start'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0010_token_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RunoffResult',
+            fields=[
+                ('election', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='runoff_result', serialize=False, to='elections.election')),
+                ('data', models.JSONField()),
+                ('tallied_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -3,6 +3,17 @@ from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 import datetime
+import uuid
+
+def within_daily_window(start_t, end_t, now=None):
+    """
+    Whether now falls inside a daily voting window. Windows where the end
+    time is before the start time cross midnight (e.g. 22:00 - 02:00).
+    """
+    now_time = timezone.localtime(now or timezone.now()).time()
+    if start_t <= end_t:
+        return start_t <= now_time <= end_t
+    return now_time >= start_t or now_time <= end_t
 
 class UserProfile(models.Model):
     USER_ROLES = [
@@ -21,6 +32,17 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.role}"
 
+class TokenVersion(models.Model):
+    """
+    Per-user counter carried in issued JWTs as the 'ver' claim; bumping it
+    revokes every token issued before (see accounts/tokens.py).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='token_version')
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id} v{self.version}"
+
 class Election(models.Model):
     ELECTION_TYPES = [
         ('single_choice', 'Single Choice'),
@@ -45,10 +67,21 @@ class Election(models.Model):
     eligible_voters = models.ManyToManyField(User, through='VoterEligibility', blank=True)
     max_votes_per_voter = models.IntegerField(default=1, validators=[MinValueValidator(1)])
     require_confirmation = models.BooleanField(default=True)
+    # Ballots are stored encrypted and only counted when the election closes
+    encrypted_ballots = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Keyset pagination of the election list, alone and per filter
+        indexes = [
+            models.Index(fields=['start_time', 'id'], name='election_start_id'),
+            models.Index(fields=['visibility', 'start_time', 'id'], name='election_vis_start_id'),
+            models.Index(fields=['election_type', 'start_time', 'id'], name='election_type_start_id'),
+            models.Index(fields=['end_time', 'start_time'], name='election_end_start'),
+        ]
+
     def __str__(self):
         return self.name
     
@@ -58,6 +91,9 @@ class Election(models.Model):
         now = timezone.now()
         return self.start_time <= now <= self.end_time
 
+    def within_voting_hours(self, now=None):
+        return within_daily_window(self.voting_start_time, self.voting_end_time, now)
+
 class VoterEligibility(models.Model):
     election = models.ForeignKey(Election, on_delete=models.CASCADE)
     voter = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -86,7 +122,8 @@ class Candidate(models.Model):
 class Vote(models.Model):
     voter = models.ForeignKey(User, on_delete=models.CASCADE)
     election = models.ForeignKey(Election, on_delete=models.CASCADE)
-    candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE)
+    # Null for encrypted ballots, whose choices live in encrypted_vote
+    candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, null=True, blank=True)
     rank = models.IntegerField(default=1, validators=[MinValueValidator(1)])
     encrypted_vote = models.TextField(blank=True, default='')
     ip_address = models.GenericIPAddressField(null=True, blank=True)
@@ -95,10 +132,57 @@ class Vote(models.Model):
     
     class Meta:
         unique_together = ('voter', 'election', 'candidate', 'rank')
+        # Keyset pagination of a voter's history
+        indexes = [models.Index(fields=['voter', 'timestamp', 'id'], name='vote_voter_time_id')]
 
     def __str__(self):
         return f"{self.voter} voted for {self.candidate} in {self.election}"
 
+class VoteReceipt(models.Model):
+    """
+    One row per voter per election, inserted in the same transaction as the
+    voter's Vote rows. The unique constraint is the "already voted" check.
+    """
+    voter = models.ForeignKey(User, on_delete=models.CASCADE)
+    election = models.ForeignKey(Election, related_name='receipts', on_delete=models.CASCADE)
+    receipt = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    idempotency_key = models.CharField(max_length=64, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('voter', 'election')
+
+    def __str__(self):
+        return f"{self.voter} voted in {self.election} ({self.receipt})"
+
+class VoteTally(models.Model):
+    """
+    Running vote count per (election, candidate, rank), kept in step with
+    Vote inserts so results never have to count the raw Vote table.
+    """
+    election = models.ForeignKey(Election, related_name='tallies', on_delete=models.CASCADE)
+    candidate = models.ForeignKey(Candidate, related_name='tallies', on_delete=models.CASCADE)
+    rank = models.IntegerField(default=1, validators=[MinValueValidator(1)])
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('election', 'candidate', 'rank')
+
+    def __str__(self):
+        return f"{self.candidate.name} (rank {self.rank}): {self.count}"
+
+class RunoffResult(models.Model):
+    """
+    Round-by-round runoff of an encrypted-ballot election, stored by
+    tally_encrypted_ballots so the results view never decrypts ballots.
+    """
+    election = models.OneToOneField(Election, primary_key=True, related_name='runoff_result', on_delete=models.CASCADE)
+    data = models.JSONField()
+    tallied_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Runoff for {self.election.name} ({self.tallied_at})"
+
 class ElectionLog(models.Model):
     LOG_TYPES = [
         ('election_created', 'Election Created'),
@@ -115,7 +199,33 @@ class ElectionLog(models.Model):
     action = models.CharField(max_length=20, choices=LOG_TYPES)
     details = models.TextField(blank=True, default='')
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when a buffered entry is written
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
+    # Hash chain: each entry hashes its content plus the previous entry's
+    # hash within the same election (see elections/audit.py)
+    sequence = models.PositiveBigIntegerField(editable=False)
+    prev_hash = models.CharField(max_length=64, editable=False)
+    entry_hash = models.CharField(max_length=64, editable=False)
+    
+    class Meta:
+        unique_together = ('election', 'sequence')
     
     def __str__(self):
         return f"{self.action} - {self.election.name} - {self.timestamp}"
+
+class AuditCheckpoint(models.Model):
+    """
+    Signed record that an election's log chain verified up to sequence.
+    Verification resumes from the latest checkpoint.
+    """
+    election = models.ForeignKey(Election, related_name='audit_checkpoints', on_delete=models.CASCADE)
+    sequence = models.PositiveBigIntegerField()
+    entry_hash = models.CharField(max_length=64)
+    signature = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('election', 'sequence')
+    
+    def __str__(self):
+        return f"{self.election.name} verified to #{self.sequence}"
@@ -0,0 +1,96 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are read in a fixed (field, id) order and the cursor holds the last
+row's (field, id); the next page starts strictly after it. Unlike offset
+pagination, the database seeks straight to the cursor through an index on
+(field, id), so page 1000 costs the same as page 1, and rows inserted
+while a client is paging do not shift or repeat results.
+"""
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest-first pages ordered by (field, id) descending. field must be a
+    non-null DateTimeField.
+    """
+    field = 'start_time'
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            value, pk = cursor
+            # (field, id) < (value, pk), written so the leading range on
+            # field can use the index
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__lte': value}) & (Q(**{f'{self.field}__lt': value}) | Q(id__lt=pk))
+            )
+        rows = list(queryset.order_by(f'-{self.field}', '-id')[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            value, pk = parse_datetime(value), int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def encode_cursor(self, row):
+        token = f'{getattr(row, self.field).isoformat()}|{row.id}'
+        return base64.urlsafe_b64encode(token.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class VoteHistoryPagination(KeysetPagination):
+    field = 'timestamp'
+    page_size = 50
@@ -0,0 +1,53 @@
+"""
+"Has voted" ledger.
+
+Every vote path inserts a VoteReceipt in the same transaction as its Vote
+rows. The (voter, election) unique constraint turns a second vote into a
+failed INSERT, with no SELECT beforehand and no race between parallel
+requests. Clients may send an Idempotency-Key header; a retry carrying the
+key of the stored receipt gets that receipt back instead of an error.
+Other integrity errors (e.g. a candidate deleted meanwhile) are not "already
+voted": callers check has_voted() before reporting one.
+"""
+from .models import Vote, VoteReceipt
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def idempotency_key(request):
+    return (request.headers.get(IDEMPOTENCY_HEADER) or '')[:64] if request else ''
+
+
+def issue_receipt(voter, election, key='', receipt=None):
+    """
+    Insert the ledger row; election may be an Election, a snapshot or an
+    id. Raises IntegrityError if the voter already voted in this election;
+    call it inside the transaction that inserts the votes.
+    """
+    fields = {'voter': voter, 'election_id': getattr(election, 'id', election), 'idempotency_key': key}
+    if receipt is not None:
+        fields['receipt'] = receipt
+    return VoteReceipt.objects.create(**fields)
+
+
+def find_replay(voter_id, election_id, key):
+    """
+    Return the stored receipt if key identifies it as a retry, else None.
+    """
+    if not key:
+        return None
+    return VoteReceipt.objects.filter(
+        voter_id=voter_id, election_id=election_id, idempotency_key=key
+    ).first()
+
+
+def has_voted(voter_id, election_id):
+    """
+    Whether a receipt exists, i.e. whether an IntegrityError on a vote
+    insert came from the one-vote-per-election constraint.
+    """
+    return VoteReceipt.objects.filter(voter_id=voter_id, election_id=election_id).exists()
+
+
+def receipt_votes(receipt):
+    return list(Vote.objects.filter(voter_id=receipt.voter_id, election_id=receipt.election_id).order_by('rank'))
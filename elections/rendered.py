@@ -0,0 +1,143 @@
+"""
+Pre-rendered response cache.
+
+Election details and anonymous election list pages are stored as the
+final encoded JSON bytes together with their ETag, so a hit skips the
+serializers and the renderer and a client that already has the body gets
+a 304. Entries live under versioned keys: any change to an election or
+its candidates bumps that election's version and the list version, so
+stale bodies are never served again and simply expire. TIMEOUT also
+bounds how long a body read from a lagging replica can outlive a write,
+and LIST_TIMEOUT how long a list filtered by status lags the clock.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from .models import Candidate, Election
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LIST_TIMEOUT': 30,
+}
+
+LIST = 'list'
+
+
+def _conf(name):
+    return getattr(settings, 'RENDERED_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def _cache():
+    return caches[_conf('ALIAS')]
+
+
+def _version_key(scope):
+    return f'rendered:{scope}:version'
+
+
+def _version(scope):
+    cache = _cache()
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        # Time based so an evicted version never points at an old body
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(scope):
+    cache = _cache()
+    key = _version_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def invalidate_rendered(election_id=None):
+    """
+    Drop the cached bodies of an election's detail and of every list page,
+    once the current transaction commits.
+    """
+    def bump():
+        if election_id is not None:
+            _bump(f'election:{election_id}')
+        _bump(LIST)
+    transaction.on_commit(bump)
+
+
+def etag_for(body):
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class RenderedCacheMixin:
+    """
+    For DRF views: serve a JSON body from the cache, rendering and storing
+    it on a miss. Other formats (e.g. the browsable API) bypass the cache.
+    """
+    def cached_json(self, request, scope, variant, build, timeout):
+        """
+        Return an HttpResponse (200 or 304) for the cached body of
+        scope/variant, calling build() for the response data on a miss, or
+        None if the request cannot be served from the cache.
+        """
+        renderer = getattr(request, 'accepted_renderer', None)
+        if not _conf('ENABLED') or getattr(renderer, 'format', None) != 'json':
+            return None
+        cache = _cache()
+        key = f'rendered:{scope}:v{_version(scope)}:{variant}'
+        entry = cache.get(key)
+        if entry is None:
+            body = renderer.render(build(), request.accepted_media_type, self.get_renderer_context())
+            entry = (etag_for(body), body)
+            cache.set(key, entry, timeout)
+        etag, body = entry
+
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type=renderer.media_type)
+        response['ETag'] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        election_id = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        response = self.cached_json(
+            request, f'election:{election_id}', 'detail',
+            lambda: self.get_serializer(self.get_object()).data, _conf('TIMEOUT')
+        )
+        return response or super().retrieve(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        response = None
+        # Anonymous pages are the same for everyone; signed-in users may
+        # also see private elections, so theirs are rendered per request
+        if not request.user.is_authenticated:
+            response = self.cached_json(
+                # Next links are absolute, so the host is part of the body
+                request, LIST, f"{request.get_host()}?{request.META.get('QUERY_STRING', '')}",
+                lambda: super(RenderedCacheMixin, self).list(request, *args, **kwargs).data,
+                _conf('LIST_TIMEOUT')
+            )
+        return response or super().list(request, *args, **kwargs)
+
+
+@receiver([post_save, post_delete], sender=Election)
+def _election_changed(sender, instance, **kwargs):
+    invalidate_rendered(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Candidate)
+def _candidate_changed(sender, instance, **kwargs):
+    invalidate_rendered(instance.election_id)
@@ -0,0 +1,61 @@
+"""
+JSON renderer and parser backed by orjson when it is installed.
+
+Drop-in replacements for DRF's JSONRenderer and JSONParser, selected in
+REST_FRAMEWORK's DEFAULT_RENDERER_CLASSES / DEFAULT_PARSER_CLASSES. orjson
+encodes datetimes, dates, times and UUIDs itself and anything else DRF
+knows (Decimal, timedelta, lazy strings, querysets...) through DRF's own
+encoder, so responses match the stock renderer's (bar times keeping their
+microseconds rather than milliseconds). Without orjson, or for
+output it cannot produce the same way (indented, spaced or ASCII-only),
+both classes behave exactly like DRF's.
+"""
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Z for UTC like DRF's encoder, and non-string keys (e.g. candidate id
+    # -> count) converted like the json module does
+    OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+_default = encoders.JSONEncoder().default
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=OPTIONS)
+        except TypeError:
+            # e.g. integers beyond 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped like DRF does, as they are not valid in JavaScript strings
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        try:
+            body = stream.read()
+            if encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,112 @@
+"""
+Primary/replica database routing.
+
+Writes and ordinary reads use the default (primary) database. Read-only
+views opt in with ReplicaReadMixin, which sends their reads to the replica
+alias, except for a user who has just voted: pin_to_primary() marks the
+user in the cache for STICKY_SECONDS so their own reads (e.g. My Votes)
+cannot see a replica that has not caught up with their vote yet.
+
+The pin is only seen by the worker that set it unless CACHE_ALIAS is a
+cache shared by every worker (Redis, Memcached, database). A system check
+reports an error when the replica is a separate database and the cache is
+a per-process one such as LocMemCache.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+
+# Cache backends whose entries are private to one process
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+DEFAULTS = {
+    'ALIAS': 'replica',
+    'STICKY_SECONDS': 10,
+    'CACHE_ALIAS': 'default',
+}
+
+# Set while a ReplicaReadMixin view handles a request for an unpinned user
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def _conf(name):
+    return getattr(settings, 'DATABASE_REPLICA', {}).get(name, DEFAULTS[name])
+
+
+def _pin_key(user_id):
+    return f'db:pinned:user:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """
+    Send this user's reads to the primary for the next STICKY_SECONDS.
+    """
+    caches[_conf('CACHE_ALIAS')].set(_pin_key(user_id), True, _conf('STICKY_SECONDS'))
+
+
+def is_pinned(user):
+    if not user or not user.is_authenticated:
+        return False
+    return bool(caches[_conf('CACHE_ALIAS')].get(_pin_key(user.id)))
+
+
+@checks.register(checks.Tags.caches, checks.Tags.database)
+def check_pin_cache(app_configs=None, **kwargs):
+    alias = _conf('ALIAS')
+    replica = settings.DATABASES.get(alias)
+    if replica is None or replica.get('NAME') == settings.DATABASES['default'].get('NAME'):
+        # Without a separate replica there is no lag to pin around
+        return []
+    cache_alias = _conf('CACHE_ALIAS')
+    backend = settings.CACHES.get(cache_alias, {}).get('BACKEND')
+    if backend in PROCESS_LOCAL_CACHES:
+        return [checks.Error(
+            f"DATABASE_REPLICA['CACHE_ALIAS'] ({cache_alias!r}) uses {backend}, "
+            'so a read-your-writes pin is only seen by the worker that set it.',
+            hint='Point CACHE_ALIAS at a cache shared by all workers, e.g. Redis or Memcached.',
+            obj=cache_alias,
+            id='elections.E001',
+        )]
+    return []
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            alias = _conf('ALIAS')
+            if alias in settings.DATABASES:
+                return alias
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema from the primary
+        return db != _conf('ALIAS')
+
+
+class ReplicaReadMixin:
+    """
+    Route a read-only view's queries to the replica. Authentication still
+    reads the primary; the switch happens once the user is known.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        token = _replica_reads.set(False)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        _replica_reads.set(not is_pinned(request.user))
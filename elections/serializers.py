@@ -3,6 +3,15 @@ from .models import Election, Candidate, Vote, UserProfile
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.db import IntegrityError, transaction
+from .snapshots import get_snapshot, invalidate_snapshot
+from .membership import is_eligible
+from .audit import audit_log
+from .receipts import idempotency_key, issue_receipt, find_replay, has_voted, receipt_votes
+from .tallies import record_votes, candidate_totals, notify_results_changed
+from .ballots import seal_vote
+from .writer import serialized_write
+from .candidates import sync_candidates
 
 class CandidateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -10,10 +19,13 @@ class CandidateSerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
 
 class AdminCandidateSerializer(serializers.ModelSerializer):
+    # Writable so an election update can say which candidate an entry
+    # edits; entries without an id are new candidates
+    id = serializers.IntegerField(required=False)
+    
     class Meta:
         model = Candidate
         fields = ['id', 'name', 'description', 'position', 'order', 'is_active']
-        read_only_fields = ['id']
 
 class ElectionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -29,7 +41,7 @@ class AdminElectionSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'description', 'election_type', 'visibility',
             'start_time', 'end_time', 'voting_start_time', 'voting_end_time',
-            'max_votes_per_voter', 'require_confirmation', 'is_active',
+            'max_votes_per_voter', 'require_confirmation', 'encrypted_ballots', 'is_active',
             'candidates', 'created_by', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
@@ -40,47 +52,43 @@ class AdminElectionSerializer(serializers.ModelSerializer):
         if 'voting_start_time' in data and 'voting_end_time' in data:
             if data['voting_start_time'] >= data['voting_end_time']:
                 raise serializers.ValidationError("Voting end time must be after voting start time.")
+        if (self.instance is not None and 'encrypted_ballots' in data
+                and data['encrypted_ballots'] != self.instance.encrypted_ballots
+                and self.instance.receipts.exists()):
+            raise serializers.ValidationError("Ballot encryption cannot be changed after voting has started.")
         return data
     
     def create(self, validated_data):
         candidates_data = validated_data.pop('candidates', [])
-        election = Election.objects.create(**validated_data)
-        
-        for candidate_data in candidates_data:
-            Candidate.objects.create(election=election, **candidate_data)
-            
+        with transaction.atomic():
+            election = Election.objects.create(**validated_data)
+            # One INSERT for the whole ballot
+            Candidate.objects.bulk_create(
+                Candidate(election=election, **{k: v for k, v in c.items() if k != 'id'})
+                for c in candidates_data
+            )
         return election
     
     def update(self, instance, validated_data):
         candidates_data = validated_data.pop('candidates', None)
         
-        # Update election fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        
-        # Update or create candidates if provided
-        if candidates_data is not None:
-            # Get existing candidate IDs
-            existing_candidate_ids = set(instance.candidates.values_list('id', flat=True))
-            updated_candidate_ids = set()
-            
-            # Update or create candidates
-            for candidate_data in candidates_data:
-                candidate_id = candidate_data.get('id')
-                if candidate_id and instance.candidates.filter(id=candidate_id).exists():
-                    # Update existing candidate
-                    Candidate.objects.filter(id=candidate_id).update(**candidate_data)
-                    updated_candidate_ids.add(candidate_id)
-                else:
-                    # Create new candidate
-                    if 'id' in candidate_data:
-                        candidate_data.pop('id')
-                    Candidate.objects.create(election=instance, **candidate_data)
+        with transaction.atomic():
+            # Update election fields
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
             
-            # Delete candidates that were not included in the update
-            instance.candidates.exclude(id__in=updated_candidate_ids).delete()
+            # Diff the submitted candidates against the stored ones; those
+            # left out are deleted
+            if candidates_data is not None:
+                sync_candidates(instance, candidates_data)
             
+            # Names and candidate lists are part of the snapshot and the
+            # cached results; the bulk writes above bypass the model signals
+            # that drop them. Both wait for the commit, so no worker reloads
+            # the old rows in between
+            transaction.on_commit(lambda: invalidate_snapshot(instance.id))
+            transaction.on_commit(lambda: notify_results_changed(instance.id))
         return instance
 
 
@@ -90,16 +98,21 @@ class ElectionDetailSerializer(serializers.ModelSerializer):
         model = Election
         fields = ['id', 'name', 'description', 'start_time', 'end_time', 'voting_start_time', 'voting_end_time', 'candidates']
 
-class VoteSerializer(serializers.ModelSerializer):
-    candidate = serializers.PrimaryKeyRelatedField(queryset=Candidate.objects.all())
-    election = serializers.PrimaryKeyRelatedField(queryset=Election.objects.all())
-    
-    class Meta:
-        model = Vote
-        fields = ['election', 'candidate', 'rank']
-        extra_kwargs = {
-            'rank': {'required': False, 'default': 1}  # Default rank is 1 for single-choice
-        }
+class BallotSerializer(serializers.Serializer):
+    """
+    A complete ballot cast in one request. For ranked choice elections the
+    order of candidates is the ranking; otherwise every entry is rank 1.
+    """
+    election = serializers.IntegerField()
+    candidates = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+    def validate_election(self, value):
+        # Resolved from the per-worker snapshot cache, not the database
+        try:
+            return get_snapshot(value)
+        except Election.DoesNotExist:
+            raise serializers.ValidationError('Election not found.')
+
     def validate(self, data):
         request = self.context.get('request')
         user = request.user if request and hasattr(request, 'user') else None
@@ -107,48 +120,87 @@ class VoteSerializer(serializers.ModelSerializer):
         if not user or not user.is_authenticated:
             raise serializers.ValidationError('Authentication required to vote.')
             
-        election = data.get('election')
-        candidate = data.get('candidate')
+        election = data['election']
+        candidate_ids = data['candidates']
         
-        if not election or not candidate:
-            raise serializers.ValidationError('Election and candidate are required.')
+        if len(set(candidate_ids)) != len(candidate_ids):
+            raise serializers.ValidationError('Each candidate may only appear once on a ballot.')
             
-        # Check if candidate belongs to the election
-        if candidate.election_id != election.id:
-            raise serializers.ValidationError('Invalid candidate for this election.')
+        # Check the number of selections against the election type
+        if election.election_type == 'single_choice' and len(candidate_ids) != 1:
+            raise serializers.ValidationError('Single choice elections take exactly one candidate.')
+        if election.election_type == 'multiple_choice' and len(candidate_ids) > election.max_votes_per_voter:
+            raise serializers.ValidationError(
+                f'You may select at most {election.max_votes_per_voter} candidates.'
+            )
             
-        # Check if user has already voted in this election
-        if Vote.objects.filter(voter=user, election=election).exists():
-            raise serializers.ValidationError('You have already voted in this election.')
+        # Check that every candidate belongs to the election
+        if any(c not in election.candidates for c in candidate_ids):
+            raise serializers.ValidationError('Invalid candidate for this election.')
             
         # Check if election is active
         now = timezone.now()
-        if not (election.start_time <= now <= election.end_time):
+        if not election.is_ongoing(now):
             raise serializers.ValidationError('Election is not active.')
-            
-        # Enforce daily voting time window
-        now_local = timezone.localtime(now)
-        now_time = now_local.time()
-        start_t = election.voting_start_time
-        end_t = election.voting_end_time
-        
-        within_window = False
-        if start_t <= end_t:
-            within_window = (start_t <= now_time <= end_t)
-        else:
-            # Window crosses midnight (e.g., 22:00 - 02:00)
-            within_window = (now_time >= start_t or now_time <= end_t)
-            
-        if not within_window:
+        if not election.within_voting_hours(now):
             raise serializers.ValidationError('Voting is closed at this time of day.')
+        if not is_eligible(election, user.id):
+            raise serializers.ValidationError('You are not eligible to vote in this election.')
             
-        # For ranked choice, ensure rank is provided
-        if election.election_type == 'ranked_choice' and 'rank' not in data:
-            raise serializers.ValidationError('Rank is required for ranked choice elections.')
-            
+        data['user'] = user
         return data
+
     def create(self, validated_data):
-        return Vote.objects.create(**validated_data)
+        election = validated_data['election']
+        user = validated_data['user']
+        ranked = election.election_type == 'ranked_choice'
+        request = self.context.get('request')
+        ip_address = request.META.get('REMOTE_ADDR') if request else None
+        
+        if election.encrypted_ballots:
+            details = 'Cast encrypted ballot'
+        else:
+            details = 'Cast ballot for ' + ', '.join(
+                election.candidates[c] for c in validated_data['candidates']
+            )
+        key = idempotency_key(request)
+        
+        def ballot_rows():
+            if election.encrypted_ballots:
+                # One sealed row for the whole ballot, counted at close
+                return [seal_vote(election, user, validated_data['candidates'], ip_address=ip_address)]
+            return [
+                Vote(
+                    voter=user,
+                    election_id=election.id,
+                    candidate_id=candidate_id,
+                    rank=position if ranked else 1,
+                    ip_address=ip_address,
+                )
+                for position, candidate_id in enumerate(validated_data['candidates'], start=1)
+            ]
+        
+        def store():
+            # Fails on the unique constraint if the user already voted.
+            # Builds fresh rows, as the writer may run it a second time
+            receipt = issue_receipt(user, election, key)
+            stored = Vote.objects.bulk_create(ballot_rows())
+            record_votes(stored)
+            audit_log(election.id, user.id, 'vote_cast', details, ip_address)
+            return receipt, stored
+        
+        try:
+            # In a transaction, on the writer thread when DB_WRITER is enabled
+            receipt, votes = serialized_write(store)
+        except IntegrityError:
+            receipt = find_replay(user.id, election.id, key)
+            if receipt is None:
+                if not has_voted(user.id, election.id):
+                    # Not the receipt constraint; a server error, not the voter's
+                    raise
+                raise serializers.ValidationError('You have already voted in this election.')
+            votes = receipt_votes(receipt)
+        return receipt, votes
 
 class MyVoteSerializer(serializers.ModelSerializer):
     election = ElectionSerializer()
@@ -163,8 +215,5 @@ class ResultSerializer(serializers.ModelSerializer):
         model = Election
         fields = ['id', 'name', 'candidates']
     def get_candidates(self, obj):
-        results = []
-        for candidate in obj.candidates.all():
-            count = Vote.objects.filter(election=obj, candidate=candidate).count()
-            results.append({'id': candidate.id, 'name': candidate.name, 'votes': count})
-        return results
\ No newline at end of file
+        # Read the maintained tallies instead of counting Vote rows per candidate
+        return candidate_totals(obj)
\ No newline at end of file
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent after a committed change to an election's results, e.g. a vote being
+# cast or its candidates being edited. Receivers get election_id.
+results_changed = Signal()
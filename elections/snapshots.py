@@ -0,0 +1,111 @@
+"""
+Per-worker cache of election metadata for the vote path.
+
+A snapshot holds everything vote validation needs (window, type, limits and
+candidate ids/names), so a warm worker validates a vote without reading
+Election or Candidate. Snapshots are dropped locally by model signals and
+across workers by a version counter in the Django cache; TTL bounds how
+long a missed invalidation can go unnoticed.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Candidate, Election, within_daily_window
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TTL': 300,
+}
+
+_snapshots = {}
+
+
+def _conf(name):
+    return getattr(settings, 'ELECTION_SNAPSHOTS', {}).get(name, DEFAULTS[name])
+
+
+def _version_key(election_id):
+    return f'election:{election_id}:snapshot_version'
+
+
+class ElectionSnapshot:
+    __slots__ = (
+        'id', 'name', 'election_type', 'visibility', 'start_time', 'end_time',
+        'voting_start_time', 'voting_end_time', 'max_votes_per_voter',
+        'is_active', 'encrypted_ballots', 'candidates', 'version', 'loaded_at',
+    )
+
+    def __init__(self, election, candidates, version):
+        self.id = election.id
+        self.name = election.name
+        self.election_type = election.election_type
+        self.visibility = election.visibility
+        self.start_time = election.start_time
+        self.end_time = election.end_time
+        self.voting_start_time = election.voting_start_time
+        self.voting_end_time = election.voting_end_time
+        self.max_votes_per_voter = election.max_votes_per_voter
+        self.is_active = election.is_active
+        self.encrypted_ballots = election.encrypted_ballots
+        # candidate id -> name
+        self.candidates = candidates
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+    def is_ongoing(self, now):
+        return self.start_time <= now <= self.end_time
+
+    def within_voting_hours(self, now=None):
+        return within_daily_window(self.voting_start_time, self.voting_end_time, now)
+
+
+def get_snapshot(election_id):
+    """
+    Return the snapshot for an election, loading it if missing, stale or
+    invalidated. Raises Election.DoesNotExist for unknown ids.
+    """
+    election_id = int(election_id)
+    version = caches[_conf('ALIAS')].get(_version_key(election_id), 0)
+    snapshot = _snapshots.get(election_id)
+    if (snapshot is not None and snapshot.version == version
+            and time.monotonic() - snapshot.loaded_at < _conf('TTL')):
+        return snapshot
+
+    election = Election.objects.get(pk=election_id)
+    candidates = dict(Candidate.objects.filter(election_id=election_id).values_list('id', 'name'))
+    snapshot = _snapshots[election_id] = ElectionSnapshot(election, candidates, version)
+    return snapshot
+
+
+def invalidate_snapshot(election_id):
+    """
+    Drop the snapshot in this worker now and in every worker sharing the
+    cache once the current transaction commits.
+    """
+    _snapshots.pop(int(election_id), None)
+
+    def bump():
+        _snapshots.pop(int(election_id), None)
+        cache = caches[_conf('ALIAS')]
+        key = _version_key(election_id)
+        if not cache.add(key, 1, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, None)
+    transaction.on_commit(bump)
+
+
+@receiver([post_save, post_delete], sender=Election)
+def _election_changed(sender, instance, **kwargs):
+    invalidate_snapshot(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Candidate)
+def _candidate_changed(sender, instance, **kwargs):
+    invalidate_snapshot(instance.election_id)
@@ -0,0 +1,124 @@
+from collections import Counter, defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+
+from .models import Candidate, Vote, VoteTally
+from .signals import results_changed
+
+
+def record_votes(votes):
+    """
+    Add the given Vote rows to the running tallies.
+
+    Must be called inside the same transaction as the Vote insert so the
+    tally never drifts from the raw rows. Costs two queries per election
+    touched, however many votes are recorded. Encrypted ballots (no
+    candidate) are skipped; they are counted when the election closes.
+    """
+    by_election = defaultdict(Counter)
+    for v in votes:
+        if v.candidate_id is not None:
+            by_election[v.election_id][(v.candidate_id, v.rank)] += 1
+    for election_id, counts in by_election.items():
+        _increment(election_id, counts)
+        transaction.on_commit(partial(notify_results_changed, election_id))
+
+
+def record_vote(vote):
+    record_votes([vote])
+
+
+def notify_results_changed(election_id):
+    results_changed.send(sender=VoteTally, election_id=election_id)
+
+
+def _increment(election_id, counts):
+    # Make sure every row exists, then bump them all in a single UPDATE
+    VoteTally.objects.bulk_create(
+        [VoteTally(election_id=election_id, candidate_id=c, rank=r) for c, r in counts],
+        ignore_conflicts=True,
+    )
+    matches = Q()
+    delta = []
+    for (candidate_id, rank), n in counts.items():
+        matches |= Q(candidate_id=candidate_id, rank=rank)
+        delta.append(When(candidate_id=candidate_id, rank=rank, then=Value(n)))
+    VoteTally.objects.filter(matches, election_id=election_id).update(
+        count=F('count') + Case(*delta, default=Value(0))
+    )
+
+
+def candidate_totals(election):
+    """
+    Return [{'id', 'name', 'votes'}] for every candidate of the election,
+    summing tallies across ranks.
+    """
+    totals = dict(
+        VoteTally.objects.filter(election=election)
+        .values_list('candidate_id')
+        .annotate(votes=Sum('count'))
+    )
+    return [
+        {'id': c.id, 'name': c.name, 'votes': totals.get(c.id, 0)}
+        for c in Candidate.objects.filter(election=election).only('id', 'name')
+    ]
+
+
+def count_from_votes(election_ids=None):
+    """
+    Recount tallies from the raw Vote rows. Elections with encrypted
+    ballots are left out; see elections.ballots.tally_encrypted.
+    Returns {(election_id, candidate_id, rank): count}.
+    """
+    qs = Vote.objects.filter(election__encrypted_ballots=False)
+    if election_ids is not None:
+        qs = qs.filter(election_id__in=election_ids)
+    rows = qs.values_list('election_id', 'candidate_id', 'rank').annotate(n=Count('id'))
+    return {(e, c, r): n for e, c, r, n in rows}
+
+
+def stored_tallies(election_ids=None):
+    qs = VoteTally.objects.filter(election__encrypted_ballots=False)
+    if election_ids is not None:
+        qs = qs.filter(election_id__in=election_ids)
+    return {
+        (e, c, r): n
+        for e, c, r, n in qs.values_list('election_id', 'candidate_id', 'rank', 'count')
+    }
+
+
+def diff_tallies(election_ids=None):
+    """
+    Compare stored tallies with a recount.
+    Returns {(election_id, candidate_id, rank): (stored, actual)} for mismatches.
+    """
+    actual = count_from_votes(election_ids)
+    stored = stored_tallies(election_ids)
+    drift = {}
+    for key in actual.keys() | stored.keys():
+        have, want = stored.get(key, 0), actual.get(key, 0)
+        if have != want:
+            drift[key] = (have, want)
+    return drift
+
+
+@transaction.atomic
+def rebuild_tallies(election_ids=None):
+    """
+    Replace the stored tallies with a recount from the Vote table.
+    Returns the number of tally rows written.
+    """
+    counts = count_from_votes(election_ids)
+    qs = VoteTally.objects.filter(election__encrypted_ballots=False)
+    if election_ids is not None:
+        qs = qs.filter(election_id__in=election_ids)
+    qs.delete()
+    VoteTally.objects.bulk_create(
+        VoteTally(election_id=e, candidate_id=c, rank=r, count=n)
+        for (e, c, r), n in counts.items()
+    )
+    for election_id in election_ids or {key[0] for key in counts}:
+        transaction.on_commit(partial(notify_results_changed, election_id))
+    return len(counts)
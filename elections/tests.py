@@ -1,3 +1,1369 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import shutil
+import tempfile
+import threading
+import uuid
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from accounts.tokens import RoleTokenObtainPairSerializer
+
+from . import (
+    audit, ballots, candidates, eligibility, ingest, irv, live, membership, routers, snapshots, tallies, throttling,
+)
+from .ballot_crypto import BallotCipher
+from .cache import cached_results, invalidate_results
+from .models import (
+    AuditCheckpoint, Candidate, Election, ElectionLog, Vote, VoteReceipt, VoterEligibility, VoteTally,
+)
+from .renderers import FastJSONParser, FastJSONRenderer
+from .writer import get_writer, serialized_write, stop_writer
+
+# Audit entries written inline, fast password hashing, no throttling and
+# replica reads served by the primary, unless a test says otherwise
+TEST_SETTINGS = {
+    'DATABASE_REPLICA': {'ALIAS': 'default'},
+    'PASSWORD_HASHERS': ['django.contrib.auth.hashers.MD5PasswordHasher'],
+    'AUDIT_LOG': {'ASYNC': False},
+    'DB_WRITER': {'ENABLED': False},
+    'VOTE_INGEST': {'ENABLED': False},
+}
+
+
+def reset_worker_state():
+    """
+    Forget the per-process caches, which outlive each test's database.
+    """
+    for cache in caches.all():
+        cache.clear()
+    snapshots._snapshots.clear()
+    membership._indexes.clear()
+    throttling._store = None
+
+
+def make_election(candidates=3, **fields):
+    now = timezone.now()
+    fields.setdefault('start_time', now - datetime.timedelta(hours=1))
+    fields.setdefault('end_time', now + datetime.timedelta(hours=1))
+    election = Election.objects.create(name=fields.pop('name', 'Election'), description='test', **fields)
+    Candidate.objects.bulk_create(
+        Candidate(election=election, name=f'Candidate {i}', order=i) for i in range(candidates)
+    )
+    return election, list(election.candidates.order_by('order'))
+
+
+def make_user(username='voter', **fields):
+    return User.objects.create_user(username=username, password='Secret-pass-1', **fields)
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def bearer_client(user):
+    # A real token, for views that authorize from its claims
+    client = APIClient()
+    access = RoleTokenObtainPairSerializer.get_token(user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+    return client
+
+
+def unthrottled():
+    return dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={})
+
+
+class ElectionsTestCase(TestCase):
+    def setUp(self):
+        reset_worker_state()
+        overrides = override_settings(REST_FRAMEWORK=unthrottled(), **TEST_SETTINGS)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+
+class ElectionsTransactionTestCase(TransactionTestCase):
+    """
+    For code that commits, e.g. SQLite checks foreign keys only at COMMIT,
+    which never happens inside TestCase's wrapping transaction.
+    """
+    def setUp(self):
+        reset_worker_state()
+        overrides = override_settings(REST_FRAMEWORK=unthrottled(), **TEST_SETTINGS)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+
+def delete_behind_snapshot(candidate):
+    # Bypasses the signals that would invalidate the cached snapshot, as a
+    # delete on another worker does until the version bump reaches this one
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM elections_candidate WHERE id = %s', [candidate.id])
+
+
+class DatabaseWriterTests(ElectionsTransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        overrides = override_settings(DB_WRITER={'ENABLED': True, 'MAX_BATCH': 100, 'QUEUE_SIZE': 1000})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(stop_writer)
+
+    def test_returns_result_and_exception(self):
+        election, (candidate, *_) = make_election()
+        user = make_user()
+        vote = serialized_write(Vote.objects.create, voter=user, election=election, candidate=candidate)
+        self.assertTrue(Vote.objects.filter(pk=vote.pk).exists())
+        with self.assertRaises(ValueError):
+            serialized_write(int, 'not a number')
+
+    def test_foreign_key_failure_only_fails_its_own_write(self):
+        election, (candidate, gone, *_) = make_election()
+        users = [make_user(f'voter{i}') for i in range(20)]
+        delete_behind_snapshot(gone)
+
+        writer = get_writer()
+        # Hold the writer so every submission lands in one batch
+        release = threading.Event()
+        blocker = writer.submit(release.wait)
+        futures = [
+            writer.submit(Vote.objects.create, voter=u, election_id=election.id,
+                          candidate_id=gone.id if i == 7 else candidate.id)
+            for i, u in enumerate(users)
+        ]
+        with self.assertLogs('elections.writer', 'WARNING'):
+            release.set()
+            blocker.result(timeout=10)
+            futures[-1].exception(timeout=10)
+
+        for i, future in enumerate(futures):
+            if i == 7:
+                with self.assertRaises(IntegrityError):
+                    future.result(timeout=10)
+            else:
+                self.assertEqual(future.result(timeout=10).candidate_id, candidate.id)
+        self.assertEqual(Vote.objects.count(), 19)
+
+
+class SQLiteProfileTests(TestCase):
+    def test_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone(), ('wal',))
+            # NORMAL
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone(), (1,))
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class VoteIntegrityErrorTests(ElectionsTransactionTestCase):
+    def test_second_vote_is_already_voted(self):
+        election, (candidate, *_) = make_election()
+        client = client_for(make_user())
+        first = client.post('/api/vote/', {'election': election.id, 'candidate': candidate.id}, format='json')
+        self.assertEqual(first.status_code, 201)
+        second = client.post('/api/vote/', {'election': election.id, 'candidate': candidate.id}, format='json')
+        self.assertEqual(second.status_code, 400)
+        self.assertEqual(second.json()['detail'], 'You have already voted in this election')
+
+    def test_other_integrity_error_is_not_already_voted(self):
+        election, (candidate, *_) = make_election()
+        user = make_user()
+        snapshots.get_snapshot(election.id)
+        delete_behind_snapshot(candidate)
+        with self.assertLogs('elections.views', 'ERROR'):
+            response = client_for(user).post(
+                '/api/vote/', {'election': election.id, 'candidate': candidate.id}, format='json'
+            )
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(VoteReceipt.objects.filter(voter=user).exists())
+
+    def test_ballot_other_integrity_error_is_raised(self):
+        election, (candidate, *_) = make_election()
+        user = make_user()
+        snapshots.get_snapshot(election.id)
+        delete_behind_snapshot(candidate)
+        client = client_for(user)
+        client.raise_request_exception = True
+        with self.assertRaises(IntegrityError):
+            client.post('/api/ballot/', {'election': election.id, 'candidates': [candidate.id]}, format='json')
+        self.assertFalse(VoteReceipt.objects.filter(voter=user).exists())
+
+    def test_ballot_second_vote_is_already_voted(self):
+        election, (candidate, *_) = make_election()
+        client = client_for(make_user())
+        ballot = {'election': election.id, 'candidates': [candidate.id]}
+        self.assertEqual(client.post('/api/ballot/', ballot, format='json').status_code, 201)
+        response = client.post('/api/ballot/', ballot, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('You have already voted in this election.', str(response.json()))
+
+
+def journal_entry(user, election, candidate, name='Candidate'):
+    return {
+        'id': str(uuid.uuid4()), 'idempotency_key': '', 'voter': user.id, 'election': election.id,
+        'candidate': candidate.id, 'candidate_name': name, 'encrypted_vote': '', 'rank': 1,
+        'ip_address': '127.0.0.1', 'user_agent': '',
+    }
+
+
+class VoteIngestTests(ElectionsTransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        overrides = override_settings(VOTE_INGEST={
+            'ENABLED': True, 'JOURNAL_DIR': self.directory, 'BATCH_SIZE': 50,
+            'FLUSH_INTERVAL': 0.05, 'FSYNC': False,
+        })
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def tearDown(self):
+        if ingest._ingestor is not None:
+            ingest._ingestor.shutdown()
+            ingest._ingestor = None
+
+    def dead_letters(self):
+        path = self.directory / 'dead-letter.jsonl'
+        return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+    def test_vote_is_acknowledged_then_stored(self):
+        election, (candidate, *_) = make_election()
+        user = make_user()
+        response = client_for(user).post('/api/vote/', {'election': election.id, 'candidate': candidate.id}, format='json')
+        self.assertEqual(response.status_code, 202)
+        ingest.get_ingestor().drain()
+        receipt = VoteReceipt.objects.get(voter=user, election=election)
+        self.assertEqual(str(receipt.receipt), response.json()['receipt'])
+        self.assertEqual(Vote.objects.get(voter=user).candidate, candidate)
+
+    def test_unstorable_vote_is_dead_lettered_and_the_rest_stored(self):
+        election, (candidate, gone, *_) = make_election()
+        users = [make_user(f'voter{i}') for i in range(10)]
+        delete_behind_snapshot(gone)
+        ingestor = ingest.get_ingestor()
+        records = [journal_entry(u, election, gone if i == 3 else candidate) for i, u in enumerate(users)]
+        with self.assertLogs('elections.ingest', 'ERROR'):
+            for record in records:
+                self.assertEqual(ingestor.submit(record), record['id'])
+            drained = threading.Thread(target=ingestor.drain, daemon=True)
+            drained.start()
+            drained.join(timeout=10)
+        self.assertFalse(drained.is_alive(), 'drain() did not return')
+
+        self.assertEqual(Vote.objects.count(), 9)
+        self.assertFalse(VoteReceipt.objects.filter(voter=users[3]).exists())
+        [letter] = self.dead_letters()
+        self.assertEqual(letter['record'], records[3])
+        self.assertIn('IntegrityError', letter['error'])
+        # Past the journal, and the voter's slot released
+        self.assertEqual(list(ingestor.journal.pending()), [])
+        self.assertEqual(ingestor._pending, {})
+        retry = journal_entry(users[3], election, candidate)
+        self.assertEqual(ingestor.submit(retry), retry['id'])
+
+    def test_only_known_voters_are_looked_up(self):
+        election, (candidate, *_) = make_election()
+        first, second = make_user('first'), make_user('second')
+        ingestor = ingest.get_ingestor()
+        record = dict(journal_entry(first, election, candidate), idempotency_key='key')
+        self.assertEqual(ingestor.submit(record), record['id'])
+        ingestor.drain()
+
+        with self.assertNumQueries(0):
+            other = journal_entry(second, election, candidate)
+            self.assertEqual(ingestor.submit(other), other['id'])
+        retry = dict(journal_entry(first, election, candidate), idempotency_key='key')
+        with self.assertNumQueries(1):
+            self.assertEqual(ingestor.submit(retry), record['id'])
+        self.assertIsNone(ingestor.submit(journal_entry(first, election, candidate)))
+
+    def test_appends_share_a_sync(self):
+        election, (candidate, *_) = make_election()
+        journal = ingest.VoteJournal(self.directory / 'votes-sync.jsonl')
+        self.addCleanup(journal.close)
+        with override_settings(VOTE_INGEST={'FSYNC': True}), mock.patch.object(ingest.os, 'fsync') as fsync:
+            offset = journal.append(journal_entry(make_user(), election, candidate))
+            self.assertEqual(fsync.call_count, 1)
+            # An append that queued behind that sync finds its line on disk
+            journal._sync(offset)
+            self.assertEqual(fsync.call_count, 1)
+
+    def test_replay_dead_letters_unstorable_votes(self):
+        election, (candidate, gone, *_) = make_election()
+        users = [make_user(f'voter{i}') for i in range(5)]
+        delete_behind_snapshot(gone)
+        path = self.directory / 'votes-orphan.jsonl'
+        journal = ingest.VoteJournal(path)
+        for i, u in enumerate(users):
+            journal.append(journal_entry(u, election, gone if i == 0 else candidate))
+        journal.close()
+
+        with self.assertLogs('elections.ingest', 'ERROR'):
+            self.assertEqual(ingest.replay_journal(path), 4)
+        self.assertEqual(len(self.dead_letters()), 1)
+        journal = ingest.VoteJournal(path)
+        self.assertEqual(list(journal.pending()), [])
+        journal.close()
+
+    def test_transient_errors_are_retried_not_dead_lettered(self):
+        election, (candidate, *_) = make_election()
+        records = [journal_entry(make_user(), election, candidate)]
+        with mock.patch.object(ingest, 'write_batch', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                ingest.store_records(records)
+        self.assertEqual(self.dead_letters(), [])
+        self.assertEqual(ingest.store_records(records), (1, 0))
+        # Already stored records are skipped on a retry
+        self.assertEqual(ingest.store_records(records), (0, 0))
+
+
+class AuditWriterTests(ElectionsTransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.dead_letter_file = directory / 'audit-dead-letter.jsonl'
+        self.archive_file = directory / 'archive.jsonl'
+        overrides = override_settings(AUDIT_LOG={
+            'ASYNC': True, 'BATCH_SIZE': 50, 'FLUSH_INTERVAL': 0.05, 'RETRIES': 2, 'RETRY_BACKOFF': 0.01,
+            'DEAD_LETTER_FILE': self.dead_letter_file, 'FILE': self.archive_file,
+        })
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        audit._file_logger = None
+        self.addCleanup(self.close_archive)
+
+    def close_archive(self):
+        if audit._file_logger is not None:
+            for handler in audit._file_logger.handlers[:]:
+                handler.close()
+                audit._file_logger.removeHandler(handler)
+            audit._file_logger = None
+
+    def test_bad_entry_is_dead_lettered_and_the_batch_written(self):
+        election, _ = make_election()
+        user = make_user()
+        entries = [audit.entry(election.id, user.id, 'vote_cast', f'vote {i}') for i in range(5)]
+        entries.insert(2, audit.entry(election.id + 1000, user.id, 'vote_cast', 'orphan'))
+        writer = audit.AuditWriter()
+        self.addCleanup(writer.shutdown)
+        with self.assertLogs('elections.audit', 'ERROR'):
+            for item in entries:
+                writer.put(item)
+            writer.flush()
+
+        self.assertEqual(
+            list(ElectionLog.objects.filter(election=election).order_by('sequence').values_list('details', flat=True)),
+            [f'vote {i}' for i in range(5)],
+        )
+        [letter] = [json.loads(line) for line in self.dead_letter_file.read_text().splitlines()]
+        self.assertEqual(letter['details'], 'orphan')
+        self.assertIn('IntegrityError', letter['error'])
+
+    def test_transient_failure_is_retried(self):
+        election, _ = make_election()
+        calls = []
+        real_write = audit.write_entries
+
+        def flaky(entries):
+            calls.append(len(entries))
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return real_write(entries)
+
+        with mock.patch.object(audit, 'write_entries', flaky), self.assertLogs('elections.audit', 'WARNING'):
+            audit.write_or_dead_letter([audit.entry(election.id, None, 'vote_cast')] * 3)
+        self.assertEqual(calls, [3, 3])
+        self.assertEqual(ElectionLog.objects.count(), 3)
+        self.assertFalse(self.dead_letter_file.exists())
+
+    def test_archive_only_after_commit(self):
+        election, _ = make_election()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            audit.write_entries([audit.entry(election.id, None, 'vote_cast', 'rolled back')])
+            raise RuntimeError
+        audit.write_entries([audit.entry(election.id, None, 'vote_cast', 'kept')])
+        lines = [json.loads(line) for line in self.archive_file.read_text().splitlines()]
+        self.assertEqual([line['details'] for line in lines], ['kept'])
+
+
+def ranked_ballots(*ballots):
+    """
+    Flat (voter, candidate index, rank) columns for ballots given as
+    sequences of candidate indices in preference order.
+    """
+    rows = [(voter, c, rank) for voter, b in enumerate(ballots) for rank, c in enumerate(b, start=1)]
+    return [list(column) for column in zip(*rows)] or [[], [], []]
+
+
+class InstantRunoffTests(TestCase):
+    def run_irv(self, n_candidates, *ballots):
+        return irv.run_irv(irv.build_ballots(*ranked_ballots(*ballots), n_candidates), n_candidates)
+
+    def test_majority_in_first_round(self):
+        rounds = self.run_irv(3, [0, 1], [0], [1, 0])
+        self.assertEqual(len(rounds), 1)
+        self.assertEqual(rounds[0]['tallies'], [2, 1, 0])
+        self.assertEqual(rounds[0]['winner'], 0)
+
+    def test_transfers_and_exhausted_ballots(self):
+        rounds = self.run_irv(3, [0, 1], [0, 1], [1], [1], [2, 0], [2], [2, 1])
+        # 0 and 1 tie on two votes, also in the first round, so the one
+        # listed last goes; its two single-choice ballots are exhausted
+        self.assertEqual(rounds[0]['tallies'], [2, 2, 3])
+        self.assertEqual(rounds[0]['eliminated'], 1)
+        self.assertEqual(rounds[1]['tallies'], [2, 0, 3])
+        self.assertEqual(rounds[1]['exhausted'], 2)
+        # A majority of the ballots still counting
+        self.assertEqual(rounds[1]['winner'], 2)
+
+    def test_ties_for_last_place(self):
+        # Round 2 ties 0 and 2 on three votes; 2 had fewer first-round votes
+        rounds = self.run_irv(3, [0], [0], [0], [1, 2], [2], [2])
+        self.assertEqual(rounds[0]['eliminated'], 1)
+        self.assertEqual(rounds[1]['tallies'], [3, 0, 3])
+        self.assertEqual(rounds[1]['eliminated'], 2)
+        self.assertEqual(rounds[2]['winner'], 0)
+
+    def test_gaps_in_ranks_are_closed(self):
+        ballots = irv.build_ballots([1, 1, 2], [2, 0, 1], [5, 2, 1], 3)
+        self.assertEqual(ballots.tolist(), [[0, 2], [1, 3]])
+
+    def test_no_ballots(self):
+        rounds = self.run_irv(2)
+        self.assertEqual(rounds, [{'tallies': [0, 0], 'exhausted': 0, 'eliminated': None, 'winner': None}])
+
+
+class RunoffResultsTests(ElectionsTestCase):
+    def test_runoff_from_the_database(self):
+        election, candidates = make_election(election_type='ranked_choice')
+        a, b, c = candidates
+        for i, ballot in enumerate([[a], [a], [b, a], [c, b], [c, b]]):
+            voter = make_user(f'voter{i}')
+            Vote.objects.bulk_create(
+                Vote(election=election, voter=voter, candidate=candidate, rank=rank)
+                for rank, candidate in enumerate(ballot, start=1)
+            )
+        results = irv.runoff_results(election)
+        self.assertEqual(results['ballots'], 5)
+        self.assertEqual([r['eliminated'] for r in results['rounds']][:1], [{'id': b.id, 'name': b.name}])
+        self.assertEqual([v['votes'] for v in results['rounds'][1]['candidates']], [3, 0, 2])
+        self.assertEqual(results['winner'], {'id': a.id, 'name': a.name})
+
+    def test_fetch_columns_streams_in_chunks(self):
+        election, (a, b, c) = make_election(election_type='ranked_choice')
+        voters = [make_user(f'voter{i}') for i in range(5)]
+        Vote.objects.bulk_create(Vote(election=election, voter=v, candidate=b, rank=1) for v in voters)
+        queryset = Vote.objects.filter(election=election).order_by('voter_id').values_list('voter_id', 'rank')
+        columns = irv.fetch_columns(queryset, fetch_size=2)
+        self.assertEqual(columns.tolist(), [[v.id, 1] for v in voters])
+
+    def test_endpoint(self):
+        election, (a, b, c) = make_election(election_type='ranked_choice')
+        Vote.objects.create(election=election, voter=make_user(), candidate=c, rank=1)
+        response = client_for(make_user('viewer')).get(f'/api/results/{election.id}/runoff/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['winner']['id'], c.id)
+
+
+@override_settings(DATABASE_REPLICA={'ALIAS': 'replica'})
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        reset_worker_state()
+
+    def test_only_replica_read_views_use_the_replica(self):
+        router = routers.PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Election), 'default')
+        token = routers._replica_reads.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Election), 'replica')
+            self.assertEqual(router.db_for_write(Election), 'default')
+        finally:
+            routers._replica_reads.reset(token)
+        self.assertFalse(router.allow_migrate('replica', 'elections'))
+
+    def test_voting_pins_the_voter_to_the_primary(self):
+        election, (a, *_) = make_election()
+        voter = make_user()
+        self.assertFalse(routers.is_pinned(voter))
+        with override_settings(**TEST_SETTINGS):
+            response = client_for(voter).post('/api/vote/', {'election': election.id, 'candidate': a.id})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(routers.is_pinned(voter))
+        self.assertFalse(routers.is_pinned(make_user('other')))
+
+
+class ReplicaPinCacheCheckTests(TestCase):
+    def databases_with_replica(self, name):
+        return {**settings.DATABASES, 'replica': {**settings.DATABASES['default'], 'NAME': name}}
+
+    def test_separate_replica_needs_a_shared_cache(self):
+        with override_settings(DATABASES=self.databases_with_replica('replica.sqlite3')):
+            self.assertEqual([e.id for e in routers.check_pin_cache()], ['elections.E001'])
+            shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+            with override_settings(CACHES=shared):
+                self.assertEqual(routers.check_pin_cache(), [])
+
+    def test_replica_on_the_primary_file_needs_no_pins(self):
+        name = settings.DATABASES['default']['NAME']
+        with override_settings(DATABASES=self.databases_with_replica(name)):
+            self.assertEqual(routers.check_pin_cache(), [])
+
+
+def cursor_of(next_link):
+    return parse_qs(urlparse(next_link).query)['cursor'][0]
+
+
+class ElectionListTests(ElectionsTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        hour = datetime.timedelta(hours=1)
+        self.closed, _ = make_election(name='closed', start_time=now - 3 * hour, end_time=now - 2 * hour)
+        self.open, _ = make_election(name='open', start_time=now - hour, end_time=now + hour)
+        self.upcoming, _ = make_election(name='upcoming', start_time=now + hour, end_time=now + 2 * hour)
+        self.private, _ = make_election(name='private', visibility='private')
+
+    def names(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return [e['name'] for e in response.json()['results']]
+
+    def test_pages_follow_the_cursor(self):
+        # Same start_time, so the id breaks the tie
+        for name in ('tie 1', 'tie 2'):
+            make_election(name=name, start_time=self.open.start_time)
+        client = APIClient()
+        seen, url = [], '/api/elections/?page_size=2'
+        while url:
+            data = client.get(url).json()
+            seen += [e['name'] for e in data['results']]
+            url = data['next'] and f'/api/elections/?page_size=2&cursor={cursor_of(data["next"])}'
+        self.assertEqual(seen, ['upcoming', 'tie 2', 'tie 1', 'open', 'closed'])
+
+    def test_status_filters(self):
+        client = APIClient()
+        self.assertEqual(self.names(client.get('/api/elections/?status=open')), ['open'])
+        self.assertEqual(self.names(client.get('/api/elections/?status=upcoming')), ['upcoming'])
+        self.assertEqual(self.names(client.get('/api/elections/?status=closed')), ['closed'])
+        self.assertEqual(client.get('/api/elections/?status=soon').status_code, 400)
+
+    def test_open_filter_reads_the_bound_with_one_aggregate(self):
+        with self.assertNumQueries(2):
+            self.names(APIClient().get('/api/elections/?status=open'))
+
+    def test_private_elections_only_for_eligible_voters(self):
+        voter = make_user()
+        self.assertNotIn('private', self.names(client_for(voter).get('/api/elections/')))
+        VoterEligibility.objects.create(election=self.private, voter=voter)
+        self.assertIn('private', self.names(client_for(voter).get('/api/elections/')))
+        self.assertNotIn('private', self.names(APIClient().get('/api/elections/')))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(APIClient().get('/api/elections/?cursor=garbage').status_code, 404)
+
+
+class VoteTallyTests(ElectionsTestCase):
+    def test_votes_update_the_tallies(self):
+        election, (a, b, c) = make_election()
+        for i, candidate in enumerate([a, a, b]):
+            response = client_for(make_user(f'voter{i}')).post(
+                '/api/vote/', {'election': election.id, 'candidate': candidate.id}
+            )
+            self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(
+            dict(VoteTally.objects.filter(election=election).values_list('candidate_id', 'count')),
+            {a.id: 2, b.id: 1},
+        )
+        self.assertEqual(
+            [(t['id'], t['votes']) for t in tallies.candidate_totals(election)],
+            [(a.id, 2), (b.id, 1), (c.id, 0)],
+        )
+
+    def test_record_votes_batches_per_election(self):
+        election, (a, b, c) = make_election()
+        votes = [
+            Vote(election=election, voter=make_user(f'voter{i}'), candidate=candidate, rank=rank)
+            for i, (candidate, rank) in enumerate([(a, 1), (a, 1), (b, 2)])
+        ]
+        with self.assertNumQueries(2):
+            tallies.record_votes(votes)
+        self.assertEqual(tallies.stored_tallies([election.id]), {
+            (election.id, a.id, 1): 2, (election.id, b.id, 2): 1,
+        })
+
+    def test_drift_is_reported_and_rebuilt(self):
+        election, (a, b, c) = make_election()
+        Vote.objects.create(election=election, voter=make_user(), candidate=a)
+        VoteTally.objects.create(election=election, candidate=b, count=4)
+        self.assertEqual(tallies.diff_tallies([election.id]), {
+            (election.id, a.id, 1): (0, 1), (election.id, b.id, 1): (4, 0),
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            tallies.rebuild_tallies([election.id])
+        self.assertEqual(tallies.diff_tallies([election.id]), {})
+
+
+class ResultsCacheTests(ElectionsTestCase):
+    def test_results_are_cached_until_a_vote(self):
+        election, (a, b, c) = make_election()
+        client = APIClient()
+        self.assertEqual(client.get(f'/api/results/{election.id}/').json()['candidates'][0]['votes'], 0)
+        with self.assertNumQueries(0):
+            client.get(f'/api/results/{election.id}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client_for(make_user()).post('/api/vote/', {'election': election.id, 'candidate': a.id})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(client.get(f'/api/results/{election.id}/').json()['candidates'][0]['votes'], 1)
+
+    def test_unknown_election(self):
+        self.assertEqual(APIClient().get('/api/results/999/').status_code, 404)
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            # Hold the lock long enough for the other readers to queue up
+            threading.Event().wait(0.2)
+            return {'value': 1}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cached_results(1, compute)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [{'value': 1}] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_invalidation_changes_the_key(self):
+        cached_results(1, lambda: 'old')
+        self.assertEqual(cached_results(1, lambda: 'new'), 'old')
+        invalidate_results(1)
+        self.assertEqual(cached_results(1, lambda: 'new'), 'new')
+
+
+class BallotTests(ElectionsTestCase):
+    def cast(self, election, candidates):
+        user = make_user(f'voter{User.objects.count()}')
+        return client_for(user).post(
+            '/api/ballot/', {'election': election.id, 'candidates': [c.id for c in candidates]}, format='json'
+        )
+
+    def test_ranked_ballot_stores_the_order(self):
+        election, (a, b, c) = make_election(election_type='ranked_choice')
+        response = self.cast(election, [c, a])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(response.json()['vote_ids']), 2)
+        self.assertEqual(
+            list(Vote.objects.filter(election=election).order_by('rank').values_list('candidate_id', 'rank')),
+            [(c.id, 1), (a.id, 2)],
+        )
+        self.assertEqual(tallies.stored_tallies([election.id]), {(election.id, c.id, 1): 1, (election.id, a.id, 2): 1})
+
+    def test_multiple_choice_selections_are_all_rank_one(self):
+        election, (a, b, c) = make_election(election_type='multiple_choice', max_votes_per_voter=2)
+        self.assertEqual(self.cast(election, [a, b]).status_code, 201)
+        self.assertEqual(set(Vote.objects.filter(election=election).values_list('rank', flat=True)), {1})
+
+    def test_invalid_ballots(self):
+        election, (a, b, c) = make_election(election_type='multiple_choice', max_votes_per_voter=2)
+        other, (stranger, *_) = make_election()
+        for candidates, message in [
+            ([a, b, c], 'You may select at most 2 candidates.'),
+            ([a, a], 'Each candidate may only appear once on a ballot.'),
+            ([a, stranger], 'Invalid candidate for this election.'),
+        ]:
+            response = self.cast(election, candidates)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(message, str(response.json()))
+        response = self.cast(other, [stranger, *other.candidates.exclude(pk=stranger.pk)[:1]])
+        self.assertIn('Single choice elections take exactly one candidate.', str(response.json()))
+        self.assertFalse(Vote.objects.exists())
+
+    def test_closed_election(self):
+        now = timezone.now()
+        election, (a, *_) = make_election(end_time=now - datetime.timedelta(minutes=1))
+        self.assertIn('Election is not active.', str(self.cast(election, [a]).json()))
+
+
+def parse_event(message):
+    event, data = message.strip().split('\n')
+    return event.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+
+@override_settings(LIVE_RESULTS={'TICK': 0, 'KEEPALIVE': 5})
+class LiveResultsTests(ElectionsTestCase):
+    def test_snapshot_then_changed_candidates_only(self):
+        election, (a, b, c) = make_election()
+
+        async def read_events():
+            stream = live.event_stream(election.id)
+            try:
+                first = await stream.__anext__()
+                await sync_to_async(VoteTally.objects.create)(election=election, candidate=b, count=2)
+                await sync_to_async(tallies.notify_results_changed)(election.id)
+                return first, await stream.__anext__()
+            finally:
+                await stream.aclose()
+
+        first, second = async_to_sync(read_events)()
+        event, data = parse_event(first)
+        self.assertEqual(event, 'results')
+        self.assertEqual([cand['votes'] for cand in data['candidates']], [0, 0, 0])
+        event, data = parse_event(second)
+        self.assertEqual(event, 'delta')
+        self.assertEqual(data['candidates'], [{'id': b.id, 'name': b.name, 'votes': 2}])
+        self.assertEqual(data['removed'], [])
+        # The last subscriber leaving stops the broadcaster
+        self.assertNotIn(election.id, [key[1] for key in live._broadcasters])
+
+    def test_failed_read_closes_the_streams(self):
+        election, _ = make_election()
+
+        async def read_events():
+            stream = live.event_stream(election.id)
+            return [message async for message in stream]
+
+        with mock.patch.object(live, 'candidate_totals', side_effect=OperationalError('disk I/O error')), \
+                self.assertLogs('elections.live', 'ERROR'):
+            self.assertEqual(async_to_sync(read_events)(), [])
+        self.assertNotIn(election.id, [key[1] for key in live._broadcasters])
+
+    def test_pubsub_unsubscribe(self):
+        pubsub = live.InMemoryPubSub()
+        received = []
+        unsubscribe = pubsub.subscribe('channel', received.append)
+        pubsub.publish('channel', 1)
+        unsubscribe()
+        pubsub.publish('channel', 2)
+        self.assertEqual(received, [1])
+
+    def test_unknown_election(self):
+        response = async_to_sync(self.async_client.get)('/api/results/999/live/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_wsgi_is_refused(self):
+        election, _ = make_election()
+        self.assertEqual(self.client.get(f'/api/results/{election.id}/live/').status_code, 501)
+
+
+class ReceiptTests(ElectionsTestCase):
+    def test_retry_with_the_same_key_returns_the_receipt(self):
+        election, (a, b, c) = make_election()
+        client = client_for(make_user())
+        vote = {'election': election.id, 'candidate': a.id}
+        first = client.post('/api/vote/', vote, HTTP_IDEMPOTENCY_KEY='key-1')
+        retry = client.post('/api/vote/', vote, HTTP_IDEMPOTENCY_KEY='key-1')
+        self.assertEqual(first.status_code, 201, first.content)
+        self.assertEqual(retry.status_code, 201, retry.content)
+        self.assertEqual(retry.json()['receipt'], first.json()['receipt'])
+        self.assertEqual(retry.json()['vote_id'], first.json()['vote_id'])
+        self.assertEqual(Vote.objects.count(), 1)
+
+        other_key = client.post('/api/vote/', vote, HTTP_IDEMPOTENCY_KEY='key-2')
+        self.assertEqual(other_key.status_code, 400)
+        no_key = client.post('/api/vote/', vote)
+        self.assertEqual(no_key.status_code, 400)
+
+    def test_ballot_retry_returns_the_same_votes(self):
+        election, (a, b, c) = make_election(election_type='ranked_choice')
+        client = client_for(make_user())
+        ballot = {'election': election.id, 'candidates': [b.id, a.id]}
+        first = client.post('/api/ballot/', ballot, format='json', HTTP_IDEMPOTENCY_KEY='key')
+        retry = client.post('/api/ballot/', ballot, format='json', HTTP_IDEMPOTENCY_KEY='key')
+        self.assertEqual(retry.status_code, 201, retry.content)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(tallies.stored_tallies([election.id]), {(election.id, b.id, 1): 1, (election.id, a.id, 2): 1})
+
+    def test_voted_election_ids(self):
+        election, (a, *_) = make_election()
+        make_election(name='other')
+        client = client_for(make_user())
+        client.post('/api/vote/', {'election': election.id, 'candidate': a.id})
+        self.assertEqual(client.get('/api/my-votes/election-ids/').json(), {'election_ids': [election.id]})
+
+
+class ConcurrentVoteTests(ElectionsTransactionTestCase):
+    def test_parallel_votes_store_one(self):
+        election, (a, *_) = make_election()
+        user = make_user()
+        barrier = threading.Barrier(4)
+        statuses = []
+
+        def vote():
+            barrier.wait()
+            try:
+                response = client_for(user).post('/api/vote/', {'election': election.id, 'candidate': a.id})
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=vote) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(statuses), [201, 400, 400, 400])
+        self.assertEqual(Vote.objects.filter(voter=user).count(), 1)
+        self.assertEqual(VoteTally.objects.get(election=election, candidate=a).count, 1)
+
+
+class SnapshotTests(ElectionsTestCase):
+    def test_warm_snapshot_reads_nothing(self):
+        election, (a, b, c) = make_election()
+        snapshot = snapshots.get_snapshot(election.id)
+        self.assertEqual(snapshot.candidates, {a.id: a.name, b.id: b.name, c.id: c.name})
+        with self.assertNumQueries(0):
+            self.assertIs(snapshots.get_snapshot(str(election.id)), snapshot)
+
+    def test_vote_path_skips_election_and_candidate_reads(self):
+        election, (a, *_) = make_election()
+        snapshots.get_snapshot(election.id)
+        with CaptureQueriesContext(connection) as queries:
+            response = client_for(make_user()).post('/api/vote/', {'election': election.id, 'candidate': a.id})
+        self.assertEqual(response.status_code, 201, response.content)
+        reads = [q['sql'] for q in queries if q['sql'].startswith('SELECT')]
+        self.assertFalse([sql for sql in reads if '"elections_election"' in sql or '"elections_candidate"' in sql])
+
+    def test_changes_invalidate_after_commit(self):
+        election, (a, *_) = make_election()
+        snapshots.get_snapshot(election.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            a.name = 'Renamed'
+            a.save()
+        self.assertEqual(snapshots.get_snapshot(election.id).candidates[a.id], 'Renamed')
+
+    def test_other_workers_see_the_version_bump(self):
+        election, _ = make_election()
+        stale = snapshots.get_snapshot(election.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            snapshots.invalidate_snapshot(election.id)
+        # Another worker still holds the old snapshot in its own dict
+        snapshots._snapshots[election.id] = stale
+        self.assertIsNot(snapshots.get_snapshot(election.id), stale)
+
+    def test_ttl(self):
+        election, _ = make_election()
+        stale = snapshots.get_snapshot(election.id)
+        with override_settings(ELECTION_SNAPSHOTS={'TTL': 0}):
+            self.assertIsNot(snapshots.get_snapshot(election.id), stale)
+
+    def test_unknown_election(self):
+        with self.assertRaises(Election.DoesNotExist):
+            snapshots.get_snapshot(999)
+
+
+class AuditChainTests(ElectionsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.election, _ = make_election()
+        self.append(5)
+
+    def append(self, n):
+        audit.write_entries([audit.entry(self.election.id, None, 'test', f'entry {i}') for i in range(n)])
+
+    def log(self, sequence):
+        return ElectionLog.objects.filter(election=self.election, sequence=sequence)
+
+    def test_entries_are_chained(self):
+        entries = list(ElectionLog.objects.filter(election=self.election).order_by('sequence'))
+        self.assertEqual([e.sequence for e in entries], [1, 2, 3, 4, 5])
+        self.assertEqual(entries[0].prev_hash, audit.GENESIS_HASH)
+        for previous, current in zip(entries, entries[1:]):
+            self.assertEqual(current.prev_hash, previous.entry_hash)
+
+    def test_admin_cannot_edit_the_log(self):
+        self.client.force_login(make_user('admin', is_staff=True, is_superuser=True))
+        entry = self.log(1).get()
+        self.assertEqual(self.client.get('/admin/elections/electionlog/').status_code, 200)
+        self.assertEqual(self.client.get(f'/admin/elections/electionlog/{entry.pk}/change/').status_code, 200)
+        self.assertEqual(
+            self.client.post(f'/admin/elections/electionlog/{entry.pk}/change/', {'details': 'x'}).status_code, 403
+        )
+        self.assertEqual(self.client.get('/admin/elections/electionlog/add/').status_code, 403)
+        self.assertEqual(self.client.post(f'/admin/elections/electionlog/{entry.pk}/delete/').status_code, 403)
+        self.assertEqual(self.log(1).get().details, entry.details)
+
+    def test_verification_resumes_from_the_checkpoint(self):
+        self.assertEqual(audit.verify_chain(self.election.id), (5, 5))
+        self.append(2)
+        self.assertEqual(audit.verify_chain(self.election.id), (2, 7))
+        self.assertEqual(audit.verify_chain(self.election.id), (0, 7))
+        self.assertEqual(
+            list(AuditCheckpoint.objects.filter(election=self.election).values_list('sequence', flat=True)), [5, 7]
+        )
+
+    def test_modified_entry(self):
+        self.log(3).update(details='rewritten')
+        with self.assertRaisesMessage(audit.ChainError, 'entry #3 has been modified'):
+            audit.verify_chain(self.election.id)
+
+    def test_modification_behind_a_checkpoint_needs_a_full_check(self):
+        audit.verify_chain(self.election.id)
+        self.log(3).update(details='rewritten')
+        self.assertEqual(audit.verify_chain(self.election.id), (0, 5))
+        with self.assertRaisesMessage(audit.ChainError, 'entry #3 has been modified'):
+            audit.verify_chain(self.election.id, full=True)
+
+    def test_missing_entry(self):
+        self.log(3).delete()
+        with self.assertRaisesMessage(audit.ChainError, 'entries #3..#3 are missing'):
+            audit.verify_chain(self.election.id)
+
+    def test_truncated_after_checkpoint(self):
+        audit.verify_chain(self.election.id)
+        ElectionLog.objects.filter(election=self.election, sequence__gte=4).delete()
+        with self.assertRaisesMessage(audit.ChainError, 'entry #5 does not match its checkpoint'):
+            audit.verify_chain(self.election.id)
+
+    def test_forged_checkpoint(self):
+        audit.verify_chain(self.election.id)
+        AuditCheckpoint.objects.filter(election=self.election).update(entry_hash='0' * 64)
+        with self.assertRaisesMessage(audit.ChainError, 'checkpoint #5 has an invalid signature'):
+            audit.verify_chain(self.election.id)
+
+    def test_rewritten_chain_does_not_match_the_checkpoint(self):
+        audit.verify_chain(self.election.id)
+        # Rehash entry 5 consistently; only the signed checkpoint catches it
+        row = self.log(5).get()
+        row.details = 'rewritten'
+        row.entry_hash = audit.chain_hash(
+            row.prev_hash, row.election_id, row.sequence, row.user_id, row.action, row.details,
+            row.ip_address, row.timestamp,
+        )
+        row.save()
+        with self.assertRaisesMessage(audit.ChainError, 'entry #5 does not match its checkpoint'):
+            audit.verify_chain(self.election.id)
+
+    def test_pruned_head_needs_a_checkpoint(self):
+        ElectionLog.objects.filter(election=self.election, sequence__lte=2).delete()
+        with self.assertRaisesMessage(audit.ChainError, 'entries before #3 were pruned and no checkpoint covers them'):
+            audit.verify_chain(self.election.id, full=True)
+
+    def test_pruned_head_resumes_from_the_checkpoint(self):
+        audit.verify_chain(self.election.id)
+        self.append(2)
+        audit.verify_chain(self.election.id)
+        # The checkpointed entry kept, as prune_election_logs leaves it
+        self.log(1).delete()
+        self.log(2).delete()
+        self.log(3).delete()
+        self.log(4).delete()
+        self.assertEqual(audit.verify_chain(self.election.id, full=True), (3, 7))
+        # The checkpointed entry pruned too
+        self.log(5).delete()
+        self.assertEqual(audit.verify_chain(self.election.id, full=True), (2, 7))
+
+    def test_pruned_past_the_checkpoint(self):
+        audit.verify_chain(self.election.id)
+        self.append(2)
+        ElectionLog.objects.filter(election=self.election, sequence__lte=6).delete()
+        # #7's stored link is not trusted: the chain restarts at checkpoint #5
+        with self.assertRaisesMessage(audit.ChainError, 'entries #6..#6 are missing'):
+            audit.verify_chain(self.election.id, full=True)
+
+    def test_prune_keeps_the_checkpointed_entry(self):
+        audit.verify_chain(self.election.id)
+        self.append(2)
+        call_command('prune_election_logs', days=0, stdout=io.StringIO())
+        self.assertEqual(
+            list(ElectionLog.objects.filter(election=self.election).values_list('sequence', flat=True).order_by('sequence')),
+            [5, 6, 7],
+        )
+        self.assertEqual(audit.verify_chain(self.election.id, full=True), (3, 7))
+
+
+class EncryptedBallotTests(ElectionsTestCase):
+    def test_cipher_binds_the_election(self):
+        key = ballots.election_key(1)
+        token = BallotCipher(key, 1).encrypt([3, 1])
+        self.assertEqual(BallotCipher(key, 1).decrypt(token), [3, 1])
+        # Copied into another election's ballots it no longer decrypts
+        self.assertIsNone(BallotCipher(key, 2).decrypt(token))
+        self.assertIsNone(BallotCipher(key, 1).decrypt('not a ballot'))
+
+    def cast_encrypted(self, election, *ballot_list):
+        for i, candidates in enumerate(ballot_list):
+            response = client_for(make_user(f'voter{i}')).post(
+                '/api/ballot/', {'election': election.id, 'candidates': [c.id for c in candidates]}, format='json'
+            )
+            self.assertEqual(response.status_code, 201, response.content)
+
+    def test_ballots_are_sealed_until_tallied(self):
+        election, (a, b, c) = make_election(election_type='ranked_choice', encrypted_ballots=True)
+        self.cast_encrypted(election, [a, b], [b], [a, c])
+        self.assertEqual(Vote.objects.filter(election=election, candidate__isnull=True).count(), 3)
+        self.assertFalse(VoteTally.objects.filter(election=election).exists())
+        response = APIClient().get(f'/api/results/{election.id}/runoff/')
+        self.assertEqual(response.status_code, 403)
+
+        # A tampered ballot is skipped, not counted
+        Vote.objects.create(election=election, voter=make_user('tamperer'), encrypted_vote='AAAA')
+        with self.assertLogs('elections.ballots', 'WARNING'):
+            counted, unreadable = ballots.tally_encrypted(election, workers=1)
+        self.assertEqual((counted, unreadable), (3, 1))
+        self.assertEqual(dict(
+            ((c, r), n) for c, r, n in VoteTally.objects.values_list('candidate_id', 'rank', 'count')
+        ), {
+            (a.id, 1): 2, (b.id, 2): 1, (b.id, 1): 1, (c.id, 2): 1,
+        })
+
+    def test_closing_does_not_count_the_ballots(self):
+        election, (a, b, c) = make_election(election_type='ranked_choice', encrypted_ballots=True)
+        self.cast_encrypted(election, [a, b], [b], [a, c])
+        admin = bearer_client(make_user('admin', is_superuser=True))
+        url = f'/api/admin/elections/{election.id}/close/'
+        self.assertEqual(admin.post(url).status_code, 400)
+
+        Election.objects.filter(pk=election.id).update(end_time=timezone.now())
+        with mock.patch.object(ballots, 'tally_encrypted') as tally:
+            self.assertEqual(admin.post(url).status_code, 200)
+        tally.assert_not_called()
+        self.assertFalse(VoteTally.objects.filter(election=election).exists())
+        runoff = f'/api/results/{election.id}/runoff/'
+        self.assertEqual(APIClient().get(runoff).status_code, 403)
+
+        call_command('tally_encrypted_ballots', election=[election.id], workers=1, stdout=io.StringIO())
+        self.assertEqual(VoteTally.objects.filter(election=election, rank=1).count(), 2)
+        with mock.patch('elections.views.runoff_results') as compute:
+            response = APIClient().get(runoff)
+        compute.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['winner']['id'], a.id)
+
+    def test_runoff_decrypts_the_ballots(self):
+        election, (a, b, c) = make_election(election_type='ranked_choice', encrypted_ballots=True)
+        self.cast_encrypted(election, [c, a], [c], [a], [a], [b, a])
+        results = irv.runoff_results(election)
+        self.assertEqual(results['ballots'], 5)
+        self.assertEqual(results['rounds'][0]['eliminated']['id'], b.id)
+        self.assertEqual(results['winner']['id'], a.id)
+
+    def test_tally_across_worker_processes(self):
+        election, (a, b, c) = make_election(encrypted_ballots=True)
+        self.cast_encrypted(election, [a], [a], [b])
+        counts, total, invalid = ballots.parallel_tally(
+            ballots._tokens(election), election.id, ranked=False, workers=2, chunk_size=1
+        )
+        self.assertEqual(counts, {(a.id, 1): 2, (b.id, 1): 1})
+        self.assertEqual((total, invalid), (3, 0))
+
+
+def throttled(**rates):
+    return dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES=rates)
+
+
+class TokenBucketTests(ElectionsTestCase):
+    def test_parse_rate(self):
+        self.assertEqual(throttling.parse_rate('10/min'), (10, 10 / 60))
+        self.assertEqual(throttling.parse_rate('2/s'), (2, 2))
+
+    def check_bucket(self, store):
+        take = lambda now: store.take('key', 2, 1.0, now)
+        self.assertEqual([take(100.0), take(100.0)], [0, 0])
+        self.assertEqual(take(100.0), 1.0)
+        self.assertEqual(take(100.5), 0.5)
+        self.assertEqual(take(101.0), 0)
+        # Refills up to capacity, not beyond
+        self.assertEqual([take(200.0), take(200.0), take(200.0)], [0, 0, 1.0])
+
+    def test_memory_store(self):
+        self.check_bucket(throttling.MemoryBucketStore(max_keys=10))
+
+    def test_cache_store(self):
+        self.check_bucket(throttling.CacheBucketStore('default'))
+
+    def test_memory_store_prunes_the_oldest_buckets(self):
+        store = throttling.MemoryBucketStore(max_keys=4)
+        for i in range(5):
+            store.take(f'key{i}', 1, 1.0, float(i))
+        self.assertEqual(sorted(store._buckets), ['key2', 'key3', 'key4'])
+
+    def test_vote_rate_returns_429_with_retry_after(self):
+        election, (a, *_) = make_election()
+        client = client_for(make_user())
+        vote = {'election': election.id, 'candidate': a.id}
+        with override_settings(REST_FRAMEWORK=throttled(vote_user='2/min')):
+            self.assertEqual(client.post('/api/vote/', vote).status_code, 201)
+            self.assertEqual(client.post('/api/vote/', vote).status_code, 400)
+            response = client.post('/api/vote/', vote)
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '30')
+            # Other users have their own bucket
+            self.assertEqual(client_for(make_user('other')).post('/api/vote/', vote).status_code, 201)
+
+    def test_login_attempts_per_username(self):
+        make_user('target')
+        with override_settings(REST_FRAMEWORK=throttled(login_username='1/min')):
+            first = APIClient(REMOTE_ADDR='10.0.0.1').post('/api/token/', {'username': 'target', 'password': 'x'})
+            self.assertEqual(first.status_code, 401)
+            # From another address, and with different case, still the same bucket
+            second = APIClient(REMOTE_ADDR='10.0.0.2').post('/api/token/', {'username': 'Target', 'password': 'x'})
+            self.assertEqual(second.status_code, 429)
+            other = APIClient(REMOTE_ADDR='10.0.0.2').post('/api/token/', {'username': 'someone', 'password': 'x'})
+            self.assertEqual(other.status_code, 401)
+
+
+class EligibilityImportTests(ElectionsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.election, _ = make_election(visibility='private')
+        self.alice = make_user('alice', email='alice@example.com')
+        self.bob = make_user('bob')
+
+    def eligible(self):
+        return set(VoterEligibility.objects.filter(election=self.election).values_list('voter_id', flat=True))
+
+    def test_read_identifiers(self):
+        read = lambda text, fmt: list(eligibility.read_identifiers(io.StringIO(text), fmt))
+        self.assertEqual(read('Name,Email\nA,alice@example.com\nB, bob \n', 'csv'), ['alice@example.com', 'bob'])
+        self.assertEqual(read('alice\nbob\n\n', 'csv'), ['alice', 'bob'])
+        self.assertEqual(read('{"email": "alice@example.com"}\n"bob"\n\n', 'jsonl'), ['alice@example.com', 'bob'])
+
+    def test_import_resolves_usernames_and_emails(self):
+        stats = eligibility.import_eligibility(
+            self.election, ['alice@example.com', 'bob', 'nobody', 'bob', 'alice'], batch_size=2
+        )
+        self.assertEqual((stats.rows, stats.matched, stats.unknown), (5, 4, 1))
+        self.assertEqual(self.eligible(), {self.alice.id, self.bob.id})
+        # Importing the same list again changes nothing
+        eligibility.import_eligibility(self.election, ['bob'])
+        self.assertEqual(self.eligible(), {self.alice.id, self.bob.id})
+
+    def test_admin_upload(self):
+        admin = make_user('admin', is_superuser=True)
+        upload = SimpleUploadedFile('voters.csv', b'username\nalice\nnobody\n')
+        response = bearer_client(admin).post(
+            f'/api/admin/elections/{self.election.id}/eligibility/', {'file': upload}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual((response.json()['matched'], response.json()['unknown']), (1, 1))
+        self.assertEqual(self.eligible(), {self.alice.id})
+
+    def test_upload_errors(self):
+        url = f'/api/admin/elections/{self.election.id}/eligibility/'
+        admin = bearer_client(make_user('admin', is_superuser=True))
+        self.assertEqual(admin.post(url, {}, format='multipart').status_code, 400)
+        upload = SimpleUploadedFile('voters.txt', b'alice\n')
+        self.assertEqual(admin.post(url, {'file': upload, 'format': 'xml'}, format='multipart').status_code, 400)
+        upload = SimpleUploadedFile('voters.jsonl', b'{not json\n')
+        self.assertEqual(admin.post(url, {'file': upload}, format='multipart').status_code, 400)
+        upload = SimpleUploadedFile('voters.csv', b'alice\n')
+        self.assertEqual(bearer_client(self.bob).post(url, {'file': upload}, format='multipart').status_code, 403)
+
+
+class MembershipIndexTests(ElectionsTestCase):
+    def test_dense_ids_use_a_bitmap(self):
+        index = membership.EligibilityIndex(1, [5, 7, 12, 7], 0)
+        self.assertIsNotNone(index.bits)
+        self.assertEqual(len(index), 3)
+        self.assertEqual([i for i in range(20) if i in index], [5, 7, 12])
+
+    def test_sparse_ids_use_a_sorted_array(self):
+        index = membership.EligibilityIndex(1, [10 ** 9, 3, 10 ** 6], 0)
+        self.assertIsNone(index.bits)
+        self.assertEqual(index.nbytes, 24)
+        self.assertTrue(all(i in index for i in (3, 10 ** 6, 10 ** 9)))
+        self.assertFalse(any(i in index for i in (0, 4, 10 ** 9 + 1)))
+
+    def test_empty(self):
+        self.assertNotIn(1, membership.EligibilityIndex(1, [], 0))
+
+    def test_private_election_votes(self):
+        election, (a, *_) = make_election(visibility='private')
+        voter, outsider = make_user(), make_user('outsider')
+        VoterEligibility.objects.create(election=election, voter=voter)
+        vote = {'election': election.id, 'candidate': a.id}
+        self.assertEqual(client_for(outsider).post('/api/vote/', vote).status_code, 403)
+        self.assertEqual(client_for(voter).post('/api/vote/', vote).status_code, 201)
+
+    def test_warm_index_reads_nothing(self):
+        election, _ = make_election(visibility='private')
+        voter = make_user()
+        VoterEligibility.objects.create(election=election, voter=voter)
+        membership.get_index(election.id)
+        with self.assertNumQueries(0):
+            self.assertTrue(membership.is_eligible(election, voter.id))
+
+    def test_changes_invalidate_the_index(self):
+        election, _ = make_election(visibility='private')
+        voter = make_user()
+        self.assertFalse(membership.is_eligible(election, voter.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            election.eligible_voters.add(voter)
+        self.assertTrue(membership.is_eligible(election, voter.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            voter.election_set.clear()
+        self.assertFalse(membership.is_eligible(election, voter.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            eligibility.import_eligibility(election, [voter.username])
+        self.assertTrue(membership.is_eligible(election, voter.id))
+
+
+class MyVotesTests(ElectionsTestCase):
+    def test_history_pages_take_one_query_each(self):
+        voter = make_user()
+        votes = []
+        for i in range(3):
+            election, (a, *_) = make_election(name=f'election {i}')
+            votes.append(Vote.objects.create(election=election, voter=voter, candidate=a))
+        other_election, (b, *_) = make_election(name='not mine')
+        Vote.objects.create(election=other_election, voter=make_user('other'), candidate=b)
+
+        client = client_for(voter)
+        with self.assertNumQueries(1):
+            first = client.get('/api/my-votes/?page_size=2').json()
+        self.assertEqual([v['election']['name'] for v in first['results']], ['election 2', 'election 1'])
+        self.assertEqual(set(first['results'][0]), {'election', 'candidate', 'timestamp'})
+        self.assertEqual(first['results'][0]['candidate'], {'id': votes[2].candidate_id, 'name': 'Candidate 0'})
+
+        second = client.get(f'/api/my-votes/?page_size=2&cursor={cursor_of(first["next"])}').json()
+        self.assertEqual([v['election']['name'] for v in second['results']], ['election 0'])
+        self.assertIsNone(second['next'])
+
+    def test_requires_authentication(self):
+        self.assertEqual(APIClient().get('/api/my-votes/').status_code, 401)
+
+
+class RenderedCacheTests(ElectionsTestCase):
+    def test_detail_is_served_from_the_cache_with_an_etag(self):
+        election, _ = make_election()
+        client = APIClient()
+        first = client.get(f'/api/elections/{election.id}/')
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = client.get(f'/api/elections/{election.id}/')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        not_modified = client.get(f'/api/elections/{election.id}/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(client.get(f'/api/elections/{election.id}/', HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_changes_invalidate_detail_and_list(self):
+        election, (a, *_) = make_election()
+        client = APIClient()
+        detail = client.get(f'/api/elections/{election.id}/')
+        listing = client.get('/api/elections/')
+        with self.captureOnCommitCallbacks(execute=True):
+            a.name = 'Renamed'
+            a.save()
+        self.assertIn(b'Renamed', client.get(f'/api/elections/{election.id}/').content)
+        self.assertNotEqual(client.get(f'/api/elections/{election.id}/')['ETag'], detail['ETag'])
+        with self.captureOnCommitCallbacks(execute=True):
+            election.name = 'Renamed election'
+            election.save()
+        response = client.get('/api/elections/', HTTP_IF_NONE_MATCH=listing['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Renamed election', response.content)
+
+    def test_signed_in_lists_are_not_shared(self):
+        election, _ = make_election(visibility='private')
+        voter = make_user()
+        VoterEligibility.objects.create(election=election, voter=voter)
+        APIClient().get('/api/elections/')
+        response = client_for(voter).get('/api/elections/')
+        self.assertNotIn('ETag', response)
+        self.assertEqual([e['id'] for e in response.json()['results']], [election.id])
+
+    def test_browsable_api_bypasses_the_cache(self):
+        election, _ = make_election()
+        response = APIClient().get(f'/api/elections/{election.id}/', HTTP_ACCEPT='text/html')
+        self.assertNotIn('ETag', response)
+
+
+class FastJSONTests(TestCase):
+    data = {
+        'text': 'caf\u00e9 \u2028',
+        'amount': Decimal('1.50'),
+        'when': datetime.datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc),
+        'day': datetime.date(2026, 1, 2),
+        'id': uuid.UUID(int=1),
+        'lazy': gettext_lazy('Hello'),
+        'counts': {1: 2},
+        'big': 2 ** 70,
+    }
+
+    def test_renders_like_drf(self):
+        expected = JSONRenderer().render(self.data)
+        self.assertEqual(FastJSONRenderer().render(self.data), expected)
+        with mock.patch('elections.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.data), expected)
+
+    def test_indented_output_falls_back(self):
+        rendered = FastJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(rendered, b'{\n  "a": 1\n}')
+
+    def test_parser(self):
+        parse = lambda body, **context: FastJSONParser().parse(io.BytesIO(body), parser_context=context)
+        self.assertEqual(parse(b'{"a": [1, "\xc3\xa9"]}'), {'a': [1, 'é']})
+        self.assertEqual(parse('{"a": "é"}'.encode('latin-1'), encoding='latin-1'), {'a': 'é'})
+        with self.assertRaises(ParseError):
+            parse(b'{"a": ')
+        with self.assertRaises(ParseError):
+            parse(b'"\xff"')
+
+
+class CandidateSyncTests(ElectionsTestCase):
+    def test_diff_is_applied_in_bulk(self):
+        election, (a, b, c) = make_election()
+        other, (stranger, *_) = make_election(name='other')
+        submitted = [
+            {'id': a.id, 'name': a.name},
+            {'id': b.id, 'name': 'Renamed', 'order': 7},
+            {'name': 'New'},
+            # Another election's candidate is not moved; it is added as new
+            {'id': stranger.id, 'name': 'Copied'},
+        ]
+        # Load, then in a savepoint: collect, cascade and delete, one
+        # update and one insert, however many candidates change
+        with self.assertNumQueries(9):
+            self.assertEqual(candidates.sync_candidates(election, submitted), (2, 1, 1))
+        self.assertEqual(
+            sorted(election.candidates.values_list('name', flat=True)),
+            ['Candidate 0', 'Copied', 'New', 'Renamed'],
+        )
+        self.assertFalse(Candidate.objects.filter(pk=c.pk).exists())
+        self.assertEqual(Candidate.objects.get(pk=b.pk).order, 7)
+        self.assertEqual(Candidate.objects.get(pk=stranger.pk).election_id, other.id)
+
+    def test_admin_update_refreshes_snapshots_and_results(self):
+        election, (a, b, c) = make_election()
+        admin = bearer_client(make_user('admin', is_superuser=True))
+        snapshots.get_snapshot(election.id)
+        APIClient().get(f'/api/results/{election.id}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = admin.patch(
+                f'/api/admin/elections/{election.id}/',
+                {'candidates': [{'id': a.id, 'name': 'Renamed'}, {'name': 'New'}]}, format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            sorted(snapshots.get_snapshot(election.id).candidates.values()), ['New', 'Renamed']
+        )
+        results = APIClient().get(f'/api/results/{election.id}/').json()
+        self.assertEqual(sorted(c['name'] for c in results['candidates']), ['New', 'Renamed'])
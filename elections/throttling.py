@@ -0,0 +1,174 @@
+"""
+Token-bucket request throttling.
+
+Each (scope, user or client IP) pair gets a bucket holding up to N tokens
+that refills at N per period, for a rate of 'N/period' in
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']. A request takes one token; an
+empty bucket rejects it with 429 and a Retry-After of the time until the
+next token. Views name their scope with throttle_scope; the per-user and
+per-IP throttles look up '<scope>_user' and '<scope>_ip', and a scope
+without a rate is not throttled.
+
+Buckets live in process memory by default. THROTTLING['STORE'] = 'cache'
+keeps them in a Django cache shared by all workers instead (use a memory
+or Redis/Memcached backend, not the database cache); concurrent requests
+for the same bucket in different workers may then overshoot slightly.
+Nothing here touches the database.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DEFAULTS = {
+    'STORE': 'memory',
+    'CACHE_ALIAS': 'default',
+    'MAX_KEYS': 100000,
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def _conf(name):
+    return getattr(settings, 'THROTTLING', {}).get(name, DEFAULTS[name])
+
+
+def parse_rate(rate):
+    """
+    '10/min' -> (capacity 10, refill rate in tokens per second).
+    """
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+def _refill(state, capacity, rate, now):
+    tokens, stamp = state if state is not None else (capacity, now)
+    return min(capacity, tokens + (now - stamp) * rate)
+
+
+def _take(tokens, rate):
+    """
+    Take a token if there is one. Returns (tokens left, seconds to wait).
+    """
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBucketStore:
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        with self._lock:
+            tokens, wait = _take(_refill(self._buckets.get(key), capacity, rate, now), rate)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune()
+        return wait
+
+    def _prune(self):
+        # Drop the least recently used half; an evicted bucket comes back
+        # full, which only ever errs on the side of letting a request in
+        by_age = sorted(self._buckets, key=lambda k: self._buckets[k][1])
+        for key in by_age[:len(by_age) // 2]:
+            del self._buckets[key]
+
+
+class CacheBucketStore:
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, capacity, rate, now):
+        tokens, wait = _take(_refill(self.cache.get(key), capacity, rate, now), rate)
+        # Kept until the bucket would be full again anyway
+        self.cache.set(key, (tokens, now), math.ceil((capacity - tokens) / rate) + 1)
+        return wait
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            if _conf('STORE') == 'cache':
+                _store = CacheBucketStore(_conf('CACHE_ALIAS'))
+            else:
+                _store = MemoryBucketStore(_conf('MAX_KEYS'))
+        return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Base class; subclasses say what a bucket belongs to.
+    """
+    suffix = None
+
+    def get_key(self, request, view):
+        """
+        The bucket owner for this request, or None to skip throttling.
+        """
+        raise NotImplementedError('.get_key() must be overridden')
+
+    def allow_request(self, request, view):
+        self._wait = 0
+        scope = getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}_{self.suffix}') if scope else None
+        if rate is None:
+            return True
+        key = self.get_key(request, view)
+        if key is None:
+            return True
+        capacity, per_second = parse_rate(rate)
+        self._wait = get_store().take(f'throttle:{scope}_{self.suffix}:{key}', capacity, per_second, time.time())
+        return self._wait == 0
+
+    def wait(self):
+        return self._wait
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """
+    One bucket per authenticated user; anonymous requests are not counted.
+    """
+    suffix = 'user'
+
+    def get_key(self, request, view):
+        user = request.user
+        return user.pk if user and user.is_authenticated else None
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """
+    One bucket per client IP (honours REST_FRAMEWORK['NUM_PROXIES']).
+    """
+    suffix = 'ip'
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+
+class UsernameTokenBucketThrottle(TokenBucketThrottle):
+    """
+    One bucket per username submitted to a login endpoint, so guessing one
+    account's password from many IPs is limited too.
+    """
+    suffix = 'username'
+
+    def get_key(self, request, view):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not username:
+            return None
+        # Hashed: the value is client input and ends up in a cache key
+        return hashlib.sha256(str(username).strip().lower().encode()).hexdigest()[:32]
@@ -1,8 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    ElectionListView, ElectionDetailView, VoteView, 
-    MyVotesView, ResultsView, AdminElectionViewSet
+    ElectionListView, ElectionDetailView, VoteView, BallotView,
+    MyVotesView, VotedElectionIdsView, ResultsView, RunoffResultsView, AdminElectionViewSet,
+    live_results
 )
 
 # Create a router for admin views
@@ -14,8 +15,12 @@ urlpatterns = [
     path('elections/', ElectionListView.as_view(), name='election-list'),
     path('elections/<int:pk>/', ElectionDetailView.as_view(), name='election-detail'),
     path('vote/', VoteView.as_view(), name='vote'),
+    path('ballot/', BallotView.as_view(), name='ballot'),
     path('my-votes/', MyVotesView.as_view(), name='my-votes'),
+    path('my-votes/election-ids/', VotedElectionIdsView.as_view(), name='my-voted-election-ids'),
     path('results/<int:election_id>/', ResultsView.as_view(), name='results'),
+    path('results/<int:election_id>/runoff/', RunoffResultsView.as_view(), name='results-runoff'),
+    path('results/<int:election_id>/live/', live_results, name='results-live'),
     
     # Admin endpoints
     path('', include(admin_router.urls)),
@@ -1,30 +1,110 @@
 from rest_framework import generics, permissions, status, mixins, viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from .models import Election, Candidate, Vote, UserProfile, ElectionLog
+from .models import Election, Candidate, Vote, UserProfile, VoteReceipt, RunoffResult
 from django.contrib.auth import get_user_model
 from .serializers import (
-    ElectionSerializer, ElectionDetailSerializer, VoteSerializer, 
+    ElectionSerializer, ElectionDetailSerializer, 
     MyVoteSerializer, ResultSerializer, AdminElectionSerializer,
-    AdminCandidateSerializer
+    AdminCandidateSerializer, BallotSerializer, CandidateSerializer
 )
 from rest_framework.views import APIView
 from rest_framework.exceptions import ValidationError, PermissionDenied
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
+from django.db.models import FilteredRelation, Min, Q
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from .tallies import record_vote
+from .cache import cached_results
+from .irv import runoff_results
+from .live import event_stream
+from .ingest import ingest_enabled, get_ingestor, journal_record
+from .receipts import idempotency_key, issue_receipt, find_replay, has_voted, receipt_votes
+from .snapshots import get_snapshot
+from .audit import audit_log
+from .ballots import seal_vote
+from .writer import serialized_write
+from .routers import ReplicaReadMixin, pin_to_primary
+from .throttling import IPTokenBucketThrottle, UserTokenBucketThrottle
+from .eligibility import guess_format, import_eligibility, read_identifiers
+from .membership import is_eligible
+from .pagination import KeysetPagination, VoteHistoryPagination
+from .rendered import RenderedCacheMixin, invalidate_rendered
+from accounts.authentication import ClaimsJWTAuthentication
+from accounts.permissions import IsAdminRole
+from rest_framework.parsers import MultiPartParser
+import io
+import logging
 
-class ElectionListView(generics.ListAPIView):
-    queryset = Election.objects.all()
+logger = logging.getLogger(__name__)
+
+class ElectionListView(ReplicaReadMixin, RenderedCacheMixin, generics.ListAPIView):
+    """
+    Elections newest first, a page at a time. Optional filters: status
+    (upcoming, open, closed), type and visibility. Private elections are
+    only listed for their eligible voters.
+    """
     serializer_class = ElectionSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
+    
+    def get_queryset(self):
+        params = self.request.query_params
+        user = self.request.user
+        queryset = Election.objects.all()
+        
+        if user.is_authenticated:
+            # One LEFT JOIN on the user's own eligibility row, which the
+            # (election, voter) unique index answers directly
+            queryset = queryset.annotate(
+                my_eligibility=FilteredRelation('votereligibility', condition=Q(votereligibility__voter=user))
+            ).filter(Q(visibility='public') | Q(my_eligibility__isnull=False))
+        else:
+            queryset = queryset.filter(visibility='public')
+        
+        now = timezone.now()
+        election_status = params.get('status')
+        if election_status == 'upcoming':
+            queryset = queryset.filter(start_time__gt=now)
+        elif election_status == 'open':
+            # Bounding start_time from below keeps the scan of the
+            # (start_time, id) index to the elections that can still be
+            # open, instead of the whole history. The bound is a single
+            # MIN() over the (end_time, start_time) index
+            earliest = Election.objects.filter(
+                end_time__gte=now, start_time__lte=now
+            ).aggregate(earliest=Min('start_time'))['earliest'] or now
+            queryset = queryset.filter(start_time__gte=earliest, start_time__lte=now, end_time__gte=now)
+        elif election_status == 'closed':
+            queryset = queryset.filter(end_time__lt=now)
+        elif election_status:
+            raise ValidationError({'status': 'Must be upcoming, open or closed.'})
+        
+        election_type = params.get('type')
+        if election_type:
+            if election_type not in dict(Election.ELECTION_TYPES):
+                raise ValidationError({'type': 'Unknown election type.'})
+            queryset = queryset.filter(election_type=election_type)
+        
+        visibility = params.get('visibility')
+        if visibility:
+            if visibility not in dict(Election.VISIBILITY_CHOICES):
+                raise ValidationError({'visibility': 'Must be public or private.'})
+            queryset = queryset.filter(visibility=visibility)
+        
+        return queryset
 
-class ElectionDetailView(generics.RetrieveAPIView):
+class ElectionDetailView(ReplicaReadMixin, RenderedCacheMixin, generics.RetrieveAPIView):
     queryset = Election.objects.all()
     serializer_class = ElectionDetailSerializer
     permission_classes = [permissions.AllowAny]
 
 class VoteView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [UserTokenBucketThrottle, IPTokenBucketThrottle]
+    throttle_scope = 'vote'
     
     def post(self, request):
         try:
@@ -38,56 +118,73 @@ class VoteView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Get the actual objects
+            # Validate against the cached election snapshot; a warm worker
+            # reads nothing from the database before the insert
             try:
-                election = Election.objects.get(pk=election_id)
-                candidate = Candidate.objects.get(pk=candidate_id)
-            except (Election.DoesNotExist, Candidate.DoesNotExist):
+                election = get_snapshot(election_id)
+            except (Election.DoesNotExist, ValueError, TypeError):
                 return Response(
                     {'detail': 'Invalid election or candidate'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            
-            # Check if user has already voted in this election
-            if Vote.objects.filter(voter=request.user, election=election).exists():
-                return Response(
-                    {'detail': 'You have already voted in this election'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+            try:
+                candidate_id = int(candidate_id)
+            except (ValueError, TypeError):
+                candidate_id = None
             
             # Check if election is active
             now = timezone.now()
-            if not (election.start_time <= now <= election.end_time):
+            if not election.is_ongoing(now):
                 return Response(
                     {'detail': 'Election is not active'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
             # Check if candidate belongs to the election
-            if candidate.election_id != election.id:
+            if candidate_id not in election.candidates:
                 return Response(
                     {'detail': 'Invalid candidate for this election'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Create the vote
-            vote = Vote.objects.create(
-                voter=request.user,
-                election=election,
-                candidate=candidate,
-                rank=1  # Default rank for single-choice
-            )
+            # Private elections: checked against the cached eligibility index
+            if not is_eligible(election, request.user.id):
+                return Response(
+                    {'detail': 'You are not eligible to vote in this election'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
             
-            # Log the vote
-            ElectionLog.objects.create(
-                election=election,
-                user=request.user,
-                action='vote_cast',
-                details=f'Voted for {candidate.name}'
-            )
+            key = idempotency_key(request)
+            
+            # Write-behind mode: journal the vote and acknowledge it now
+            if ingest_enabled():
+                return self.submit_to_journal(request, election, candidate_id, key)
+            
+            # The receipt's unique (voter, election) constraint rejects a
+            # second vote, so there is no separate "already voted" query
+            try:
+                receipt, vote = serialized_write(self.store_vote, request, election, candidate_id, key)
+            except IntegrityError:
+                receipt = find_replay(request.user.id, election.id, key)
+                if receipt is None:
+                    if not has_voted(request.user.id, election.id):
+                        # Not the receipt constraint, e.g. the candidate
+                        # was deleted after the snapshot was loaded
+                        logger.exception('Failed to store a vote in election %s', election.id)
+                        return Response(
+                            {'detail': 'The vote could not be recorded, please try again'},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                        )
+                    return Response(
+                        {'detail': 'You have already voted in this election'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                vote = receipt_votes(receipt)[0]
             
+            # Let the voter read their own vote before the replica has it
+            pin_to_primary(request.user.id)
             return Response(
-                {'detail': 'Vote cast successfully', 'vote_id': vote.id},
+                {'detail': 'Vote cast successfully', 'vote_id': vote.id, 'receipt': str(receipt.receipt)},
                 status=status.HTTP_201_CREATED
             )
             
@@ -97,25 +194,160 @@ class VoteView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class MyVotesView(generics.ListAPIView):
+    def store_vote(self, request, election, candidate_id, key):
+        """
+        Insert the receipt and the vote. Runs in a transaction, on the
+        writer thread when DB_WRITER is enabled.
+        """
+        receipt = issue_receipt(request.user, election.id, key)
+        
+        # Create the vote
+        if election.encrypted_ballots:
+            vote = seal_vote(election, request.user, [candidate_id])
+            vote.save()
+            details = 'Cast encrypted ballot'
+        else:
+            vote = Vote.objects.create(
+                voter=request.user,
+                election_id=election.id,
+                candidate_id=candidate_id,
+                rank=1  # Default rank for single-choice
+            )
+            record_vote(vote)
+            details = f'Voted for {election.candidates[candidate_id]}'
+        
+        # Log the vote (buffered, written after commit)
+        audit_log(
+            election.id, request.user.id, 'vote_cast',
+            details, request.META.get('REMOTE_ADDR')
+        )
+        return receipt, vote
+
+    def submit_to_journal(self, request, election, candidate_id, key):
+        receipt = get_ingestor().submit(journal_record(request, election, candidate_id, key))
+        if receipt is None:
+            return Response(
+                {'detail': 'You have already voted in this election'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        pin_to_primary(request.user.id)
+        return Response(
+            {'detail': 'Vote accepted', 'receipt': receipt},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+class BallotView(APIView):
+    """
+    Cast a whole ballot (one or more selections or rankings) in one request.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [UserTokenBucketThrottle, IPTokenBucketThrottle]
+    throttle_scope = 'vote'
+    
+    def post(self, request):
+        serializer = BallotSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        receipt, votes = serializer.save()
+        pin_to_primary(request.user.id)
+        return Response(
+            {
+                'detail': 'Ballot cast successfully',
+                'vote_ids': [vote.id for vote in votes],
+                'receipt': str(receipt.receipt),
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+class MyVotesView(ReplicaReadMixin, generics.ListAPIView):
+    """
+    The user's votes, newest first, a page at a time. Each page is one
+    query joining the election and candidate for just the columns shown.
+    """
     serializer_class = MyVoteSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = VoteHistoryPagination
+    
     def get_queryset(self):
-        return Vote.objects.filter(voter=self.request.user)
+        return Vote.objects.filter(voter=self.request.user).select_related('election', 'candidate').only(
+            'id', 'timestamp', 'election_id', 'candidate_id',
+            *(f'election__{f}' for f in ElectionSerializer.Meta.fields),
+            *(f'candidate__{f}' for f in CandidateSerializer.Meta.fields),
+        )
+
+class VotedElectionIdsView(ReplicaReadMixin, APIView):
+    """
+    Ids of the elections the user has voted in, read from the receipts'
+    (voter, election) index without touching the votes.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        election_ids = VoteReceipt.objects.filter(voter=request.user).values_list('election_id', flat=True)
+        return Response({'election_ids': list(election_ids)})
+
+class ResultsView(ReplicaReadMixin, APIView):
+    permission_classes = [permissions.AllowAny]
+    def get(self, request, election_id):
+        def compute():
+            election = Election.objects.get(pk=election_id)
+            # Return live results even before the election ends
+            # If you need to lock results until the end, reintroduce the check below:
+            # if timezone.now() < election.end_time:
+            #     return Response({'detail': 'Results are locked until the election ends.'}, status=403)
+            return dict(ResultSerializer(election).data)
+
+        try:
+            data = cached_results(election_id, compute)
+        except Election.DoesNotExist:
+            return Response({'detail': 'Election not found.'}, status=404)
+        return Response(data)
 
-class ResultsView(APIView):
+class RunoffResultsView(ReplicaReadMixin, APIView):
+    """
+    Round-by-round instant-runoff results for ranked choice elections.
+    """
     permission_classes = [permissions.AllowAny]
     def get(self, request, election_id):
         try:
             election = Election.objects.get(pk=election_id)
         except Election.DoesNotExist:
             return Response({'detail': 'Election not found.'}, status=404)
-        # Return live results even before the election ends
-        # If you need to lock results until the end, reintroduce the check below:
-        # if timezone.now() < election.end_time:
-        #     return Response({'detail': 'Results are locked until the election ends.'}, status=403)
-        serializer = ResultSerializer(election)
-        return Response(serializer.data)
+        if election.election_type != 'ranked_choice':
+            return Response(
+                {'detail': 'Runoff results are only available for ranked choice elections.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if election.encrypted_ballots:
+            # Counted by tally_encrypted_ballots; never decrypted on request
+            if timezone.now() < election.end_time:
+                return Response(
+                    {'detail': 'Results are sealed until the election ends.'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            stored = RunoffResult.objects.filter(election=election).values_list('data', flat=True).first()
+            if stored is None:
+                return Response(
+                    {'detail': 'Results are sealed until the ballots are counted.'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            return Response(stored)
+        data = cached_results(election.id, lambda: runoff_results(election), kind='runoff')
+        return Response(data)
+
+async def live_results(request, election_id):
+    """
+    Stream result updates for an election as Server-Sent Events.
+    """
+    # The stream never ends on its own; under WSGI it would hold a worker
+    # thread for as long as the page stays open
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'Live results need an ASGI server.'}, status=501)
+    if not await Election.objects.filter(pk=election_id).aexists():
+        return JsonResponse({'detail': 'Election not found.'}, status=404)
+    response = StreamingHttpResponse(event_stream(election_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 class AdminElectionViewSet(viewsets.ModelViewSet):
@@ -123,17 +355,28 @@ class AdminElectionViewSet(viewsets.ModelViewSet):
     API endpoint for admin election management.
     """
     serializer_class = AdminElectionSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    # Only admins may manage elections; decided from the token's role claim
+    # without loading the user or their profile
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAdminRole]
     
     def get_queryset(self):
-        # Only allow admins to manage elections
-        if not hasattr(self.request.user, 'profile') or self.request.user.profile.role != 'admin':
-            raise PermissionDenied("You do not have permission to perform this action.")
         return Election.objects.all().order_by('-created_at')
     
     def perform_create(self, serializer):
-        # Set the created_by field to the current user
-        serializer.save(created_by=self.request.user)
+        # Set the created_by field to the current user (a TokenUser here)
+        serializer.save(created_by_id=self.request.user.id)
+        invalidate_rendered(serializer.instance.id)
+    
+    def perform_update(self, serializer):
+        serializer.save()
+        # Candidate edits are queryset updates, which send no signals
+        invalidate_rendered(serializer.instance.id)
+    
+    def perform_destroy(self, instance):
+        election_id = instance.id
+        instance.delete()
+        invalidate_rendered(election_id)
     
     @action(detail=True, methods=['post'])
     def launch(self, request, pk=None):
@@ -142,10 +385,6 @@ class AdminElectionViewSet(viewsets.ModelViewSet):
         """
         election = self.get_object()
         
-        # Check if user is admin
-        if not hasattr(request.user, 'profile') or request.user.profile.role != 'admin':
-            raise PermissionDenied("You do not have permission to launch elections.")
-        
         # Validate that election has at least one candidate
         if not election.candidates.exists():
             return Response(
@@ -176,9 +415,13 @@ class AdminElectionViewSet(viewsets.ModelViewSet):
         """
         election = self.get_object()
         
-        # Check if user is admin
-        if not hasattr(request.user, 'profile') or request.user.profile.role != 'admin':
-            raise PermissionDenied("You do not have permission to close elections.")
+        # Sealed ballots are counted once voting is over, by the
+        # tally_encrypted_ballots command rather than in this request
+        if election.encrypted_ballots and timezone.now() < election.end_time:
+            return Response(
+                {'detail': 'Elections with encrypted ballots cannot be closed before they end.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Deactivate the election
         election.is_active = False
@@ -188,3 +431,39 @@ class AdminElectionViewSet(viewsets.ModelViewSet):
             {'detail': 'Election closed successfully.'},
             status=status.HTTP_200_OK
         )
+    
+    @action(detail=True, methods=['post'], parser_classes=[MultiPartParser])
+    def eligibility(self, request, pk=None):
+        """
+        Import eligible voters from an uploaded CSV or JSON-lines file
+        ('file') of usernames or emails. Large uploads are spooled to disk
+        by Django and read a chunk at a time.
+        """
+        election = self.get_object()
+        
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'detail': 'Upload the list as "file".'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        fmt = request.data.get('format') or guess_format(upload.name)
+        if fmt not in ('csv', 'jsonl'):
+            return Response(
+                {'detail': 'Format must be csv or jsonl.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        upload.open('rb')
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            stats = import_eligibility(election, read_identifiers(stream, fmt))
+        except (ValueError, UnicodeDecodeError) as exc:
+            return Response(
+                {'detail': f'Could not read the file: {exc}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        finally:
+            stream.detach()
+        
+        return Response(stats.as_dict(), status=status.HTTP_200_OK)
@@ -0,0 +1,164 @@
+"""
+Serialized database writer.
+
+SQLite allows one writer at a time, so threads writing votes and log
+entries mostly queue on the database lock. With DB_WRITER['ENABLED'] those
+writes are handed to one writer thread instead. Writes queued while a
+commit is in progress are run in the next transaction, each inside its
+own savepoint, so a failing write (e.g. a second vote hitting the receipt
+constraint) is rolled back alone and many writes share one commit.
+Callers block until their write has committed and get its return value
+or exception, exactly as if they had run it in transaction.atomic().
+
+Savepoints do not isolate everything: SQLite checks Django's foreign keys
+(DEFERRABLE INITIALLY DEFERRED) only at the outer COMMIT, so one write
+referencing a row deleted meanwhile fails the whole batch's commit. When
+that happens each write of the batch is run again in its own transaction,
+so only the offending one fails. Writes must therefore be safe to re-run
+after a rollback, i.e. keep their side effects in the database or in
+transaction.on_commit() callbacks.
+"""
+import atexit
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'MAX_BATCH': 100,
+    'QUEUE_SIZE': 10000,
+}
+
+
+def _conf(name):
+    return getattr(settings, 'DB_WRITER', {}).get(name, DEFAULTS[name])
+
+
+class DatabaseWriter:
+    def __init__(self):
+        self.max_batch = _conf('MAX_BATCH')
+        self._queue = queue.Queue(maxsize=_conf('QUEUE_SIZE'))
+        self._worker = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._worker.start()
+
+    def in_writer_thread(self):
+        return threading.current_thread() is self._worker
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def _take_batch(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            stop = None in batch
+            jobs = [job for job in batch if job is not None]
+            close_old_connections()
+            try:
+                results = self._run_batch(jobs)
+            except Exception:
+                logger.warning('Failed to commit %d queued writes; retrying one at a time', len(jobs), exc_info=True)
+                results = [self._run_batch([job])[0] for job in jobs]
+            for future, result, exc in results:
+                if exc is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(exc)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                break
+        close_old_connections()
+
+    def _run_batch(self, jobs):
+        """
+        Run jobs in one transaction, each in its own savepoint. Returns
+        (future, result, exception) per job; raises if the commit fails.
+        With a single job a failed commit is that job's own exception.
+        """
+        results = []
+        try:
+            with transaction.atomic():
+                for future, func, args, kwargs in jobs:
+                    try:
+                        with transaction.atomic():
+                            results.append((future, func(*args, **kwargs), None))
+                    except Exception as exc:
+                        results.append((future, None, exc))
+        except Exception as exc:
+            if len(jobs) > 1:
+                raise
+            return [(jobs[0][0], None, exc)]
+        return results
+
+    def shutdown(self):
+        self._queue.put(None)
+        self._worker.join()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+_exiting = False
+
+
+def get_writer():
+    """
+    The writer thread, or None once the interpreter is shutting down.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None and not _exiting:
+            _writer = DatabaseWriter()
+        return _writer
+
+
+@atexit.register
+def _exit():
+    global _exiting
+    _exiting = True
+    stop_writer()
+
+
+def stop_writer():
+    """
+    Finish the queued writes and stop the writer thread.
+    """
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.shutdown()
+
+
+def serialized_write(func, *args, **kwargs):
+    """
+    Run func(*args, **kwargs) in a transaction and return its result: on
+    the writer thread when DB_WRITER is enabled, otherwise inline.
+    """
+    if not _conf('ENABLED'):
+        with transaction.atomic():
+            return func(*args, **kwargs)
+    writer = get_writer()
+    if writer is None or writer.in_writer_thread() or transaction.get_connection().in_atomic_block:
+        # Already writing (a nested call, or inside the caller's own
+        # transaction, which holds the lock and must see its own writes),
+        # or exiting, when late flushes from other writers run inline
+        with transaction.atomic():
+            return func(*args, **kwargs)
+    return writer.submit(func, *args, **kwargs).result()
@@ -18,7 +18,7 @@ def list_users():
 def create_test_users():
     """Create test users if they don't exist."""
     from django.contrib.auth import get_user_model
-    from accounts.models import UserProfile
+    from accounts.models import create_user
     
     User = get_user_model()
     
@@ -54,20 +54,12 @@ def create_test_users():
         password = user_data.pop('password')
         role = user_data.pop('role')
         
-        user, created = User.objects.get_or_create(
-            username=username,
-            defaults=user_data
-        )
-        
-        if created:
-            user.set_password(password)
-            user.save()
-            
-            # Create user profile
-            UserProfile.objects.create(user=user, role=role)
-            print(f"Created user: {username} with role: {role}")
-        else:
+        if User.objects.filter(username=username).exists():
             print(f"User {username} already exists")
+        else:
+            # Creates the profile with the role in the same step
+            create_user(username, password, profile={'role': role}, **user_data)
+            print(f"Created user: {username} with role: {role}")
 
 if __name__ == "__main__":
     setup_django()
@@ -77,13 +77,54 @@ WSGI_APPLICATION = 'voting_system_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite profile: WAL lets results and listing reads run while a write is
+# in progress; synchronous=NORMAL is durable in WAL mode except for the last
+# commits on power loss. Write transactions take the lock up front
+# (IMMEDIATE) and wait up to `timeout` seconds for it instead of failing
+# with "database is locked". Vote and audit log writes are additionally
+# funneled through one writer thread, see DB_WRITER below.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA cache_size=-20000;'      # 20 MB page cache
+                'PRAGMA temp_store=MEMORY;'
+                'PRAGMA mmap_size=134217728;'    # 128 MB
+            ),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # A file rather than Django's shared-cache in-memory database, whose
+        # table locks fail at once instead of waiting; the writer, ingest
+        # and audit threads need the same locking as in production
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Read replica used by the read-only election, results and my-votes views
+# (elections/routers.py). By default it is the primary file itself, which
+# WAL lets readers share with the writer; point NAME at a replicated copy
+# (or, for testing, a locally copied file) to move those reads elsewhere.
+# A user who just voted reads from the primary for STICKY_SECONDS; that pin
+# lives in CACHE_ALIAS, which must be shared by all workers (not LocMem)
+# once the replica is a separate database, or manage.py check fails.
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'TEST': {'MIRROR': 'default'},
+}
+
+DATABASE_ROUTERS = ['elections.routers.PrimaryReplicaRouter']
+
+DATABASE_REPLICA = {
+    'ALIAS': 'replica',
+    'STICKY_SECONDS': 10,
+    'CACHE_ALIAS': 'default',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -128,9 +169,41 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Django REST Framework & JWT
 REST_FRAMEWORK = {
+    # simplejwt's JWTAuthentication plus the token revocation check; use
+    # accounts.authentication.StatelessJWTAuthentication to build
+    # request.user from the token's claims instead of loading it
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.VersionedJWTAuthentication',
+    ),
+    # orjson-backed JSON when installed, DRF's stdlib JSON otherwise
+    # (elections/renderers.py); use rest_framework.renderers.JSONRenderer
+    # and rest_framework.parsers.JSONParser to opt out
+    'DEFAULT_RENDERER_CLASSES': (
+        'elections.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
+    'DEFAULT_PARSER_CLASSES': (
+        'elections.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # Token-bucket rates (elections/throttling.py): a bucket holds N
+    # requests and refills at N per period
+    'DEFAULT_THROTTLE_RATES': {
+        'vote_user': '10/min',
+        'vote_ip': '300/min',        # many voters can share a NAT address
+        'login_ip': '20/min',
+        'login_username': '5/min',
+        'register_ip': '10/hour',
+    },
+}
+
+# Where throttle buckets are kept: 'memory' (per process) or 'cache' (the
+# CACHE_ALIAS cache, shared by workers; must not be the database cache).
+THROTTLING = {
+    'STORE': 'memory',
+    'CACHE_ALIAS': 'default',
+    'MAX_KEYS': 100000,      # memory store: buckets kept before pruning
 }
 
 # CORS
@@ -142,4 +215,135 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Tokens carry the user's role and token version (accounts/tokens.py)
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.tokens.RoleTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.tokens.RoleTokenRefreshSerializer',
+}
+
+# Token versions are read through this cache; TIMEOUT (seconds) bounds how
+# long a worker with its own cache (e.g. LocMemCache) accepts revoked tokens
+TOKEN_REVOCATION = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 60,
+}
+
+# StatelessJWTAuthentication: seconds for which a user's active flag is
+# cached in CACHE_ALIAS
+JWT_STATELESS = {
+    'ACTIVE_TTL': 30,
+    'CACHE_ALIAS': 'default',
+}
+
+# Cache
+# Results are cached per election (see elections/cache.py). LocMemCache is
+# per process; point 'default' at a shared backend (FileBasedCache, Redis,
+# Memcached) when running several workers so invalidation and the
+# single-flight lock are shared, e.g.
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#   'LOCATION': BASE_DIR / 'cache',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Election detail and anonymous list pages cached as rendered JSON bytes
+# with an ETag (elections/rendered.py). TIMEOUT (seconds) for details,
+# LIST_TIMEOUT for list pages, whose open/closed filters depend on the time.
+RENDERED_CACHE = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LIST_TIMEOUT': 30,
+}
+RESULTS_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60,        # seconds a computed result is kept
+    'LOCK_TIMEOUT': 10,   # seconds before a crashed computation's lock expires
+    'WAIT_TIMEOUT': 5,    # seconds a worker waits for another worker's result
+}
+
+# Live results (Server-Sent Events at /api/results/<id>/live/, ASGI only;
+# WSGI requests get 501).
+# The in-memory backend only reaches streams in the same process as the
+# vote; swap in a shared pub/sub backend when running several workers.
+LIVE_RESULTS = {
+    'BACKEND': 'elections.live.InMemoryPubSub',
+    'TICK': 1.0,          # seconds between tally reads per election
+    'KEEPALIVE': 15.0,    # seconds between keepalive comments
+}
+
+# Write-behind vote ingestion. When enabled, /api/vote/ journals accepted
+# votes to JOURNAL_DIR and returns 202; a background thread writes them to
+# the database in batches of BATCH_SIZE at least every FLUSH_INTERVAL
+# seconds. Orphaned journals are replayed on start or with
+# `python manage.py replay_vote_journal`.
+VOTE_INGEST = {
+    'ENABLED': False,
+    'JOURNAL_DIR': BASE_DIR / 'vote_journal',
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 0.5,
+    'FSYNC': True,        # sync the journal before acknowledging (shared by concurrent votes)
+    # Votes that can never be stored (e.g. their candidate was deleted)
+    'DEAD_LETTER_FILE': BASE_DIR / 'vote_journal' / 'dead-letter.jsonl',
+}
+
+# Per-worker election snapshots used to validate votes without reading the
+# database. Changes are broadcast through a version key in this cache
+# alias; TTL (seconds) bounds how long a worker trusts a snapshot.
+ELECTION_SNAPSHOTS = {
+    'ALIAS': 'default',
+    'TTL': 300,
+}
+
+# Per-worker index of each private election's eligible voters, checked on
+# every vote instead of querying VoterEligibility. Invalidated the same way
+# as the snapshots above.
+ELIGIBILITY_INDEX = {
+    'ALIAS': 'default',
+    'TTL': 300,
+}
+
+# Audit log (ElectionLog). Entries are buffered and bulk-written by a
+# background thread; set ASYNC to False to write inline. FILE enables an
+# append-only rotating JSON-lines archive, after which old rows can be
+# removed with `python manage.py prune_election_logs --days N`. Entries are
+# hash-chained per election; checkpoints written by
+# `python manage.py verify_election_logs` are signed with SIGNING_KEY
+# (SECRET_KEY when unset).
+AUDIT_LOG = {
+    'ASYNC': True,
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 1.0,   # seconds
+    'QUEUE_SIZE': 10000,     # entries buffered before callers write inline
+    'BLOCK_TIMEOUT': 1.0,    # seconds a caller waits for queue space
+    'FILE': None,            # e.g. BASE_DIR / 'election_audit.log'
+    'MAX_BYTES': 50 * 1024 * 1024,
+    'BACKUP_COUNT': 10,
+    'SIGNING_KEY': None,
+    # A batch that fails is retried RETRIES times, RETRY_BACKOFF seconds
+    # apart and doubling, then written entry by entry; entries that still
+    # fail are appended here, never dropped
+    'RETRIES': 3,
+    'RETRY_BACKOFF': 0.5,
+    'DEAD_LETTER_FILE': BASE_DIR / 'audit-dead-letter.jsonl',
+}
+
+# Encrypted-ballot elections (Election.encrypted_ballots). Per-election
+# AES-GCM keys are derived from KEY (SECRET_KEY when unset), so changing it
+# makes sealed ballots unreadable. Closing such an election decrypts and
+# counts its ballots across WORKERS processes (default: CPU count).
+BALLOT_ENCRYPTION = {
+    'KEY': None,
+    'WORKERS': None,
+    'CHUNK_SIZE': 5000,      # ballots per worker task
+}
+
+# Single writer thread for vote and audit log writes. Writes queued while a
+# commit is in progress are grouped into the next transaction, each in its
+# own savepoint. Callers still block until their write has committed.
+DB_WRITER = {
+    'ENABLED': True,
+    'MAX_BATCH': 100,        # writes grouped into one commit
+    'QUEUE_SIZE': 10000,
 }
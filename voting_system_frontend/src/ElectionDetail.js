@@ -22,9 +22,9 @@ function ElectionDetail() {
     
     const token = localStorage.getItem('access');
     if (token) {
-      axios.get('/api/my-votes/', { headers: { Authorization: `Bearer ${token}` } })
+      axios.get('/api/my-votes/election-ids/', { headers: { Authorization: `Bearer ${token}` } })
         .then(res => {
-          if (res.data.some(v => v.election.id === parseInt(id))) setVoted(true);
+          if (res.data.election_ids.includes(parseInt(id))) setVoted(true);
         });
     }
   }, [id]);
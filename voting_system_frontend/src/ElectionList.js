@@ -1,16 +1,44 @@
 import React, { useEffect, useState } from 'react';
-import axios from 'axios';
 import { Link } from 'react-router-dom';
+import api from './services/api';
+
+const STATUS_FILTERS = [
+  { value: 'open', label: 'Open' },
+  { value: 'upcoming', label: 'Upcoming' },
+  { value: 'closed', label: 'Closed' },
+  { value: '', label: 'All' },
+];
 
 function ElectionList() {
   const [elections, setElections] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [statusFilter, setStatusFilter] = useState('open');
+  const [cursor, setCursor] = useState(null);
+
+  // Pages are fetched by cursor; the next page link carries it. The shared
+  // client sends the token, so signed-in users also see the private
+  // elections they are eligible for, and refreshes it when it has expired
+  const fetchPage = pageCursor => api.get('/elections/', {
+    params: { status: statusFilter || undefined, cursor: pageCursor || undefined },
+  }).then(res => {
+    setCursor(res.data.next ? new URL(res.data.next).searchParams.get('cursor') : null);
+    return res.data.results;
+  });
 
   useEffect(() => {
-    axios.get('/api/elections/')
-      .then(res => setElections(res.data))
+    setLoading(true);
+    fetchPage(null)
+      .then(setElections)
       .finally(() => setLoading(false));
-  }, []);
+  }, [statusFilter]); // eslint-disable-line react-hooks/exhaustive-deps
+
+  const loadMore = () => {
+    setLoadingMore(true);
+    fetchPage(cursor)
+      .then(results => setElections(current => [...current, ...results]))
+      .finally(() => setLoadingMore(false));
+  };
 
   if (loading) return (
     <div className="loading">
@@ -22,7 +50,21 @@ function ElectionList() {
 
   return (
     <div className="page-enter">
-      <h2 className="mb-4 text-center text-white fw-bold">🗳️ Active Elections</h2>
+      <h2 className="mb-4 text-center text-white fw-bold">🗳️ Elections</h2>
+      <div className="d-flex justify-content-center mb-4">
+        <div className="btn-group" role="group" aria-label="Filter elections by status">
+          {STATUS_FILTERS.map(filter => (
+            <button
+              key={filter.value}
+              type="button"
+              className={`btn ${statusFilter === filter.value ? 'btn-light' : 'btn-outline-light'}`}
+              onClick={() => setStatusFilter(filter.value)}
+            >
+              {filter.label}
+            </button>
+          ))}
+        </div>
+      </div>
       <div className="row">
         {elections.map(election => (
           <div className="col-md-6 col-lg-4 mb-4" key={election.id}>
@@ -54,6 +96,13 @@ function ElectionList() {
           </div>
         ))}
       </div>
+      {cursor && (
+        <div className="text-center mb-4">
+          <button className="btn btn-light" onClick={loadMore} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
       {elections.length === 0 && (
         <div className="text-center text-white">
           <i className="fas fa-inbox fa-4x mb-3"></i>
@@ -2,6 +2,11 @@ import React, { useEffect, useState } from 'react';
 import axios from 'axios';
 import { useParams, Link } from 'react-router-dom';
 
+// Live updates need the backend behind an ASGI server; enable them with
+// REACT_APP_LIVE_RESULTS=true, otherwise the page polls
+const LIVE_RESULTS = process.env.REACT_APP_LIVE_RESULTS === 'true';
+const POLL_INTERVAL = 10000;
+
 function ResultsPage() {
   const { id } = useParams();
   const [results, setResults] = useState(null);
@@ -11,15 +16,65 @@ function ResultsPage() {
   useEffect(() => {
     setLocked(false);
     setLoading(true);
-    axios.get(`/api/results/${id}/`).then(res => {
+    let stopped = false;
+    let source = null;
+    let timer = null;
+
+    const load = () => axios.get(`/api/results/${id}/`).then(res => {
       setResults(res.data);
       setLoading(false);
+      return true;
     }).catch(err => {
       if (err.response && err.response.status === 403) {
         setLocked(true);
       }
       setLoading(false);
+      return false;
+    });
+
+    // Without the live stream (WSGI servers answer it with 501) the page
+    // re-fetches the results every POLL_INTERVAL instead
+    const poll = () => {
+      timer = setTimeout(() => load().then(ok => {
+        if (ok && !stopped) poll();
+      }), POLL_INTERVAL);
+    };
+
+    // Apply live updates pushed by the server instead of re-fetching
+    const listen = () => {
+      source = new EventSource(`${axios.defaults.baseURL || ''}/api/results/${id}/live/`);
+      source.addEventListener('results', (event) => {
+        const data = JSON.parse(event.data);
+        setResults(prev => prev ? { ...prev, candidates: data.candidates } : prev);
+      });
+      source.addEventListener('delta', (event) => {
+        const data = JSON.parse(event.data);
+        const changed = Object.fromEntries(data.candidates.map(c => [c.id, c]));
+        setResults(prev => {
+          if (!prev) return prev;
+          const kept = prev.candidates
+            .filter(c => !data.removed.includes(c.id))
+            .map(c => changed[c.id] ? { ...c, ...changed[c.id] } : c);
+          const added = data.candidates.filter(c => !prev.candidates.some(p => p.id === c.id));
+          return { ...prev, candidates: [...kept, ...added] };
+        });
+      });
+      source.onerror = () => {
+        // The browser retries dropped streams by itself; a refused one is closed
+        if (source.readyState === EventSource.CLOSED && !stopped) poll();
+      };
+    };
+
+    load().then(ok => {
+      if (!ok || stopped) return;
+      if (LIVE_RESULTS && typeof EventSource !== 'undefined') listen();
+      else poll();
     });
+    return () => {
+      stopped = true;
+      clearTimeout(timer);
+      if (source) source.close();
+    };
   }, [id]);
 
   if (loading) return (